@@ -11,15 +11,18 @@ Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2
 License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
 """
 
+from python_module.common.startup_timer import startup_timer
 import sys
 import argparse
+from datetime import datetime
 from prettytable import PrettyTable
 from python_module.component.pipeline import run_pipeline
+from python_module.component.launch_profile import load_profile
 from python_module.common.utils import clear_screen
 import os
 
 os.environ['GST_DEBUG'] = 'ERROR'  
-os.system('stty sane')
+startup_timer.mark("imports")
 
 def display_output_options():
     """Display available output options to the user in a table format."""
@@ -69,20 +72,60 @@ def parse_args():
         choices=["display", "file", "rtsp", "silent"],
     )
 
+    # Headless benchmark
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Run without prompts using the saved session and write a JSON performance report")
+    parser.add_argument("--duration", type=float, default=60,
+                        help="Benchmark measurement duration in seconds (default: 60)")
+    parser.add_argument("--frames", type=int, default=0,
+                        help="Stop the benchmark after this many frames, all streams together (default: no limit)")
+    parser.add_argument("--warmup", type=float, default=10,
+                        help="Seconds after the first frame excluded from the benchmark (default: 10)")
+    parser.add_argument("--replicate", type=int, default=0,
+                        help="Use the first active source N times instead of all active sources")
+    parser.add_argument("--report", default=None,
+                        help="Benchmark report path (default: benchmark_output/benchmark_<timestamp>.json)")
+
+    # Non-interactive launch: profile file and/or flags overriding it
+    parser.add_argument("--profile", help="Launch profile (JSON or YAML) with sources, model, tracker, output and settings")
+    parser.add_argument("--source", action="append",
+                        help="Media source URL or file path, may be repeated (default: active sources of media.ini)")
+    parser.add_argument("--model", help="ONNX model file")
+    parser.add_argument("--labels", help="Label file of the model")
+    parser.add_argument("--model-type", choices=["det", "seg"], help="Detection or segmentation model")
+    parser.add_argument("--precision", choices=["fp32", "fp16", "qat"], help="Engine precision")
+    parser.add_argument("--network-size", help="Network input size, or 'auto' to choose it from the measured throughput (default: NETWORK_SIZE)")
+    parser.add_argument("--batch-size", type=int, help="Engine batch size (default: number of sources)")
+    parser.add_argument("--tracker", help="nvtracker low-level config file")
+
     # Parse arguments
     args = parser.parse_args()
 
+    if args.profile and not args.output:
+        args.output = load_profile(args.profile).get("output", "silent")
+    if not args.output and (args.source or args.model):
+        args.output = "silent"
+
+    if args.benchmark:
+        if not args.output:
+            args.output = "silent"
+        if not args.report:
+            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            args.report = os.path.join("benchmark_output", f"benchmark_{timestamp}.json")
+
     # If the user provided an output option via the command line, use it.
     if args.output:
         return args
 
     # Otherwise, prompt the user for the output option.
     display_output_options()
-    selected_output = get_user_choice()
-    return argparse.Namespace(output=selected_output)
+    args.output = get_user_choice()
+    return args
 
 if __name__ == '__main__':
-    clear_screen()
+    os.system('stty sane')
+    if sys.stdout.isatty():
+        clear_screen()
     try:
         args = parse_args()
         sys.exit(run_pipeline(args))
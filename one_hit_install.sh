@@ -75,9 +75,9 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
-pip3 install yt-dlp prettytable
+pip3 install yt-dlp prettytable numpy
 if [ $? -ne 0 ]; then
-    echo "Failed to install yt-dlp and prettytable."
+    echo "Failed to install yt-dlp, prettytable and numpy."
     exit 1
 fi
 
@@ -19,8 +19,10 @@ import gi
 import sys
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst
+from python_module.component.source_factory import source_index_of
+from python_module.component.source_watchdog import FINITE_MEDIA_TYPES
 
-def bus_call(bus, message, loop):
+def bus_call(bus, message, loop, watchdog=None):
     t = message.type
     if t == Gst.MessageType.EOS:
         sys.stdout.write("End-of-stream\n")
@@ -31,5 +33,12 @@ def bus_call(bus, message, loop):
     elif t == Gst.MessageType.ERROR:
         err, debug = message.parse_error()
         sys.stderr.write("Error: %s: %s\n" % (err, debug))
-        loop.quit()
+        # Errors of a single live source are left to the watchdog instead of stopping every
+        # stream; a file source is never restarted, so its error still ends the run
+        index = source_index_of(message.src) if watchdog else None
+        if (index is not None and index in watchdog.sources
+                and watchdog.sources[index].media not in FINITE_MEDIA_TYPES):
+            watchdog.on_source_error(index, err)
+        else:
+            loop.quit()
     return True
\ No newline at end of file
@@ -0,0 +1,322 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import json
+import threading
+from bisect import bisect_left
+from time import monotonic
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WINDOWS = (1, 10, 60)
+HISTORY_SECONDS = max(WINDOWS) + 1
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def log_bounds(low, high, factor=1.25):
+    """Log-spaced histogram bucket upper bounds from `low` to `high`, plus an overflow bucket."""
+    bounds = []
+    bound = low
+    while bound < high:
+        bounds.append(bound)
+        bound *= factor
+    bounds.append(float('inf'))
+    return bounds
+
+
+# Frame interval histogram: 0.5 ms to ~10 s
+INTERVAL_BOUNDS = log_bounds(0.0005, 10.0)
+# Pipeline stage latency histogram: 20 us to ~10 s
+LATENCY_BOUNDS = log_bounds(0.00002, 10.0)
+
+
+def histogram_quantiles(histogram, bounds, quantiles=QUANTILES):
+    """Return the upper bound of the bucket holding each quantile, or None when empty."""
+    total = sum(histogram)
+    if total == 0:
+        return {q: None for q in quantiles}
+    result = {}
+    cumulative = 0
+    targets = iter(sorted(quantiles))
+    target = next(targets)
+    for index, count in enumerate(histogram):
+        cumulative += count
+        while target is not None and cumulative >= target * total:
+            bound = bounds[index]
+            result[target] = bound if bound != float('inf') else bounds[index - 1]
+            target = next(targets, None)
+        if target is None:
+            break
+    return result
+
+
+def completed_buckets(second, current_second, window):
+    """Yield the ring indexes of the completed seconds of a window ending at `second`.
+
+    The current second is still being filled, and seconds after `current_second`
+    (the last one written) hold stale buckets, so both are skipped.
+    """
+    for t in range(second - window, second):
+        if current_second - HISTORY_SECONDS < t <= current_second:
+            yield t % HISTORY_SECONDS
+
+
+class RollingHistogram:
+    """Log-bucketed histogram of durations over the last HISTORY_SECONDS seconds.
+
+    A cumulative histogram is kept alongside the rolling one for measurements
+    longer than the history, such as benchmark runs; reset_totals() starts it over.
+    """
+
+    def __init__(self, bounds=INTERVAL_BOUNDS):
+        self.bounds = bounds
+        self.count = 0
+        self.current_second = int(monotonic())
+        self.buckets = [[0] * len(bounds) for _ in range(HISTORY_SECONDS)]
+        self.totals = [0] * len(bounds)
+
+    def record(self, value, now=None):
+        if now is None:
+            now = monotonic()
+        second = int(now)
+        if second != self.current_second:
+            for skipped in range(self.current_second + 1, min(second, self.current_second + HISTORY_SECONDS) + 1):
+                self.buckets[skipped % HISTORY_SECONDS] = [0] * len(self.bounds)
+            self.current_second = second
+        bin_index = bisect_left(self.bounds, value)
+        self.buckets[second % HISTORY_SECONDS][bin_index] += 1
+        self.totals[bin_index] += 1
+        self.count += 1
+
+    def reset_totals(self):
+        self.totals = [0] * len(self.bounds)
+
+    def total_quantiles(self):
+        return histogram_quantiles(self.totals, self.bounds)
+
+    def quantiles(self, window=max(WINDOWS), now=None):
+        if now is None:
+            now = monotonic()
+        histogram = [0] * len(self.bounds)
+        for index in completed_buckets(int(now), self.current_second, window):
+            for bin_index, count in enumerate(self.buckets[index]):
+                histogram[bin_index] += count
+        return histogram_quantiles(histogram, self.bounds)
+
+
+class StreamMetrics:
+    """Counters of one stream, written only by the streaming thread.
+
+    Frames, objects and frame intervals are accumulated in one-second buckets
+    of a ring covering the longest rolling window, so recording a frame is a
+    handful of list operations and needs no lock. Readers compute rolling
+    rates and percentiles from completed buckets.
+    """
+
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.frames_total = 0
+        self.objects_total = 0
+        self.last_frame_time = None
+        self.current_second = int(monotonic())
+        self.frames = [0] * HISTORY_SECONDS
+        self.objects = [0] * HISTORY_SECONDS
+        self.intervals = [[0] * len(INTERVAL_BOUNDS) for _ in range(HISTORY_SECONDS)]
+
+    def _advance(self, second):
+        # Clear the buckets of every second skipped since the last frame
+        for skipped in range(self.current_second + 1, min(second, self.current_second + HISTORY_SECONDS) + 1):
+            index = skipped % HISTORY_SECONDS
+            self.frames[index] = 0
+            self.objects[index] = 0
+            self.intervals[index] = [0] * len(INTERVAL_BOUNDS)
+        self.current_second = second
+
+    def record_frame(self, num_objects, now=None):
+        if now is None:
+            now = monotonic()
+        second = int(now)
+        if second != self.current_second:
+            self._advance(second)
+        index = second % HISTORY_SECONDS
+        self.frames[index] += 1
+        self.objects[index] += num_objects
+        if self.last_frame_time is not None:
+            self.intervals[index][bisect_left(INTERVAL_BOUNDS, now - self.last_frame_time)] += 1
+        self.last_frame_time = now
+        self.frames_total += 1
+        self.objects_total += num_objects
+
+    def snapshot(self, now=None):
+        if now is None:
+            now = monotonic()
+        second = int(now)
+        current_second = self.current_second
+
+        def window_sum(buckets, window):
+            return sum(buckets[index] for index in completed_buckets(second, current_second, window))
+
+        histogram = [0] * len(INTERVAL_BOUNDS)
+        for index in completed_buckets(second, current_second, max(WINDOWS)):
+            for bin_index, count in enumerate(self.intervals[index]):
+                histogram[bin_index] += count
+        quantiles = histogram_quantiles(histogram, INTERVAL_BOUNDS)
+
+        return {
+            "frames_total": self.frames_total,
+            "objects_total": self.objects_total,
+            "fps": {f"{w}s": round(window_sum(self.frames, w) / w, 2) for w in WINDOWS},
+            "objects_per_second": {f"{w}s": round(window_sum(self.objects, w) / w, 2) for w in WINDOWS},
+            "frame_interval_ms": {
+                f"p{int(q * 100)}": (round(v * 1000, 2) if v is not None else None) for q, v in quantiles.items()
+            },
+            "seconds_since_last_frame": round(now - self.last_frame_time, 3) if self.last_frame_time else None,
+        }
+
+
+class Metrics:
+    """Per-stream metrics fed by the probes and published from the GLib main loop.
+
+    publish() builds a JSON snapshot and the Prometheus text exposition once
+    per interval; the HTTP endpoint only serves the last published copy, so
+    scrapes never touch the counters the streaming thread writes. Other
+    subsystems add samples through register_collector().
+    """
+
+    def __init__(self, num_streams=1):
+        self.streams = [StreamMetrics(i) for i in range(num_streams)]
+        self.removed_streams = set()
+        self.collectors = []
+        self.started = monotonic()
+        self.snapshot_json = "{}"
+        self.snapshot_text = ""
+        self.server = None
+
+    def add_stream(self, stream_id):
+        while len(self.streams) <= stream_id:
+            self.streams.append(StreamMetrics(len(self.streams)))
+        return self.streams[stream_id]
+
+    def reset_stream(self, stream_id):
+        """Start the counters of `stream_id` from zero, for a new source taking its slot."""
+        self.add_stream(stream_id)
+        self.streams[stream_id] = StreamMetrics(stream_id)
+        self.removed_streams.discard(stream_id)
+
+    def remove_stream(self, stream_id):
+        """Leave a stream whose source was removed out of the snapshots."""
+        self.removed_streams.add(stream_id)
+
+    def record_frame(self, stream_id, num_objects=0):
+        try:
+            stream = self.streams[stream_id]
+        except IndexError:
+            stream = self.add_stream(stream_id)
+        stream.record_frame(num_objects)
+
+    def register_collector(self, collector):
+        """Register a callable returning (name, type, help, labels, value) samples at publish time."""
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        now = monotonic()
+        streams = {f"stream{s.stream_id}": s.snapshot(now) for s in self.streams
+                   if s.stream_id not in self.removed_streams}
+        samples = []
+        for collector in self.collectors:
+            samples.extend(collector())
+        return {"uptime_seconds": round(now - self.started, 1), "streams": streams, "samples": samples}
+
+    def prometheus_text(self, snapshot):
+        lines = []
+
+        def family(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        streams = snapshot["streams"]
+        family("deepstream_frames_total", "counter", "Frames processed per stream.",
+               [({"stream": k[6:]}, v["frames_total"]) for k, v in streams.items()])
+        family("deepstream_objects_total", "counter", "Objects detected per stream.",
+               [({"stream": k[6:]}, v["objects_total"]) for k, v in streams.items()])
+        family("deepstream_fps", "gauge", "Frames per second over a rolling window.",
+               [({"stream": k[6:], "window": w}, fps) for k, v in streams.items() for w, fps in v["fps"].items()])
+        family("deepstream_objects_per_second", "gauge", "Objects per second over a rolling window.",
+               [({"stream": k[6:], "window": w}, ops) for k, v in streams.items()
+                for w, ops in v["objects_per_second"].items()])
+        family("deepstream_frame_interval_seconds", "summary", "Frame interval over the last 60 seconds.",
+               [({"stream": k[6:], "quantile": f"0.{p[1:]}"}, ms / 1000 if ms is not None else None)
+                for k, v in streams.items() for p, ms in v["frame_interval_ms"].items()])
+
+        grouped = {}
+        for name, metric_type, help_text, labels, value in snapshot["samples"]:
+            grouped.setdefault((name, metric_type, help_text), []).append((labels, value))
+        for (name, metric_type, help_text), samples in grouped.items():
+            family(name, metric_type, help_text, samples)
+        return "\n".join(lines) + "\n"
+
+    def publish(self):
+        snapshot = self.snapshot()
+        self.snapshot_text = self.prometheus_text(snapshot)
+        snapshot["samples"] = [
+            {"name": name, "labels": labels, "value": value} for name, _, _, labels, value in snapshot["samples"]
+        ]
+        self.snapshot_json = json.dumps(snapshot)
+        return snapshot
+
+    def perf_print_callback(self):
+        """GLib timeout callback: publish a new snapshot and print the frame rates."""
+        snapshot = self.publish()
+        perf = {name: stream["fps"]["10s"] for name, stream in snapshot["streams"].items()}
+        print("\n**PERF: ", perf, "\n")
+        return True
+
+    def start_server(self, port, host="127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.snapshot_text, "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = metrics.snapshot_json, "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"Warning: Unable to serve metrics on port {port}: {e}. Continuing without the metrics endpoint.")
+            return
+        threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"Metrics available at http://{host}:{port}/metrics and /metrics.json")
+
+    def stop_server(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
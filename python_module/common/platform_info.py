@@ -15,21 +15,33 @@
 # limitations under the License.
 ################################################################################
 
+import os
 import sys
+import json
 import platform
 from threading import Lock
-from cuda import cudart
-from cuda import cuda
 
 guard_platform_info = Lock()
 
-import sys
-import platform
-from threading import Lock
-from cuda import cudart
-from cuda import cuda
+# Platform checks persisted across runs, valid while the kernel and driver are unchanged
+PLATFORM_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'deepstream-yolo-e2e', 'platform_info.json')
+
+
+def read_first_line(path):
+    try:
+        with open(path, "r") as file:
+            return file.readline().strip()
+    except OSError:
+        return None
+
+
+def platform_cache_key():
+    """Kernel release and NVIDIA driver (dGPU) or L4T (Jetson) version."""
+    driver = (read_first_line("/sys/module/nvidia/version")
+              or read_first_line("/proc/driver/nvidia/version")
+              or read_first_line("/etc/nv_tegra_release"))
+    return {"kernel": platform.release(), "machine": platform.machine(), "driver": driver}
 
-guard_platform_info = Lock()
 
 class PlatformInfo:
     def __init__(self):
@@ -41,6 +53,9 @@ class PlatformInfo:
         self.is_aarch64_verified = False
         self.is_jetson_nano = False
         self.is_jetson = False
+        self.device_model = None
+        self.gpu_name = None
+        self.from_cache = False
 
     def is_wsl(self):
         with guard_platform_info:
@@ -58,6 +73,9 @@ class PlatformInfo:
     def is_integrated_gpu(self):
         with guard_platform_info:
             if not self.is_integrated_gpu_verified:
+                # Imported here: loading the CUDA bindings is only needed on a cache miss
+                from cuda import cudart
+                from cuda import cuda
                 cuda_init_result, = cuda.cuInit(0)
                 if cuda_init_result == cuda.CUresult.CUDA_SUCCESS:
                     device_count_result, num_devices = cuda.cuDeviceGetCount()
@@ -66,6 +84,10 @@ class PlatformInfo:
                             property_result, properties = cudart.cudaGetDeviceProperties(0)
                             if property_result == cuda.CUresult.CUDA_SUCCESS:
                                 self.is_integrated_gpu_system = properties.integrated
+                                name = properties.name
+                                if isinstance(name, bytes):
+                                    name = name.split(b'\0', 1)[0].decode(errors='replace')
+                                self.gpu_name = f"{name} (sm_{properties.major}{properties.minor})"
                                 self.is_integrated_gpu_verified = True
                             else:
                                 print("ERROR: Getting cuda device property failed: {}".format(property_result))
@@ -84,30 +106,92 @@ class PlatformInfo:
             self.is_aarch64_verified = True
         return self.is_aarch64_platform
 
-    def is_jetson_device(self):
-        """Checks if the device is an NVIDIA Jetson."""
-        if self.is_platform_aarch64():
+    def _read_device_model(self):
+        if self.device_model is None:
             try:
                 with open("/proc/device-tree/model", "r") as file:
-                    model_info = file.read()
-                    self.is_jetson = "NVIDIA Jetson" in model_info
+                    self.device_model = file.read()
             except FileNotFoundError:
                 raise RuntimeError("ERROR: /proc/device-tree/model not found. "
                                    "Run Docker as privileged with the --privileged flag.")
+            self.is_jetson = "NVIDIA Jetson" in self.device_model
+            self.is_jetson_nano = self.is_jetson and "Orin Nano" in self.device_model
+        return self.device_model
+
+    def is_jetson_device(self):
+        """Checks if the device is an NVIDIA Jetson."""
+        if self.is_platform_aarch64():
+            self._read_device_model()
         return self.is_jetson
     
     def is_jetson_nano_device(self):
         """Checks if the device is specifically a Jetson Nano."""
         if self.is_jetson_device():
-            try:
-                with open("/proc/device-tree/model", "r") as file:
-                    model_info = file.read()
-                    self.is_jetson_nano = "Orin Nano" in model_info
-            except FileNotFoundError:
-                raise RuntimeError("ERROR: /proc/device-tree/model not found. "
-                                   "Run Docker as privileged with the --privileged flag.")
+            self._read_device_model()
         return self.is_jetson_nano
 
+    def get_gpu_name(self):
+        """Name and compute capability of GPU 0, e.g. 'NVIDIA GeForce RTX 3090 (sm_86)'."""
+        self.is_integrated_gpu()
+        return self.gpu_name or "Unknown GPU"
+
+    def to_dict(self):
+        return {
+            "is_wsl": self.is_wsl(),
+            "is_integrated_gpu": self.is_integrated_gpu(),
+            "is_aarch64": self.is_platform_aarch64(),
+            "is_jetson": self.is_jetson_device(),
+            "is_jetson_nano": self.is_jetson_nano_device(),
+            "device_model": self.device_model,
+            "gpu_name": self.get_gpu_name(),
+        }
+
+    def load_dict(self, values):
+        # Caches written before a field was added are missing it and get refreshed
+        self.gpu_name = values["gpu_name"]
+        self.is_wsl_system = values["is_wsl"]
+        self.is_integrated_gpu_system = values["is_integrated_gpu"]
+        self.is_aarch64_platform = values["is_aarch64"]
+        self.is_jetson = values["is_jetson"]
+        self.is_jetson_nano = values["is_jetson_nano"]
+        self.device_model = values.get("device_model") or ""
+        self.wsl_verified = self.is_integrated_gpu_verified = self.is_aarch64_verified = True
+        self.from_cache = True
 
-sys.path.append('/opt/nvidia/deepstream/deepstream/lib')
 
+_platform_info = None
+
+
+def get_platform_info(cache_file=PLATFORM_CACHE_FILE):
+    """Return the process-wide PlatformInfo.
+
+    The checks run once per process. Their results are also persisted to
+    `cache_file`, keyed by kernel and driver version, so later processes on
+    the same host skip cuInit and the device-tree reads altogether.
+    """
+    global _platform_info
+    if _platform_info is not None:
+        return _platform_info
+    platform_info = PlatformInfo()
+    key = platform_cache_key()
+    try:
+        with open(cache_file, "r") as file:
+            cached = json.load(file)
+        if cached.get("key") == key:
+            platform_info.load_dict(cached["platform"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if not platform_info.from_cache:
+        values = platform_info.to_dict()
+        if platform_info.is_integrated_gpu_verified:
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                with open(cache_file, "w") as file:
+                    json.dump({"key": key, "platform": values}, file)
+            except OSError as e:
+                print(f"Warning: Unable to write platform cache {cache_file}: {e}")
+    _platform_info = platform_info
+    return platform_info
+
+
+sys.path.append('/opt/nvidia/deepstream/deepstream/lib')
@@ -0,0 +1,67 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+from time import monotonic
+
+
+def process_age():
+    """Seconds since this process was started, from /proc, or 0.0 when unavailable."""
+    try:
+        with open('/proc/self/stat', 'r') as file:
+            # Fields after the command name, which may itself contain spaces
+            fields = file.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime', 'r') as file:
+            uptime = float(file.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupTimer:
+    """Time the startup phases of the application, from process start to the first frame.
+
+    mark() records the end of a phase; the duration of each phase is the time
+    since the previous mark, the first one being measured from the start of
+    the process so interpreter start-up and imports are included.
+    """
+
+    def __init__(self):
+        self.started = monotonic() - process_age()
+        self.last = self.started
+        self.phases = []
+        self.notes = {}
+
+    def mark(self, phase):
+        now = monotonic()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def note(self, key, value):
+        self.notes[key] = value
+
+    def report(self):
+        phases = {phase: round(seconds, 3) for phase, seconds in self.phases}
+        report = {"phases_seconds": phases, "total_seconds": round(self.last - self.started, 3)}
+        report.update(self.notes)
+        return report
+
+    def metrics_samples(self):
+        """Metrics collector: duration of each startup phase."""
+        return [("deepstream_startup_phase_seconds", "gauge", "Duration of each startup phase.",
+                 {"phase": phase}, round(seconds, 3)) for phase, seconds in self.phases]
+
+    def print_report(self):
+        print("\n**STARTUP: ", self.report(), "\n")
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,240 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import heapq
+
+TRAIL_LENGTH = 20
+INITIAL_SLOTS = 256
+EXPIRATION_UNITS = ("frames", "seconds")
+
+
+class TrailStore:
+    """Fixed-capacity trail history for tracked objects.
+
+    Every (stream, object_id) pair is mapped to a compact slot index, through
+    one dict of object ids per stream so the lookup needs no tuple key. Each slot
+    owns a preallocated ring of `capacity` points, so an object's memory is
+    bounded and appending a point never allocates. Released slots go back to a
+    free list and are reused, ring included, by new objects; the slot table
+    doubles in size when it runs out.
+
+    Each point is written twice, at its ring position and `capacity` positions
+    later, so the trail is always one contiguous window of the ring:
+    trail_view() hands that window to the renderer without copying it.
+
+    Objects expire `expiration` units after they were last seen, measured on
+    the clock of their own stream: either its frame number or its PTS in
+    seconds, as selected by `expiration_unit`. Each stream keeps a min-heap of
+    (deadline, slot, generation) entries with at most one entry per slot, so
+    expire() only touches objects whose deadline has passed. An entry whose
+    object was seen again in the meantime is pushed back with its new deadline.
+    """
+
+    def __init__(self, capacity=TRAIL_LENGTH, initial_slots=INITIAL_SLOTS, expiration=60, expiration_unit="frames"):
+        if expiration_unit not in EXPIRATION_UNITS:
+            raise ValueError(f"Invalid expiration unit '{expiration_unit}'. Use one of {EXPIRATION_UNITS}.")
+        self.capacity = capacity
+        self.expiration = expiration
+        self.expiration_unit = expiration_unit
+        # Flat [x0, y0, x1, y1, ...] offset of the mirrored copy of a point
+        self.mirror = capacity * 2
+        self.num_slots = 0
+        self.stream_slots = {}
+        self.free_slots = []
+        self.keys = []
+        self.rings = []
+        # Flat offsets: the next point is written at ring[head], the trail holds `count` values
+        self.heads = []
+        self.counts = []
+        self.last_seen = []
+        self.generations = []
+        self.expiry_heaps = {}
+        self._grow(initial_slots)
+
+    def _grow(self, new_size):
+        old_size = self.num_slots
+        grow_by = new_size - old_size
+        self.keys.extend([None] * grow_by)
+        self.rings.extend([0] * (self.mirror * 2) for _ in range(grow_by))
+        self.heads.extend([0] * grow_by)
+        self.counts.extend([0] * grow_by)
+        self.last_seen.extend([0] * grow_by)
+        self.generations.extend([0] * grow_by)
+        # Pop from the end so the lowest slot indices are handed out first
+        self.free_slots.extend(range(new_size - 1, old_size - 1, -1))
+        self.num_slots = new_size
+
+    def _acquire(self, key, timestamp):
+        if not self.free_slots:
+            self._grow(self.num_slots * 2)
+        slot = self.free_slots.pop()
+        self.stream_slots.setdefault(key[0], {})[key[1]] = slot
+        self.keys[slot] = key
+        self.heads[slot] = 0
+        self.counts[slot] = 0
+        self.generations[slot] += 1
+        heap = self.expiry_heaps.setdefault(key[0], [])
+        heapq.heappush(heap, (timestamp + self.expiration, slot, self.generations[slot]))
+        return slot
+
+    def append(self, stream_id, object_id, x, y, timestamp):
+        """Append a point to the trail of an object and return its slot.
+
+        `timestamp` is the current frame number or PTS in seconds of the stream,
+        matching `expiration_unit`.
+        """
+        objects = self.stream_slots.get(stream_id)
+        slot = objects.get(object_id) if objects is not None else None
+        if slot is None:
+            slot = self._acquire((stream_id, object_id), timestamp)
+        ring = self.rings[slot]
+        head = self.heads[slot]
+        mirror = self.mirror
+        ring[head] = ring[head + mirror] = x
+        ring[head + 1] = ring[head + mirror + 1] = y
+        head += 2
+        self.heads[slot] = 0 if head == mirror else head
+        counts = self.counts
+        if counts[slot] < mirror:
+            counts[slot] += 2
+        self.last_seen[slot] = timestamp
+        return slot
+
+    def trail_view(self, slot):
+        """Return (ring, start, end): the trail of a slot is ring[start:end], flat and oldest first.
+
+        The ring is the slot's own storage, valid until the next append() to
+        the slot; read it in place rather than slicing it.
+        """
+        count = self.counts[slot]
+        # Until the ring is full the oldest point is at 0; then it is the one the head overwrites next
+        start = self.heads[slot] if count == self.mirror else 0
+        return self.rings[slot], start, start + count
+
+    def trail(self, slot):
+        """Return the points of a slot as a new flat [x0, y0, x1, y1, ...] list, oldest first."""
+        ring, start, end = self.trail_view(slot)
+        return ring[start:end]
+
+    def get(self, stream_id, object_id):
+        """Return the trail of an object, or None if it is not tracked."""
+        slot = self.stream_slots.get(stream_id, {}).get(object_id)
+        if slot is None:
+            return None
+        return self.trail(slot)
+
+    def release(self, slot):
+        key = self.keys[slot]
+        if key is None:
+            return
+        del self.stream_slots[key[0]][key[1]]
+        self.keys[slot] = None
+        self.free_slots.append(slot)
+
+    def expire(self, stream_id, now):
+        """Release the objects of a stream not seen for more than `expiration` units.
+
+        Returns the number of released objects.
+        """
+        heap = self.expiry_heaps.get(stream_id)
+        released = 0
+        while heap and heap[0][0] < now:
+            _, slot, generation = heapq.heappop(heap)
+            if self.generations[slot] != generation or self.keys[slot] is None:
+                continue  # slot was released or reused since this entry was pushed
+            deadline = self.last_seen[slot] + self.expiration
+            if deadline < now:
+                self.release(slot)
+                released += 1
+            else:
+                heapq.heappush(heap, (deadline, slot, generation))
+        return released
+
+    def release_stream(self, stream_id):
+        """Release every object of a stream, e.g. once its source was removed."""
+        for slot in list(self.stream_slots.get(stream_id, {}).values()):
+            self.release(slot)
+        self.stream_slots.pop(stream_id, None)
+        self.expiry_heaps.pop(stream_id, None)
+
+    def __len__(self):
+        return self.num_slots - len(self.free_slots)
+
+
+def _benchmark(num_streams=16, objects_per_frame=100, frames=100):
+    """Compare the per-object cost of TrailStore with the previous list-based trails.
+
+    Each object appends a point and reads its trail back for drawing. The hot
+    path alone is timed separately from a run that also expires objects, since
+    the previous code scanned every object of the pad on each frame to do so.
+    """
+    import time
+    import random
+    from collections import defaultdict
+
+    rng = random.Random(0)
+    coords = [[[(rng.randrange(1920), rng.randrange(1080)) for _ in range(objects_per_frame)]
+               for _ in range(num_streams)] for _ in range(frames)]
+
+    def run_lists(purge):
+        object_trackers = defaultdict(lambda: defaultdict(list))
+        last_seen = defaultdict(lambda: defaultdict(int))
+        points = 0
+        start = time.perf_counter()
+        for frame_number in range(frames):
+            for pad_index in range(num_streams):
+                for object_id in range(objects_per_frame):
+                    x, y = coords[frame_number][pad_index][object_id]
+                    trail = object_trackers[pad_index][object_id]
+                    trail.append((x, y))
+                    last_seen[pad_index][object_id] = frame_number
+                    if len(trail) > TRAIL_LENGTH:
+                        trail.pop(0)
+                    points += len(trail)
+                if not purge:
+                    continue
+                # purge_old_objects() was called once per frame meta
+                for pad, objects in list(object_trackers.items()):
+                    for obj in list(objects.keys()):
+                        if frame_number - last_seen[pad][obj] > 60:
+                            del object_trackers[pad][obj]
+                            del last_seen[pad][obj]
+                        elif len(object_trackers[pad][obj]) > 25:
+                            object_trackers[pad][obj] = object_trackers[pad][obj][-25:]
+        return time.perf_counter() - start, points
+
+    def run_store(purge):
+        store = TrailStore(expiration=60)
+        points = 0
+        start = time.perf_counter()
+        for frame_number in range(frames):
+            for pad_index in range(num_streams):
+                for object_id in range(objects_per_frame):
+                    x, y = coords[frame_number][pad_index][object_id]
+                    slot = store.append(pad_index, object_id, x, y, frame_number)
+                    _, trail_start, trail_end = store.trail_view(slot)
+                    points += (trail_end - trail_start) // 2
+                if purge:
+                    store.expire(pad_index, frame_number)
+        return time.perf_counter() - start, points
+
+    total_objects = frames * num_streams * objects_per_frame
+    print(f"{num_streams} streams x {objects_per_frame} objects x {frames} frames, trail length {TRAIL_LENGTH}")
+    for purge in (False, True):
+        print("append, read and expire:" if purge else "append and read:")
+        for name, func in (("defaultdict lists", run_lists), ("TrailStore", run_store)):
+            elapsed, points = func(purge)
+            print(f"  {name:<18} {elapsed * 1e9 / total_objects:10.1f} ns/object  ({elapsed:.2f}s total, {points} trail points read)")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -18,8 +18,9 @@
 import ctypes
 import sys
 import os
+import math
 from collections import namedtuple
-import random
+import colorsys
 
 sys.path.append('/opt/nvidia/deepstream/deepstream/lib')
 
@@ -30,6 +31,12 @@ RESET = "\033[0m"  # Reset color
 GREEN = "\033[92m"  # Green for success messages
 
 ColorObject = namedtuple("ColorObject", ["red", "green", "blue", "alpha"])
+LabelStyle = namedtuple("LabelStyle", ["text", "color", "border_color", "bg_color", "text_bg_color", "font_sizes"])
+
+# Font size bands of the OSD label, indexed by bounding box height in pixels
+MIN_FONT_SIZE = 6
+MAX_FONT_SIZE = 10
+FONT_BAND_HEIGHT = 100
 
 
 def long_to_uint64(l):
@@ -52,9 +59,9 @@ def display_message(msg_type="d", message=None):
 
 
 
-def create_dynamic_labels(config_path):
-    """Create dynamic colors for labels based on the label file path specified in the config."""
-    
+def load_labels(config_path):
+    """Load the labels of the label file path specified in the config."""
+
     # Load label file path from the configuration
     label_file_path = None
     with open(config_path, 'r') as file:
@@ -67,15 +74,47 @@ def create_dynamic_labels(config_path):
     labels = []
     with open(label_file_path, 'r') as file:
         labels = [line.strip() for line in file if line.strip()]
+    return labels
+
+
+def label_color(class_id):
+    """Return a stable colour for a class id, spreading hues by the golden ratio."""
+    hue = (class_id * 0.618033988749895) % 1.0
+    red, green, blue = colorsys.hsv_to_rgb(hue, 0.75, 0.95)
+    return ColorObject(red=red, green=green, blue=blue, alpha=1.0)
+
+
+def label_font_sizes(number_sources):
+    """Return the OSD font size for every bounding box height from 0 to FONT_BAND_HEIGHT pixels."""
+    max_fsize = max(MIN_FONT_SIZE, MAX_FONT_SIZE - (number_sources - 1))
+    font_sizes = []
+    for height in range(FONT_BAND_HEIGHT + 1):
+        font_size = MIN_FONT_SIZE + (max_fsize - MIN_FONT_SIZE) * (height / FONT_BAND_HEIGHT)
+        font_sizes.append(max(MIN_FONT_SIZE, min(max_fsize, int(font_size))))
+    return tuple(font_sizes)
+
+
+def create_label_style(class_id, text, font_sizes):
+    color = label_color(class_id)
+    return LabelStyle(
+        text=text.capitalize(),
+        color=color,
+        border_color=(color.red, color.green, color.blue, 1.0),
+        bg_color=(color.red, color.green, color.blue, 0.0),
+        text_bg_color=(color.red, color.green, color.blue, 0.5),
+        font_sizes=font_sizes,
+    )
+
+
+def create_label_styles(config_path, number_sources):
+    """Build the per-class OSD style table once from the label file specified in the config."""
+    font_sizes = label_font_sizes(number_sources)
+    labels = load_labels(config_path)
+    return {idx: create_label_style(idx, label, font_sizes) for idx, label in enumerate(labels)}
+
 
-    # Generate random colors for each label ID (index)
-    dynamic_labels = {}
-    for idx, label in enumerate(labels):
-        dynamic_labels[idx] = ColorObject(
-            red=random.random(),
-            green=random.random(),
-            blue=random.random(),
-            alpha=1.0  # Alpha is set to 1 for full opacity
-        )
-
-    return dynamic_labels
+def tiler_grid(number_sources):
+    """Return the (rows, columns) of the tiled output for `number_sources` tiles."""
+    rows = max(1, int(math.sqrt(number_sources)))
+    columns = max(1, int(math.ceil((1.0 * number_sources) / rows)))
+    return rows, columns
@@ -0,0 +1,89 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import numpy as np
+from python_module.component.probes import ProbeHandler
+
+# One row per detected object of a batch
+DETECTION_DTYPE = np.dtype([
+    ("stream_id", np.uint16),
+    ("frame_num", np.int32),
+    ("pts", np.uint64),
+    ("object_id", np.uint64),
+    ("class_id", np.int16),
+    ("confidence", np.float32),
+    ("left", np.float32),
+    ("top", np.float32),
+    ("width", np.float32),
+    ("height", np.float32),
+    ("tracker_confidence", np.float32),
+    ("tracker_left", np.float32),
+    ("tracker_top", np.float32),
+    ("tracker_width", np.float32),
+    ("tracker_height", np.float32),
+])
+
+INITIAL_CAPACITY = 1024
+
+
+class DetectionExtractor(ProbeHandler):
+    """Convert each NvDsBatchMeta into rows of a reusable structured NumPy array.
+
+    The array is preallocated and doubles in size when a batch does not fit, so
+    steady-state batches never allocate. At the end of every batch each consumer
+    is called with a view of the filled rows. The view is only valid until the
+    next batch; consumers that keep detections must copy them.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.detections = np.zeros(capacity, dtype=DETECTION_DTYPE)
+        self.count = 0
+        self.consumers = []
+        self.stream_id = 0
+        self.frame_num = 0
+        self.pts = 0
+
+    def add_consumer(self, consumer):
+        """Register a callable receiving the detections of each batch."""
+        self.consumers.append(consumer)
+
+    def _grow(self):
+        detections = np.zeros(len(self.detections) * 2, dtype=DETECTION_DTYPE)
+        detections[:self.count] = self.detections[:self.count]
+        self.detections = detections
+
+    def on_batch_start(self, batch_meta):
+        self.count = 0
+
+    def on_frame(self, batch_meta, frame_meta):
+        self.stream_id = frame_meta.pad_index
+        self.frame_num = frame_meta.frame_num
+        self.pts = frame_meta.buf_pts
+
+    def on_object(self, batch_meta, frame_meta, obj_meta):
+        if self.count == len(self.detections):
+            self._grow()
+        bbox = obj_meta.detector_bbox_info.org_bbox_coords
+        tracker_bbox = obj_meta.tracker_bbox_info.org_bbox_coords
+        self.detections[self.count] = (
+            self.stream_id, self.frame_num, self.pts,
+            obj_meta.object_id, obj_meta.class_id, obj_meta.confidence,
+            bbox.left, bbox.top, bbox.width, bbox.height,
+            obj_meta.tracker_confidence,
+            tracker_bbox.left, tracker_bbox.top, tracker_bbox.width, tracker_bbox.height,
+        )
+        self.count += 1
+
+    def on_batch_end(self, batch_meta):
+        batch = self.detections[:self.count]
+        for consumer in self.consumers:
+            consumer(batch)
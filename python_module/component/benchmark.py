@@ -0,0 +1,267 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+import json
+import socket
+import platform
+import threading
+import subprocess
+from datetime import datetime
+from time import monotonic
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+
+REPORT_VERSION = 1
+TICK_MS = 250
+
+
+def read_cpu_times():
+    """Return (busy, total) jiffies of all CPUs from /proc/stat, or None when unavailable."""
+    try:
+        with open('/proc/stat', 'r') as file:
+            fields = [int(value) for value in file.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    return sum(fields) - idle, sum(fields)
+
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True, timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class GpuSampler:
+    """Sample GPU utilisation and memory once per second from a long-running nvidia-smi.
+
+    nvidia-smi is not available on Jetson devices; samples are then empty and
+    the report shows null GPU figures.
+    """
+
+    def __init__(self, gpu_index=0):
+        self.gpu_index = gpu_index
+        self.name = None
+        self.driver_version = None
+        self.samples = []
+        self.process = None
+        self.recording = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        try:
+            result = subprocess.run(
+                ['nvidia-smi', '--query-gpu=name,driver_version', '--format=csv,noheader', '-i', str(self.gpu_index)],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=10)
+            self.name, self.driver_version = [value.strip() for value in result.stdout.strip().split(',', 1)]
+            self.process = subprocess.Popen(
+                ['nvidia-smi', '--query-gpu=utilization.gpu,memory.used', '--format=csv,noheader,nounits',
+                 '-i', str(self.gpu_index), '-lms', '1000'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        except (OSError, ValueError, subprocess.SubprocessError):
+            self.process = None
+            return
+        threading.Thread(target=self._read, name="gpu-sampler", daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            try:
+                utilization, memory_used = [float(value) for value in line.split(',')]
+            except ValueError:
+                continue
+            with self.lock:
+                if self.recording:
+                    self.samples.append((utilization, memory_used))
+
+    def begin(self):
+        with self.lock:
+            self.samples = []
+            self.recording = True
+
+    def stop(self):
+        with self.lock:
+            self.recording = False
+        if self.process:
+            self.process.terminate()
+            self.process = None
+
+    def summary(self):
+        with self.lock:
+            samples = list(self.samples)
+        if not samples:
+            return {"gpu_percent_mean": None, "gpu_percent_max": None, "gpu_memory_used_mb_max": None}
+        return {
+            "gpu_percent_mean": round(sum(s[0] for s in samples) / len(samples), 1),
+            "gpu_percent_max": max(s[0] for s in samples),
+            "gpu_memory_used_mb_max": max(s[1] for s in samples),
+        }
+
+
+class BenchmarkRun:
+    """Measure a headless run of the pipeline and write a JSON report.
+
+    The warm-up starts with the first processed frame, so engine loading and
+    source start-up are never measured. Once `warmup` seconds have passed the
+    frame counters, CPU times, GPU samples and latency histograms are reset,
+    and the measurement lasts `duration` seconds or until `max_frames` frames
+    (all streams) have been processed, whichever comes first. Dropped frames
+    are not reported: benchmarks render to fakesink sync=0, which posts no
+    QoS, and every frame reaching the streammux is processed.
+    The main loop is then stopped; a run that ends early on EOS is reported
+    with status "eos".
+    """
+
+    def __init__(self, metrics, loop, duration=60, max_frames=0, warmup=10, latency_tracker=None):
+        self.metrics = metrics
+        self.loop = loop
+        self.duration = duration
+        self.max_frames = max_frames
+        self.warmup = warmup
+        self.latency_tracker = latency_tracker
+        self.gpu_sampler = GpuSampler()
+
+        self.state = "waiting"
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.first_frame_time = None
+        self.begin_time = None
+        self.end_time = None
+        self.begin_frames = []
+        self.end_frames = []
+        self.begin_cpu = None
+        self.end_cpu = None
+        self.begin_process_cpu = None
+        self.end_process_cpu = None
+
+    def start(self):
+        self.gpu_sampler.start()
+        GLib.timeout_add(TICK_MS, self.tick)
+
+    def frame_counts(self):
+        return [stream.frames_total for stream in self.metrics.streams]
+
+    def _begin(self, now):
+        self.state = "measuring"
+        self.begin_time = now
+        self.begin_frames = self.frame_counts()
+        self.begin_cpu = read_cpu_times()
+        times = os.times()
+        self.begin_process_cpu = times.user + times.system
+        self.gpu_sampler.begin()
+        if self.latency_tracker:
+            self.latency_tracker.reset_totals()
+        print(f"Benchmark: warm-up done, measuring for {self.duration}s"
+              + (f" or {self.max_frames} frames" if self.max_frames else ""))
+
+    def _end(self, now, state):
+        self.state = state
+        self.end_time = now
+        self.end_frames = self.frame_counts()
+        self.end_cpu = read_cpu_times()
+        times = os.times()
+        self.end_process_cpu = times.user + times.system
+        self.gpu_sampler.stop()
+
+    def tick(self):
+        """GLib timeout callback driving the warm-up and measurement phases."""
+        now = monotonic()
+        if self.state == "waiting":
+            if sum(self.frame_counts()) > 0:
+                self.state = "warmup"
+                self.first_frame_time = now
+                print(f"Benchmark: first frame received, warming up for {self.warmup}s")
+        if self.state == "warmup" and now - self.first_frame_time >= self.warmup:
+            self._begin(now)
+        if self.state == "measuring":
+            measured_frames = sum(self.frame_counts()) - sum(self.begin_frames)
+            if now - self.begin_time >= self.duration or (self.max_frames and measured_frames >= self.max_frames):
+                self._end(now, "complete")
+                self.loop.quit()
+                return False
+        return True
+
+    def finish(self):
+        """Close the measurement if the pipeline stopped before it completed."""
+        if self.state == "measuring":
+            self._end(monotonic(), "eos")
+        elif self.state in ("waiting", "warmup"):
+            self.state = "no_measurement"
+            self.gpu_sampler.stop()
+
+    def report(self, settings):
+        measured = self.state in ("complete", "eos")
+        elapsed = self.end_time - self.begin_time if measured else 0.0
+        per_stream = {}
+        total_frames = 0
+        if measured:
+            for index, end in enumerate(self.end_frames):
+                begin = self.begin_frames[index] if index < len(self.begin_frames) else 0
+                total_frames += end - begin
+                per_stream[f"stream{index}"] = round((end - begin) / elapsed, 2) if elapsed else None
+
+        utilisation = {"process_cpu_percent": None, "system_cpu_percent": None}
+        if measured and elapsed:
+            utilisation["process_cpu_percent"] = round(100 * (self.end_process_cpu - self.begin_process_cpu) / elapsed, 1)
+            if self.begin_cpu and self.end_cpu and self.end_cpu[1] > self.begin_cpu[1]:
+                busy = self.end_cpu[0] - self.begin_cpu[0]
+                utilisation["system_cpu_percent"] = round(100 * busy / (self.end_cpu[1] - self.begin_cpu[1]), 1)
+        utilisation.update(self.gpu_sampler.summary())
+
+        latency = None
+        if self.latency_tracker and measured:
+            latency = {
+                stage: {f"p{int(q * 100)}": (round(v * 1000, 3) if v is not None else None) for q, v in quantiles.items()}
+                for stage, quantiles in self.latency_tracker.total_latencies().items()
+            }
+
+        return {
+            "report_version": REPORT_VERSION,
+            "started_at": self.started_at,
+            "status": self.state,
+            "measurement": {
+                "warmup_seconds": self.warmup,
+                "requested_duration_seconds": self.duration,
+                "requested_frames": self.max_frames or None,
+                "measured_seconds": round(elapsed, 3),
+                "frames": total_frames,
+            },
+            "fps": {
+                "aggregate": round(total_frames / elapsed, 2) if elapsed else None,
+                "per_stream": per_stream,
+            },
+            "latency_ms": latency,
+            "utilisation": utilisation,
+            "settings": settings,
+            "platform": {
+                "hostname": socket.gethostname(),
+                "machine": platform.machine(),
+                "kernel": platform.release(),
+                "python": platform.python_version(),
+                "gstreamer": Gst.version_string(),
+                "gpu": self.gpu_sampler.name,
+                "gpu_driver": self.gpu_sampler.driver_version,
+                "revision": git_revision(),
+            },
+        }
+
+    def write_report(self, path, settings):
+        report = self.report(settings)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+        return report
@@ -0,0 +1,191 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+import json
+import threading
+from collections import deque
+from datetime import datetime
+import numpy as np
+from python_module.component.batch_extractor import DETECTION_DTYPE
+
+EXPORT_FORMATS = {"jsonl": "jsonl", "binary": "dets"}
+DROP_POLICIES = ("drop-oldest", "drop-newest", "block")
+
+
+def read_detections(path):
+    """Load a binary export file as a structured array of DETECTION_DTYPE records."""
+    return np.fromfile(path, dtype=DETECTION_DTYPE)
+
+
+class DetectionExporter:
+    """Write detections to rotating files from a background thread.
+
+    The probe side only copies the batch and appends it to a bounded queue,
+    measured in records; all file I/O happens in the writer thread. When the
+    queue is full the drop policy decides what happens:
+
+    - drop-oldest: queued batches are discarded to make room for the new one
+    - drop-newest: the new batch is discarded
+    - block: the caller waits until the writer has made room
+
+    Files are rotated once they reach `rotate_bytes`. The binary format is a
+    raw sequence of DETECTION_DTYPE records, readable with read_detections().
+    """
+
+    def __init__(self, directory, export_format="jsonl", max_queue_records=100000,
+                 drop_policy="drop-oldest", rotate_bytes=64 * 1024 * 1024, prefix="detections"):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid export format '{export_format}'. Use one of {tuple(EXPORT_FORMATS)}.")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Invalid drop policy '{drop_policy}'. Use one of {DROP_POLICIES}.")
+        self.directory = directory
+        self.export_format = export_format
+        self.max_queue_records = max_queue_records
+        self.drop_policy = drop_policy
+        self.rotate_bytes = rotate_bytes
+        self.prefix = prefix
+
+        self.queue = deque()
+        self.queued_records = 0
+        self.condition = threading.Condition()
+        self.running = True
+
+        # Counters, in records; updated under `condition` by both put() and the writer thread
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.files_written = 0
+
+        self.file = None
+        self.file_path = None
+        self.file_index = 0
+        self.session = datetime.now().strftime('%Y%m%d%H%M%S')
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._writer, name="detection-exporter", daemon=True)
+        self.thread.start()
+
+    def __call__(self, batch):
+        """DetectionExtractor consumer: queue a copy of the batch."""
+        if len(batch):
+            self.put(batch.copy())
+
+    def put(self, records):
+        """Queue records for writing. Returns False if they were dropped."""
+        num_records = len(records)
+        with self.condition:
+            if not self.running:
+                self.dropped += num_records
+                return False
+            if self.queued_records + num_records > self.max_queue_records:
+                if self.drop_policy == "drop-newest":
+                    self.dropped += num_records
+                    return False
+                if self.drop_policy == "drop-oldest":
+                    while self.queue and self.queued_records + num_records > self.max_queue_records:
+                        oldest = self.queue.popleft()
+                        self.queued_records -= len(oldest)
+                        self.dropped += len(oldest)
+                    if num_records > self.max_queue_records:
+                        self.dropped += num_records - self.max_queue_records
+                        records = records[-self.max_queue_records:]
+                        num_records = len(records)
+                else:
+                    while self.running and self.queue and self.queued_records + num_records > self.max_queue_records:
+                        self.condition.wait()
+            self.queue.append(records)
+            self.queued_records += num_records
+            self.enqueued += num_records
+            self.condition.notify_all()
+        return True
+
+    def _writer(self):
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait()
+                if not self.queue:
+                    break
+                batches = list(self.queue)
+                self.queue.clear()
+                self.queued_records = 0
+                self.condition.notify_all()
+            records = np.concatenate(batches)
+            try:
+                self._write(records)
+            except OSError as e:
+                with self.condition:
+                    self.dropped += len(records)
+                print(f"Error writing detections to {self.file_path}: {e}")
+            else:
+                with self.condition:
+                    self.written += len(records)
+        self._close_file()
+
+    def _open_file(self):
+        self.file_index += 1
+        extension = EXPORT_FORMATS[self.export_format]
+        file_name = f"{self.prefix}_{self.session}_{self.file_index:04d}.{extension}"
+        self.file_path = os.path.join(self.directory, file_name)
+        mode = 'w' if self.export_format == "jsonl" else 'wb'
+        self.file = open(self.file_path, mode)
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.files_written += 1
+
+    def _write(self, records):
+        if self.file is None:
+            self._open_file()
+        if self.export_format == "jsonl":
+            names = records.dtype.names
+            self.file.write("".join(json.dumps(dict(zip(names, row))) + "\n" for row in records.tolist()))
+        else:
+            self.file.write(records.tobytes())
+        self.file.flush()
+        if self.file.tell() >= self.rotate_bytes:
+            self._close_file()
+
+    def stop(self):
+        """Write out everything still queued and stop the writer thread."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
+
+    def stats(self):
+        with self.condition:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "written": self.written,
+                "queued": self.queued_records,
+                "files": self.files_written + (1 if self.file is not None else 0),
+            }
+
+    def metrics_samples(self):
+        """Metrics collector: export counters as (name, type, help, labels, value) samples."""
+        help_text = "Detection records handled by the exporter."
+        stats = self.stats()
+        return [
+            ("deepstream_export_records_total", "counter", help_text, {"state": "enqueued"}, stats["enqueued"]),
+            ("deepstream_export_records_total", "counter", help_text, {"state": "dropped"}, stats["dropped"]),
+            ("deepstream_export_records_total", "counter", help_text, {"state": "written"}, stats["written"]),
+            ("deepstream_export_queue_records", "gauge", "Detection records waiting to be written.", {}, stats["queued"]),
+        ]
+
+    def stats_print_callback(self):
+        print("\n**EXPORT: ", self.stats(), "\n")
+        return True
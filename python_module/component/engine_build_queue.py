@@ -0,0 +1,267 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+import sys
+import json
+import time
+import itertools
+import threading
+import subprocess
+from prettytable import PrettyTable
+from python_module.component.manage_models import download_model
+from python_module.component.engine_registry import EngineRegistry, MODEL_ENGINE_DIR, PRECISIONS, batch_bucket
+
+BUILD_QUEUE_FILE = os.path.join(MODEL_ENGINE_DIR, 'build_queue.json')
+BUILD_SUMMARY_FILE = os.path.join(MODEL_ENGINE_DIR, 'build_summary.json')
+QUEUE_VERSION = 1
+
+
+def load_jobs(path):
+    """Read build jobs from a JSON file.
+
+    The file holds a list of jobs, or {"jobs": [...]}. A job names a catalog
+    model or an ONNX file ("model"), optionally its label file ("labels"),
+    and its "precision", "network_size" and "batch_size"; each of these three
+    may be a list, which expands to one job per combination:
+        {"model": "yolo11s-trt", "precision": "fp16", "network_size": 640, "batch_size": [1, 4, 8]}
+    """
+    with open(path, 'r') as file:
+        specs = json.load(file)
+    if isinstance(specs, dict):
+        specs = specs.get("jobs", [])
+    jobs = []
+    for spec in specs:
+        values = [spec.get(field, default) for field, default in
+                  (("precision", "fp16"), ("network_size", 640), ("batch_size", 1))]
+        values = [value if isinstance(value, list) else [value] for value in values]
+        for precision, network_size, batch_size in itertools.product(*values):
+            if precision not in PRECISIONS:
+                raise ValueError(f"precision of {spec.get('model')} must be one of {PRECISIONS}")
+            jobs.append({
+                "model": spec["model"],
+                "labels": spec.get("labels"),
+                "precision": precision,
+                "network_size": int(network_size),
+                # Engines are built for the batch bucket, so batch 5 and 8 are the same job
+                "batch_size": batch_bucket(int(batch_size)),
+            })
+    return jobs
+
+
+def job_model(job):
+    return os.path.basename(job["model"]).replace(".onnx", "")
+
+
+def job_key(job):
+    return f"{job_model(job)}-{job['precision']}-netsize-{job['network_size']}-batch-{job['batch_size']}"
+
+
+class EngineBuildQueue:
+    """Build many TensorRT engines unattended, e.g. to prepare a node image.
+
+    Jobs are kept in a queue file with their state (pending, running, built,
+    cached or failed), saved after every change, so an interrupted run resumes
+    where it stopped when started again. Before building, a job is looked up
+    in the engine registry and marked cached when a compatible engine of that
+    batch size exists.
+    Each build runs `onnx_to_trt` in its own process pinned to one GPU with
+    CUDA_VISIBLE_DEVICES, up to `jobs_per_gpu` at a time per GPU. Jobs of the
+    same model never run at the same time, so they share its timing cache and
+    every build after the first reuses the tactics already timed. The GPUs
+    are expected to be of the same model: engines are registered for the GPU
+    reported by platform_info.
+    """
+
+    def __init__(self, queue_file=BUILD_QUEUE_FILE, gpus=("0",), jobs_per_gpu=1, build_only=False):
+        self.queue_file = queue_file
+        self.gpus = list(gpus)
+        self.jobs_per_gpu = max(1, jobs_per_gpu)
+        self.build_only = build_only
+        self.lock = threading.Lock()
+        self.queue = self.load()
+
+    def load(self):
+        try:
+            with open(self.queue_file, 'r') as file:
+                queue = json.load(file)
+            if queue.get("version") == QUEUE_VERSION:
+                return queue
+        except (OSError, ValueError):
+            pass
+        return {"version": QUEUE_VERSION, "jobs": {}}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.queue_file) or '.', exist_ok=True)
+        temp_file = f"{self.queue_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w') as file:
+            json.dump(self.queue, file, indent=2)
+        os.replace(temp_file, self.queue_file)
+
+    def add(self, jobs, retry_failed=False):
+        """Queue jobs not queued yet; returns the number added."""
+        added = 0
+        with self.lock:
+            for job in jobs:
+                key = job_key(job)
+                if key not in self.queue["jobs"]:
+                    self.queue["jobs"][key] = dict(job, state="pending")
+                    added += 1
+            for job in self.queue["jobs"].values():
+                # A job still running belongs to a run that was interrupted
+                if job["state"] == "running" or (retry_failed and job["state"] == "failed"):
+                    job["state"] = "pending"
+            self.save()
+        return added
+
+    def set_state(self, key, state, **details):
+        with self.lock:
+            self.queue["jobs"][key].update(details, state=state)
+            self.save()
+
+    def next_job(self, building_models):
+        """Claim the next pending job whose model is not being built; None when there is none."""
+        with self.lock:
+            for key, job in self.queue["jobs"].items():
+                if job["state"] == "pending" and job_model(job) not in building_models:
+                    job["state"] = "running"
+                    building_models.add(job_model(job))
+                    self.save()
+                    return key, dict(job)
+        return None, None
+
+    def resolve_model(self, job):
+        """ONNX and label file of a job, downloading catalog models; (None, None) when unavailable."""
+        if job["model"].endswith(".onnx"):
+            label_file = job.get("labels") or job["model"].replace(".onnx", ".txt")
+            return (job["model"], label_file) if os.path.isfile(job["model"]) else (None, None)
+        model_file, label_file = download_model(job["model"])
+        return model_file, job.get("labels") or label_file
+
+    def run_job(self, key, job, gpu):
+        start_time = time.time()
+        model_file, label_file = self.resolve_model(job)
+        if not model_file:
+            self.set_state(key, "failed", error="model files not available", seconds=0)
+            return
+        registry = EngineRegistry(MODEL_ENGINE_DIR)
+        identity = registry.identity(model_file, job["precision"], job["network_size"])
+        # Only an engine of this very batch counts: a larger one would serve at runtime,
+        # but the node image must hold every engine the jobs ask for
+        engine_file = registry.find_exact(identity, job["batch_size"])
+        if engine_file:
+            print(f"BUILD {key}: engine already in {MODEL_ENGINE_DIR}, skipped")
+            self.set_state(key, "cached", engine=engine_file, seconds=0)
+            return
+
+        log_file = os.path.join(MODEL_ENGINE_DIR, f"{key}-build.log")
+        command = [sys.executable, "-m", "python_module.component.onnx_to_trt",
+                   "-f", model_file, "-l", label_file, "-b", str(job["batch_size"]),
+                   "-n", str(job["network_size"]), "-p", job["precision"], "--exact-batch"]
+        if self.build_only:
+            command.append("--build-only")
+        print(f"BUILD {key}: building on GPU {gpu}, log in {log_file}")
+        with open(log_file, "w") as log:
+            returncode = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT,
+                                        env=dict(os.environ, CUDA_VISIBLE_DEVICES=gpu)).returncode
+        seconds = round(time.time() - start_time, 1)
+        engine_file = registry.find_exact(identity, job["batch_size"])
+        if returncode != 0 or not engine_file:
+            print(f"BUILD {key}: failed after {seconds} s (exit code {returncode}), see {log_file}")
+            self.set_state(key, "failed", error=f"exit code {returncode}", log=log_file, seconds=seconds)
+            return
+        performance = (registry.entry(engine_file) or {}).get("performance") or {}
+        print(f"BUILD {key}: built in {seconds} s")
+        self.set_state(key, "built", engine=engine_file, log=log_file, seconds=seconds, gpu=gpu,
+                       images_per_second=performance.get("images_per_second"))
+
+    def run(self):
+        """Run the pending jobs; returns True when none failed."""
+        building_models = set()
+        wake = threading.Condition()
+
+        def worker(gpu):
+            while True:
+                with wake:
+                    key, job = self.next_job(building_models)
+                    while key is None and building_models:
+                        # Jobs left may wait on a model another worker is building
+                        wake.wait()
+                        key, job = self.next_job(building_models)
+                if key is None:
+                    return
+                try:
+                    self.run_job(key, job, gpu)
+                except Exception as e:
+                    self.set_state(key, "failed", error=str(e))
+                with wake:
+                    building_models.discard(job_model(job))
+                    wake.notify_all()
+
+        workers = [threading.Thread(target=worker, args=(gpu,), daemon=True)
+                   for gpu in self.gpus for _ in range(self.jobs_per_gpu)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            # join() with a timeout keeps the main thread responsive to Ctrl+C
+            while thread.is_alive():
+                thread.join(1)
+        return not any(job["state"] == "failed" for job in self.queue["jobs"].values())
+
+    def summary(self):
+        jobs = [dict(job, key=key) for key, job in self.queue["jobs"].items()]
+        counts = {}
+        for job in jobs:
+            counts[job["state"]] = counts.get(job["state"], 0) + 1
+        return {"finished": time.time(), "counts": counts, "jobs": jobs}
+
+
+def print_summary(summary):
+    table = PrettyTable()
+    table.field_names = ["Job", "State", "Time (s)", "Images/s", "Engine / Error"]
+    table.align["Job"] = "l"
+    table.align["Engine / Error"] = "l"
+    for job in summary["jobs"]:
+        detail = os.path.basename(job.get("engine") or "") or job.get("error", "")
+        table.add_row([job["key"], job["state"], job.get("seconds", "-"), job.get("images_per_second") or "-", detail])
+    print(table)
+    print(", ".join(f"{state}: {count}" for state, count in sorted(summary["counts"].items())))
+
+
+def run_build_queue(jobs_file=None, queue_file=BUILD_QUEUE_FILE, summary_file=BUILD_SUMMARY_FILE,
+                    gpus=("0",), jobs_per_gpu=1, build_only=False, retry_failed=False):
+    """Queue the jobs of `jobs_file` (if given), run everything pending and write the summary.
+
+    Returns the process exit code: 0 when every job ended built or cached.
+    """
+    build_queue = EngineBuildQueue(queue_file, gpus, jobs_per_gpu, build_only)
+    if jobs_file:
+        try:
+            jobs = load_jobs(jobs_file)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error: Unable to read build jobs from '{jobs_file}': {e}")
+            return 1
+        added = build_queue.add(jobs, retry_failed)
+        print(f"{added} of {len(jobs)} jobs queued in {queue_file}")
+    else:
+        build_queue.add([], retry_failed)
+    try:
+        succeeded = build_queue.run()
+    except KeyboardInterrupt:
+        print(f"\nInterrupted: run the same command again to resume the queue in {queue_file}.")
+        return 130
+    summary = build_queue.summary()
+    with open(summary_file, 'w') as file:
+        json.dump(summary, file, indent=2)
+    print_summary(summary)
+    print(f"Build summary: {summary_file}")
+    return 0 if succeeded else 1
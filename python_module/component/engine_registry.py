@@ -0,0 +1,328 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import fcntl
+import hashlib
+import subprocess
+from contextlib import contextmanager
+from python_module.common.platform_info import get_platform_info
+
+MODEL_ENGINE_DIR = '/apps/deepstream-yolo-e2e/models/engine/'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Engines are built for the smallest of these batch sizes covering the sources, so a
+# camera more or less within the same bucket reuses the engine instead of rebuilding
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+PRECISIONS = ("qat", "fp16", "fp32")
+
+# Fields that must match for an engine to be reused
+IDENTITY_FIELDS = ("onnx_sha256", "precision", "network_size", "tensorrt", "gpu")
+LIBNVINFER_GLOBS = ('/usr/lib/*-linux-gnu/libnvinfer.so.*.*.*', '/usr/lib64/libnvinfer.so.*.*.*',
+                    '/usr/local/tensorrt/lib/libnvinfer.so.*.*.*')
+
+# TensorRT version and GPU recorded for a legacy engine the installed TensorRT could not load
+UNVERIFIED = "unverified"
+LEGACY_CHECK_TIMEOUT = 300
+
+_tensorrt_version = None
+
+
+def tensorrt_version():
+    """Version of the installed TensorRT, read from the libnvinfer file name so nothing is loaded."""
+    global _tensorrt_version
+    if _tensorrt_version is None:
+        versions = set()
+        for pattern in LIBNVINFER_GLOBS:
+            for path in glob.glob(pattern):
+                match = re.search(r'libnvinfer\.so\.(\d+\.\d+\.\d+)', path)
+                if match:
+                    versions.add(match.group(1))
+        if versions:
+            _tensorrt_version = max(versions, key=lambda v: tuple(int(x) for x in v.split('.')))
+        else:
+            try:
+                import tensorrt
+                _tensorrt_version = tensorrt.__version__
+            except ImportError:
+                _tensorrt_version = "unknown"
+    return _tensorrt_version
+
+
+def batch_bucket(batch_size):
+    """Batch size an engine is built for to serve `batch_size` streams."""
+    for bucket in BATCH_BUCKETS:
+        if batch_size <= bucket:
+            return bucket
+    # Past the largest bucket, round up to a multiple of it
+    largest = BATCH_BUCKETS[-1]
+    return -(-batch_size // largest) * largest
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EngineRegistry:
+    """Manifest of the TensorRT engines under MODEL_ENGINE_DIR.
+
+    Every engine is recorded with the sha256 of its ONNX file, precision,
+    network size, batch profile, TensorRT version and GPU it was built with.
+    find() only returns engines matching all of them and, among those, the
+    one with the smallest max batch covering the request, so the choice no
+    longer depends on directory order. Engine files are named after a hash of
+    that identity, so different ONNX files with the same name never collide.
+    When the engines exceed `quota_bytes`, evict() deletes the least recently
+    used ones.
+    """
+
+    def __init__(self, engine_dir=MODEL_ENGINE_DIR, quota_bytes=0):
+        self.engine_dir = engine_dir
+        self.quota_bytes = quota_bytes
+        self.manifest_file = os.path.join(engine_dir, MANIFEST_NAME)
+
+    def load(self):
+        try:
+            with open(self.manifest_file, 'r') as file:
+                manifest = json.load(file)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {"version": MANIFEST_VERSION, "engines": {}, "onnx": {}}
+
+    @contextmanager
+    def update(self):
+        """Read, modify and write the manifest while holding an exclusive lock."""
+        os.makedirs(self.engine_dir, exist_ok=True)
+        with open(self.manifest_file + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = self.load()
+            yield manifest
+            temp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as file:
+                json.dump(manifest, file, indent=2, sort_keys=True)
+            os.replace(temp_file, self.manifest_file)
+
+    def onnx_sha256(self, onnx_file):
+        """sha256 of an ONNX file, cached in the manifest by path, size and mtime."""
+        onnx_file = os.path.abspath(onnx_file)
+        stat = os.stat(onnx_file)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.load()["onnx"].get(onnx_file)
+        if cached and cached["signature"] == signature:
+            return cached["sha256"]
+        digest = sha256_file(onnx_file)
+        with self.update() as manifest:
+            manifest["onnx"][onnx_file] = {"signature": signature, "sha256": digest}
+        return digest
+
+    def identity(self, onnx_file, precision, network_size):
+        return {
+            "onnx_sha256": self.onnx_sha256(onnx_file),
+            "onnx_name": os.path.basename(onnx_file).replace(".onnx", ""),
+            "precision": precision,
+            "network_size": int(network_size),
+            "tensorrt": tensorrt_version(),
+            "gpu": get_platform_info().get_gpu_name(),
+        }
+
+    def engine_path(self, identity, batch_size):
+        key = json.dumps([identity[field] for field in IDENTITY_FIELDS] + [batch_size])
+        digest = hashlib.sha256(key.encode()).hexdigest()[:12]
+        return os.path.join(self.engine_dir, f"{identity['onnx_name']}-{identity['precision']}-netsize-"
+                                             f"{identity['network_size']}-batch-{batch_size}-{digest}.engine")
+
+    def register(self, identity, batch_size, engine_file, **details):
+        """Record a freshly built engine; `details` are stored with it (e.g. build time)."""
+        now = time.time()
+        with self.update() as manifest:
+            entry = dict(identity, min_batch=1, opt_batch=batch_size, max_batch=batch_size,
+                         size_bytes=os.path.getsize(engine_file), created=now, last_used=now)
+            entry.update(details)
+            manifest["engines"][os.path.basename(engine_file)] = entry
+
+    def verify_engine(self, engine_file):
+        """True when trtexec deserialises `engine_file` with the installed TensorRT on this GPU."""
+        try:
+            result = subprocess.run(["trtexec", f"--loadEngine={engine_file}", "--skipInference"],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=LEGACY_CHECK_TIMEOUT)
+        except (OSError, subprocess.SubprocessError):
+            return False
+        return result.returncode == 0
+
+    def adopt_legacy(self, identity):
+        """Register engines named the pre-registry way for this model.
+
+        Their TensorRT version and GPU are unknown, so each one is loaded with
+        trtexec first: one that loads is registered for the current TensorRT
+        and GPU, one that does not is registered as UNVERIFIED, which never
+        matches, so it is neither used nor checked again.
+        """
+        pattern = re.compile(rf"{re.escape(identity['onnx_name'])}-{identity['precision']}-netsize-"
+                             rf"{identity['network_size']}-batch-(\d+)\.engine$")
+        if not os.path.isdir(self.engine_dir):
+            return
+        known = self.load()["engines"]
+        for file_name in sorted(os.listdir(self.engine_dir)):
+            match = pattern.match(file_name)
+            if match and file_name not in known:
+                engine_file = os.path.join(self.engine_dir, file_name)
+                print(f"Checking engine '{file_name}' built before the engine registry...")
+                if self.verify_engine(engine_file):
+                    self.register(identity, int(match.group(1)), engine_file, adopted=True)
+                else:
+                    print(f"Warning: The installed TensorRT cannot load '{file_name}'; it will not be used.")
+                    self.register(dict(identity, tensorrt=UNVERIFIED, gpu=UNVERIFIED), int(match.group(1)),
+                                  engine_file, adopted=True)
+
+    def candidates(self, identity, batch_size):
+        """Compatible engines covering `batch_size`, best first, as (file name, entry) pairs,
+        and the number of engines of the model built for another TensorRT version or GPU.
+        """
+        matches = []
+        incompatible = 0
+        for file_name, entry in self.load()["engines"].items():
+            if not os.path.isfile(os.path.join(self.engine_dir, file_name)):
+                continue
+            if any(entry.get(field) != identity[field] for field in ("onnx_sha256", "precision", "network_size")):
+                continue
+            if entry.get("tensorrt") != identity["tensorrt"] or entry.get("gpu") != identity["gpu"]:
+                incompatible += 1
+            elif entry["max_batch"] >= batch_size:
+                matches.append((file_name, entry))
+        return sorted(matches, key=lambda match: (match[1]["max_batch"], match[0])), incompatible
+
+    def find(self, identity, batch_size):
+        """Path of the smallest compatible engine covering `batch_size`, or None."""
+        matches, incompatible = self.candidates(identity, batch_size)
+        if not matches:
+            self.adopt_legacy(identity)
+            matches, incompatible = self.candidates(identity, batch_size)
+        if incompatible:
+            print(f"Ignoring {incompatible} engine(s) of this model built for another TensorRT version or GPU.")
+        if not matches:
+            return None
+        file_name = matches[0][0]
+        self.touch(file_name)
+        return os.path.join(self.engine_dir, file_name)
+
+    def find_exact(self, identity, batch_size):
+        """Path of a compatible engine built for exactly `batch_size`, or None."""
+        matches, _ = self.candidates(identity, batch_size)
+        if not matches:
+            self.adopt_legacy(identity)
+            matches, _ = self.candidates(identity, batch_size)
+        for file_name, entry in matches:
+            if entry["max_batch"] == batch_size:
+                return os.path.join(self.engine_dir, file_name)
+        return None
+
+    def find_fallback(self, identity, batch_size):
+        """Path of a compatible engine of the same ONNX and network size to serve with until the
+        requested one is built: same precision first, then the largest batch. None when there is none.
+        """
+        fallbacks = []
+        for precision in dict.fromkeys((identity["precision"],) + PRECISIONS):
+            matches, _ = self.candidates(dict(identity, precision=precision), 1)
+            fallbacks.extend(sorted(matches, key=lambda match: -match[1]["max_batch"]))
+        if not fallbacks:
+            return None
+        file_name = fallbacks[0][0]
+        self.touch(file_name)
+        return os.path.join(self.engine_dir, file_name)
+
+    def record_performance(self, engine_file, performance):
+        with self.update() as manifest:
+            entry = manifest["engines"].get(os.path.basename(engine_file))
+            if entry is not None:
+                entry["performance"] = performance
+
+    def touch(self, file_name):
+        with self.update() as manifest:
+            if file_name in manifest["engines"]:
+                manifest["engines"][file_name]["last_used"] = time.time()
+
+    def entry(self, engine_file):
+        """Manifest entry of an engine, or None."""
+        return self.load()["engines"].get(os.path.basename(engine_file or ""))
+
+    def check_engine(self, engine_file):
+        """(True, "") when `engine_file` was built for this TensorRT and GPU, else (False, reason)."""
+        entry = self.entry(engine_file)
+        if entry is None:
+            return False, f"engine '{engine_file}' is not in the registry"
+        if entry.get("tensorrt") != tensorrt_version():
+            return False, f"engine was built with TensorRT {entry.get('tensorrt')}, installed is {tensorrt_version()}"
+        if entry.get("gpu") != get_platform_info().get_gpu_name():
+            return False, f"engine was built for {entry.get('gpu')}"
+        return True, ""
+
+    def measured_performance(self):
+        """{ONNX name: performance record} of the fastest benchmarked engine of each model on this TensorRT and GPU."""
+        gpu = get_platform_info().get_gpu_name()
+        best = {}
+        for entry in self.load()["engines"].values():
+            performance = entry.get("performance") or {}
+            if not performance.get("benchmarked") or entry.get("tensorrt") != tensorrt_version() or entry.get("gpu") != gpu:
+                continue
+            current = best.get(entry["onnx_name"])
+            if current is None or performance["images_per_second"] > current["images_per_second"]:
+                best[entry["onnx_name"]] = dict(performance, precision=entry["precision"],
+                                                network_size=entry["network_size"])
+        return best
+
+    def evict(self, keep=()):
+        """Delete least recently used engines until the total size fits the quota."""
+        keep = {os.path.basename(path) for path in keep if path}
+        with self.update() as manifest:
+            engines = manifest["engines"]
+            for file_name in [f for f in engines if not os.path.isfile(os.path.join(self.engine_dir, f))]:
+                del engines[file_name]
+            if not self.quota_bytes:
+                return []
+            total = sum(entry["size_bytes"] for entry in engines.values())
+            evicted = []
+            for file_name, entry in sorted(engines.items(), key=lambda item: item[1]["last_used"]):
+                if total <= self.quota_bytes:
+                    break
+                if file_name in keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.engine_dir, file_name))
+                except OSError as e:
+                    print(f"Warning: Unable to evict engine {file_name}: {e}")
+                    continue
+                total -= entry["size_bytes"]
+                del engines[file_name]
+                evicted.append(file_name)
+        for file_name in evicted:
+            print(f"Evicted least recently used engine {file_name} (engine cache quota exceeded)")
+        return evicted
+
+
+def format_performance(performance):
+    """Short description of a performance record for the model tables, e.g. '412 img/s (fp16, batch 8, 640)'."""
+    if not performance:
+        return "-"
+    return (f"{performance['images_per_second']:.0f} img/s "
+            f"({performance['precision']}, batch {performance['batch_size']}, {performance['network_size']})")
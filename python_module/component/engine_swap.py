@@ -0,0 +1,171 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+import sys
+import time
+import subprocess
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import GLib
+
+from python_module.component.system_config import read_pgie_settings
+from python_module.component.engine_registry import EngineRegistry, MODEL_ENGINE_DIR, PRECISIONS, batch_bucket
+from python_module.component.onnx_to_trt import count_labels, update_config_file
+
+POLL_INTERVAL_MS = 2000
+MAX_EVENTS = 20
+
+
+class EngineHotSwap:
+    """Build a TensorRT engine in a background process and swap it into the running nvinfer.
+
+    The build runs `onnx_to_trt` in its own process, so the pipeline keeps
+    serving with the current engine meanwhile. Once the engine is registered,
+    the PGIE config is pointed at it and set again on nvinfer, which reloads
+    the model between batches without touching the sources; nvinfer reports
+    the outcome with its "model-updated" signal. Only engines with the same
+    network size can be swapped, since the input dimensions must not change.
+    A build still running when the application exits is left to finish, so
+    the engine is ready for the next launch.
+    """
+
+    def __init__(self, pgie, pgie_config_file):
+        self.pgie = pgie
+        self.pgie_config_file = pgie_config_file
+        self.process = None
+        self.target = None
+        self.state = "idle"
+        self.builds = 0
+        self.swaps = 0
+        self.failures = 0
+        self.events = []
+        self.log_file = None
+        pgie.connect("model-updated", self.on_model_updated)
+
+    def event(self, message):
+        print(f"\n**ENGINE: {message}\n")
+        self.events.append({"time": round(time.time(), 3), "message": message})
+        del self.events[:-MAX_EVENTS]
+
+    def current_settings(self):
+        settings = read_pgie_settings(self.pgie_config_file)
+        network_size = int(settings.get("infer-dims", "3;640;640").split(";")[-1])
+        return settings, network_size
+
+    def build(self, onnx_file=None, label_file=None, batch_size=None, precision=None):
+        """Start building an engine; values not given are those of the running model.
+
+        Returns (True, message) when the build started, (False, reason) otherwise.
+        """
+        if self.process is not None:
+            return False, "an engine build is already running"
+        settings, network_size = self.current_settings()
+        onnx_file = onnx_file or settings.get("onnx-file")
+        label_file = label_file or settings.get("labelfile-path")
+        try:
+            batch_size = int(batch_size or settings.get("batch-size", 1))
+        except (TypeError, ValueError):
+            return False, f"batch size '{batch_size}' is not a number"
+        if not precision:
+            entry = EngineRegistry(MODEL_ENGINE_DIR).entry(settings.get("model-engine-file"))
+            precision = entry["precision"] if entry else "fp16"
+        if precision not in PRECISIONS:
+            return False, f"precision must be one of {PRECISIONS}"
+        if not onnx_file or not os.path.isfile(onnx_file):
+            return False, f"ONNX model '{onnx_file}' does not exist"
+        if not label_file or not os.path.isfile(label_file):
+            return False, f"label file '{label_file}' does not exist; give one with \"labels\""
+
+        target = {"onnx_file": onnx_file, "label_file": label_file, "batch_size": batch_size,
+                  "network_size": network_size, "precision": precision}
+        os.makedirs(MODEL_ENGINE_DIR, exist_ok=True)
+        log_path = os.path.join(MODEL_ENGINE_DIR, f"{os.path.basename(onnx_file).replace('.onnx', '')}-build.log")
+        command = [sys.executable, "-m", "python_module.component.onnx_to_trt",
+                   "-f", onnx_file, "-l", label_file, "-b", str(batch_size),
+                   "-n", str(network_size), "-p", precision]
+        log_file = None
+        try:
+            log_file = open(log_path, "w")
+            # A session of its own keeps the build alive if the application stops first
+            process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+        except OSError as e:
+            if log_file:
+                log_file.close()
+            self.event(f"unable to start the engine build: {e}")
+            return False, f"unable to start the engine build: {e}"
+        self.target, self.log_file, self.process = target, log_file, process
+        self.state = "building"
+        self.builds += 1
+        self.event(f"building {precision} batch {batch_size} engine of {onnx_file} in the background, log in {log_path}")
+        GLib.timeout_add(POLL_INTERVAL_MS, self.poll)
+        return True, "build started"
+
+    def poll(self):
+        """GLib timeout callback: swap the engine in once the build process has exited."""
+        returncode = self.process.poll()
+        if returncode is None:
+            return True
+        self.process = None
+        self.log_file.close()
+        target = self.target
+        registry = EngineRegistry(MODEL_ENGINE_DIR)
+        engine_file = None
+        if returncode == 0:
+            identity = registry.identity(target["onnx_file"], target["precision"], target["network_size"])
+            engine_file = registry.find(identity, target["batch_size"])
+        if not engine_file:
+            self.state = "failed"
+            self.failures += 1
+            self.event(f"engine build failed with exit code {returncode}, still serving with the current engine")
+            return False
+        self.swap(engine_file, min(batch_bucket(target["batch_size"]), registry.entry(engine_file)["max_batch"]))
+        return False
+
+    def swap(self, engine_file, batch_size):
+        target = self.target
+        update_config_file(self.pgie_config_file, os.path.abspath(target["onnx_file"]), os.path.abspath(engine_file),
+                           os.path.abspath(target["label_file"]), count_labels(target["label_file"]),
+                           batch_size, target["network_size"])
+        self.state = "swapping"
+        self.event(f"swapping nvinfer to {engine_file}")
+        self.pgie.set_property("config-file-path", self.pgie_config_file)
+
+    def on_model_updated(self, element, error, config_file):
+        if error == 0:
+            self.state = "swapped"
+            self.swaps += 1
+            self.event(f"nvinfer now runs {read_pgie_settings(config_file).get('model-engine-file')}")
+        else:
+            self.state = "failed"
+            self.failures += 1
+            self.event(f"nvinfer could not load the new engine (error {error})")
+
+    def status(self):
+        settings, _ = self.current_settings()
+        return {
+            "state": self.state,
+            "engine": settings.get("model-engine-file"),
+            "target": self.target,
+            "events": self.events,
+        }
+
+    def metrics_samples(self):
+        """Metrics collector: background builds and engine swaps."""
+        return [
+            ("deepstream_engine_build_running", "gauge", "1 while an engine builds in the background.",
+             {}, int(self.process is not None)),
+            ("deepstream_engine_builds_total", "counter", "Background engine builds started.", {}, self.builds),
+            ("deepstream_engine_swaps_total", "counter", "Engines swapped into the running nvinfer.", {}, self.swaps),
+            ("deepstream_engine_swap_failures_total", "counter", "Background builds or swaps that failed.",
+             {}, self.failures),
+        ]
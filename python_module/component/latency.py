@@ -0,0 +1,141 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+from collections import OrderedDict
+from time import monotonic
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+from python_module.common.metrics import RollingHistogram, LATENCY_BOUNDS
+
+MAX_IN_FLIGHT = 256
+GST_LATENCY_TRACER = "latency(flags=pipeline+element)"
+
+
+def enable_latency_tracer():
+    """Enable the GStreamer latency tracer; must be called before Gst.init()."""
+    os.environ['GST_TRACERS'] = GST_LATENCY_TRACER
+    debug = os.environ.get('GST_DEBUG')
+    os.environ['GST_DEBUG'] = f"{debug},GST_TRACER:7" if debug else "GST_TRACER:7"
+
+
+def pipeline_stages(elements):
+    """Return the (name, element) stages of a linear pipeline in link order.
+
+    `elements` is the dict built by create_pipeline(), whose insertion order is
+    the link order. Capsfilters only negotiate caps and the sink has no src
+    pad, so neither is a stage boundary. Elements created but left unlinked
+    by the output mode (e.g. the codeparser of RTSP output) never see a
+    buffer and are skipped; call this once the pipeline is linked.
+    """
+    stages = []
+    for name, element in elements.items():
+        if name == "sink" or name.startswith("filter_"):
+            continue
+        src_pad = element.get_static_pad("src")
+        if src_pad is not None and src_pad.is_linked():
+            stages.append((name, element))
+    return stages
+
+
+class StageLatencyTracker:
+    """Measure the time buffers spend in each element of the pipeline.
+
+    A buffer probe on the src pad of every stage records when a batch leaves
+    it. Batches are correlated by PTS, starting at the first stage (the
+    streammux); the time between two consecutive src pads is the latency of
+    the second element and the time from the first to the last is the
+    end-to-end latency. At most `max_in_flight` batches are tracked, so PTS
+    that never reach the last stage cannot grow the table.
+    """
+
+    def __init__(self, stages, max_in_flight=MAX_IN_FLIGHT):
+        self.stages = stages
+        self.max_in_flight = max_in_flight
+        self.in_flight = OrderedDict()
+        self.histograms = [None] + [RollingHistogram(LATENCY_BOUNDS) for _ in stages[1:]]
+        self.end_to_end = RollingHistogram(LATENCY_BOUNDS)
+        self.last_stage = len(stages) - 1
+        self.unmatched = 0
+        self.evicted = 0
+
+    def attach(self):
+        for index, (name, element) in enumerate(self.stages):
+            srcpad = element.get_static_pad("src")
+            if not srcpad:
+                print(f"Unable to get src pad of {name}, latency not measured")
+                continue
+            srcpad.add_probe(Gst.PadProbeType.BUFFER, self.probe, index)
+
+    def probe(self, pad, info, index):
+        buffer = info.get_buffer()
+        if buffer:
+            self.mark(index, buffer.pts, monotonic())
+        return Gst.PadProbeReturn.OK
+
+    def mark(self, index, pts, now):
+        """Record that the batch with this PTS left stage `index` at time `now`."""
+        if index == 0:
+            self.in_flight[pts] = [now, now]
+            if len(self.in_flight) > self.max_in_flight:
+                self.in_flight.popitem(last=False)
+                self.evicted += 1
+            return
+        times = self.in_flight.get(pts)
+        if times is None:
+            self.unmatched += 1
+            return
+        self.histograms[index].record(now - times[1], now)
+        times[1] = now
+        if index == self.last_stage:
+            self.in_flight.pop(pts, None)
+            self.end_to_end.record(now - times[0], now)
+
+    def named_histograms(self):
+        named = [(name, self.histograms[index]) for index, (name, _) in enumerate(self.stages) if index > 0]
+        named.append(("end_to_end", self.end_to_end))
+        return named
+
+    def latencies(self, window=10):
+        """Quantiles in seconds of each stage and end to end over the last `window` seconds."""
+        now = monotonic()
+        return {name: histogram.quantiles(window, now) for name, histogram in self.named_histograms()}
+
+    def reset_totals(self):
+        for _, histogram in self.named_histograms():
+            histogram.reset_totals()
+
+    def total_latencies(self):
+        """Quantiles in seconds of each stage and end to end since the last reset_totals()."""
+        return {name: histogram.total_quantiles() for name, histogram in self.named_histograms()}
+
+    def metrics_samples(self):
+        """Metrics collector: per-stage latency quantiles over the last 60 seconds."""
+        help_text = "Time a batch spends in each pipeline stage over the last 60 seconds."
+        samples = [
+            ("deepstream_stage_latency_seconds", "summary", help_text, {"stage": stage, "quantile": str(q)}, value)
+            for stage, quantiles in self.latencies(60).items() for q, value in quantiles.items()
+        ]
+        samples.append(("deepstream_latency_unmatched_buffers_total", "counter",
+                        "Buffers whose PTS could not be matched to a batch leaving the streammux.",
+                        {}, self.unmatched))
+        return samples
+
+    def stats_print_callback(self):
+        stats = {
+            stage: {f"p{int(q * 100)}": (round(v * 1000, 2) if v is not None else None) for q, v in quantiles.items()}
+            for stage, quantiles in self.latencies(10).items()
+        }
+        print("\n**LATENCY (ms): ", stats, "\n")
+        return True
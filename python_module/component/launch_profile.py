@@ -0,0 +1,294 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+import sys
+import json
+import hashlib
+from python_module.common.utils import display_message
+from python_module.component.pre_process import load_config as load_session, save_config as save_session
+from python_module.component.onnx_to_trt import process_onnx, deferred_builds
+from python_module.component.engine_registry import EngineRegistry
+from python_module.component.network_size import parse_network_size, requested_network_size, choose_network_size
+from python_module.component.manage_models import download_model, MODEL_ONNX_DIR
+from python_module.component.system_config import set_config_overrides, get_config, PGIE_CONFIG_FILES
+
+MEDIA_TYPES = ("youtube", "rtsp", "file", "http", "https")
+PRECISIONS = ("fp32", "fp16", "qat")
+MODEL_TYPES = ("det", "seg")
+OUTPUTS = ("display", "file", "rtsp", "silent")
+PROFILE_VERSION = 1
+
+# Example profile (JSON, or YAML when PyYAML is installed):
+#
+# {
+#   "output": "silent",
+#   "sources": ["rtsp://camera-1/live", {"type": "file", "url": "/data/video.mp4"}],
+#   "model": {"name": "yolov9c-relu-qat-trt", "type": "det", "precision": "qat",
+#             "network_size": 640, "batch_size": 4},
+#   "tracker": "/apps/deepstream-yolo-e2e/config/tracker/config_tracker_IOU.yml",
+#   "settings": {"tiled_output_width": 1920, "tiled_output_height": 1080}
+# }
+
+
+def load_profile(path):
+    """Read a launch profile from a JSON or YAML file."""
+    if not os.path.isfile(path):
+        display_message("e", f"Launch profile '{path}' not found.")
+        sys.exit(1)
+    with open(path, 'r') as file:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                display_message("e", "YAML launch profiles need PyYAML: pip3 install pyyaml")
+                sys.exit(1)
+            profile = yaml.safe_load(file) or {}
+        else:
+            profile = json.load(file)
+    if not isinstance(profile, dict):
+        display_message("e", f"Launch profile '{path}' must be a mapping.")
+        sys.exit(1)
+    return profile
+
+
+def guess_media_type(url):
+    if url.startswith('rtsp://'):
+        return 'rtsp'
+    if 'youtube.com/' in url or 'youtu.be/' in url:
+        return 'youtube'
+    if url.startswith('https://'):
+        return 'https'
+    if url.startswith('http://'):
+        return 'http'
+    return 'file'
+
+
+def profile_from_args(args):
+    """Build the launch profile from --profile and the command line flags that override it."""
+    profile = load_profile(args.profile) if args.profile else {}
+    model = dict(profile.get("model") or {})
+    for key, value in (("onnx", args.model), ("labels", args.labels), ("type", args.model_type),
+                       ("precision", args.precision), ("network_size", args.network_size),
+                       ("batch_size", args.batch_size)):
+        if value is not None:
+            model[key] = value
+    profile["model"] = model
+    if args.source:
+        profile["sources"] = list(args.source)
+    if args.tracker:
+        profile["tracker"] = args.tracker
+    if args.output:
+        profile["output"] = args.output
+    return profile
+
+
+def canonical_network_size(value):
+    """'auto', an int, None when not given, or `value` as is when invalid (reported by validate_profile)."""
+    if value is None:
+        return None
+    try:
+        return parse_network_size(value)
+    except ValueError:
+        return value
+
+
+def normalize_profile(profile, media_sources=None):
+    """Fill in defaults from the saved session and return the profile in canonical form.
+
+    Sources default to `media_sources` (the active sources of media.ini), the
+    model to the one of the previous session and the batch size to the number
+    of sources.
+    """
+    session = load_session() or {}
+    sources = []
+    for source in profile.get("sources") or media_sources or []:
+        if isinstance(source, str):
+            source = {"type": guess_media_type(source), "url": source}
+        elif isinstance(source, (list, tuple)):
+            source = {"type": source[0], "url": source[1]}
+        type = source.get("type") or guess_media_type(source["url"])
+        url = os.path.abspath(source["url"]) if type == "file" else source["url"]
+        sources.append({"type": type, "url": url})
+
+    model = profile.get("model") or {}
+    name = model.get("name")
+    onnx_file = model.get("onnx") or (os.path.join(MODEL_ONNX_DIR, f"{name}.onnx") if name else session.get("model_file"))
+    label_file = model.get("labels") or (os.path.join(MODEL_ONNX_DIR, f"{name}.txt") if name else session.get("label_file"))
+    model_type = model.get("type") or session.get("model_type") or "det"
+    precision = model.get("precision") or ('qat' if onnx_file and 'qat' in onnx_file else 'fp16')
+    return {
+        "version": PROFILE_VERSION,
+        "output": profile.get("output", "silent"),
+        "sources": sources,
+        "model": {
+            "name": name,
+            "onnx": onnx_file,
+            "labels": label_file,
+            "type": model_type,
+            "precision": precision,
+            # None: NETWORK_SIZE of config.ini, which the settings of the profile may override
+            "network_size": canonical_network_size(model.get("network_size")),
+            "batch_size": int(model.get("batch_size") or len(sources) or 1),
+        },
+        "tracker": profile.get("tracker"),
+        "settings": {str(k).lower(): v for k, v in (profile.get("settings") or {}).items()},
+    }
+
+
+def validate_profile(profile):
+    """Return a list of problems that would prevent the profile from launching."""
+    errors = []
+    if profile["output"] not in OUTPUTS:
+        errors.append(f"output must be one of {OUTPUTS}")
+    if not profile["sources"]:
+        errors.append("no media source given and no active source in media.ini")
+    for source in profile["sources"]:
+        if source["type"] not in MEDIA_TYPES:
+            errors.append(f"unknown media type '{source['type']}' of {source['url']}")
+        elif source["type"] == "file" and not os.path.isfile(source["url"]):
+            errors.append(f"media file '{source['url']}' does not exist")
+    model = profile["model"]
+    if not model["onnx"] or not os.path.isfile(model["onnx"]):
+        errors.append(f"ONNX model '{model['onnx']}' does not exist")
+    if not model["labels"] or not os.path.isfile(model["labels"]):
+        errors.append(f"label file '{model['labels']}' does not exist")
+    if model["type"] not in MODEL_TYPES:
+        errors.append(f"model type must be one of {MODEL_TYPES}")
+    if model["precision"] not in PRECISIONS:
+        errors.append(f"precision must be one of {PRECISIONS}")
+    if model["network_size"] is not None:
+        try:
+            parse_network_size(model["network_size"])
+        except ValueError:
+            errors.append(f"network size must be 'auto' or a multiple of 32, not '{model['network_size']}'")
+    if model["batch_size"] < len(profile["sources"]):
+        errors.append(f"batch size {model['batch_size']} is smaller than the {len(profile['sources'])} sources")
+    if profile["tracker"] and not os.path.isfile(profile["tracker"]):
+        errors.append(f"tracker config '{profile['tracker']}' does not exist")
+    return errors
+
+
+def file_signature(path):
+    """(size, mtime) of a file, or None when it does not exist."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def profile_fingerprint(profile):
+    """Hash of the canonical profile and of the model files it points to."""
+    model = profile["model"]
+    content = {
+        "profile": profile,
+        "onnx": file_signature(model["onnx"]),
+        "labels": file_signature(model["labels"]),
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def session_is_current(session, fingerprint):
+    """True when the previous launch used the same profile and its engine and PGIE config are untouched."""
+    if not session or session.get("profile_fingerprint") != fingerprint:
+        return False
+    engine = session.get("engine_file")
+    if not engine or file_signature(engine) != session.get("engine_signature"):
+        return False
+    compatible, reason = EngineRegistry(os.path.dirname(engine)).check_engine(engine)
+    if not compatible:
+        display_message("w", f"Previous engine not reused: {reason}.")
+        return False
+    pgie_config_file = PGIE_CONFIG_FILES[session["model_type"]]
+    return file_signature(pgie_config_file) == session.get("pgie_config_signature")
+
+
+def apply_settings(profile):
+    settings = dict(profile["settings"])
+    if profile["tracker"]:
+        settings["tracker_config_file"] = os.path.abspath(profile["tracker"])
+    set_config_overrides(settings)
+
+
+def launch_profile(profile, background=True):
+    """Prepare a launch without any prompt and return the model type.
+
+    When the fingerprint of the profile matches the previous session and the
+    engine and PGIE config it produced are unchanged, validation and engine
+    lookup are skipped entirely; otherwise the profile is validated, the
+    engine is built or reused and the session is saved with the new fingerprint.
+    With `background`, a missing engine may be built while the pipeline runs
+    on another engine of the model (see ENGINE_BACKGROUND_BUILD).
+    """
+    fingerprint = profile_fingerprint(profile)
+    model = profile["model"]
+    apply_settings(profile)
+
+    try:
+        network_size = requested_network_size(model["network_size"] or get_config()['NETWORK_SIZE'])
+    except ValueError as e:
+        display_message("e", f"NETWORK_SIZE: {e}")
+        sys.exit(1)
+
+    session = load_session()
+    # NETWORK_SIZE may have changed in config.ini, which is not part of the fingerprint
+    if session_is_current(session, fingerprint) and network_size in ('auto', session.get("network_size")):
+        display_message("d", f"Launch profile unchanged, using engine {session['engine_file']}")
+        EngineRegistry(os.path.dirname(session['engine_file'])).touch(os.path.basename(session['engine_file']))
+        return model["type"]
+
+    if model["name"] and not (os.path.isfile(model["onnx"]) and os.path.isfile(model["labels"])):
+        # Model given by catalog name and not downloaded yet
+        download_model(model["name"])
+
+    errors = validate_profile(profile)
+    if errors:
+        for error in errors:
+            display_message("e", f"Launch profile: {error}")
+        sys.exit(1)
+
+    if network_size == 'auto':
+        network_size = choose_network_size(model["onnx"], model["precision"], len(profile["sources"]),
+                                           model["batch_size"])
+
+    pgie_config_file = PGIE_CONFIG_FILES[model["type"]]
+    engine_file = process_onnx(
+        file=model["onnx"],
+        label_file=model["labels"],
+        batch_size=model["batch_size"],
+        network_size=network_size,
+        precision=model["precision"],
+        pgie_config_file=pgie_config_file,
+        force=False,
+        background=background and bool(get_config()['ENGINE_BACKGROUND_BUILD'])
+    )
+    if not engine_file:
+        display_message("e", "Launch profile: TensorRT engine could not be prepared.")
+        sys.exit(1)
+
+    save_session({
+        "num_sources": len(profile["sources"]),
+        "model_file": model["onnx"],
+        "label_file": model["labels"],
+        "model_type": model["type"],
+        "precision": model["precision"],
+        "network_size": network_size,
+        "batch_size": model["batch_size"],
+        "engine_file": engine_file,
+        "engine_signature": file_signature(engine_file),
+        "pgie_config_signature": file_signature(pgie_config_file),
+        # Not final while the requested engine is still to be built
+        "profile_fingerprint": None if deferred_builds else fingerprint,
+    })
+    display_message("s", "Launch profile applied.")
+    return model["type"]
@@ -13,8 +13,11 @@ License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
 import json
 import os
 import sys
-import requests
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from prettytable import PrettyTable
+from python_module.component.engine_registry import EngineRegistry, format_performance
 
 MODEL_ASSET = 'config/models/models_asset.json'
 MODEL_CATALOG = 'config/models/models_catalog.json'
@@ -29,61 +32,232 @@ def load_models():
     with open(MODEL_CATALOG, 'r') as f:
         return json.load(f)
 
-def download_file(url, name):
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Check for HTTP errors
 
-        # Get the total file size from the response headers
-        total_size = int(response.headers.get('content-length', 0))
-        downloaded_size = 0
+def catalog_entries(dataset=None, model_type=None, size=None, names=None):
+    """Models of the catalog matching the filters (all when none is given), as catalog entries
+    completed with their dataset, type and size.
+    """
+    entries = []
+    for dataset_name, dataset_models in load_models().items():
+        if dataset and dataset_name.lower() != dataset.lower():
+            continue
+        for type_name, sizes in dataset_models.items():
+            if type_name == "Description" or (model_type and type_name.lower() != model_type.lower()):
+                continue
+            for size_name, models in sizes.items():
+                if size and size_name.lower() != size.lower():
+                    continue
+                entries.extend(dict(model, dataset=dataset_name, type=type_name, size=size_name)
+                               for model in models if not names or model['model_name'] in names)
+    return entries
+
+DOWNLOAD_PART_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_TIMEOUT = 30
+
+
+class DownloadProgress:
+    """Bytes received by the parallel parts of a download, printed as one line."""
+
+    def __init__(self, name, total_size, done=0):
+        self.name = name
+        self.total_size = total_size
+        self.done = done
+        self.lock = threading.Lock()
+
+    def add(self, size):
+        with self.lock:
+            self.done += size
+            progress = (self.done / self.total_size) * 100 if self.total_size > 0 else 0
+            sys.stdout.write(f"\rDownloading {self.name}: {progress:.2f}%")
+            sys.stdout.flush()
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_file(path, size=None, sha256=None):
+    """Return (True, "") when `path` has the expected size and hash, else (False, reason)."""
+    if not os.path.isfile(path):
+        return False, "file is missing"
+    actual_size = os.path.getsize(path)
+    if size is not None and actual_size != size:
+        return False, f"size is {actual_size} bytes, expected {size}"
+    if sha256 and file_digest(path) != sha256:
+        return False, "sha256 does not match"
+    return True, ""
+
+
+def probe_download(session, url):
+    """Return (size, accepts_ranges) of `url`; size is None when the server does not report it.
+
+    A one-byte range GET is used rather than HEAD: the signed URLs release
+    assets redirect to are often only valid for GET.
+    """
+    with session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        if response.status_code == 206:
+            total = response.headers.get('content-range', '').rpartition('/')[2]
+            return (int(total) if total.isdigit() else None), True
+        size = response.headers.get('content-length')
+        return (int(size) if size else None), False
+
+
+def download_part(session, url, part_file, start, end, progress):
+    """Fetch bytes start..end (inclusive) of `url` into the same offset of `part_file`."""
+    headers = {'Range': f'bytes={start}-{end}'}
+    with session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise IOError("server ignored the range request")
+        with open(part_file, 'r+b') as file:
+            file.seek(start)
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                file.write(chunk)
+                progress.add(len(chunk))
+            if file.tell() != end + 1:
+                raise IOError(f"part {start}-{end} ended early")
+
+
+def download_ranges(session, url, name, part_file, state_file, size, workers):
+    """Download missing parts in parallel; finished parts are recorded in `state_file` to resume later."""
+    state = {}
+    if os.path.isfile(part_file) and os.path.isfile(state_file):
+        try:
+            with open(state_file, 'r') as file:
+                state = json.load(file)
+        except ValueError:
+            state = {}
+    if state.get("url") != url or state.get("size") != size or os.path.getsize(part_file) != size:
+        state = {"url": url, "size": size, "done": []}
+        with open(part_file, 'wb') as file:
+            file.truncate(size)
 
-        # Save the file and show progress
-        with open(name, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
+    parts = [(start, min(start + DOWNLOAD_PART_SIZE, size) - 1) for start in range(0, size, DOWNLOAD_PART_SIZE)]
+    done = {tuple(part) for part in state["done"]}
+    missing = [part for part in parts if part not in done]
+    if len(missing) < len(parts):
+        print(f"Resuming {name}: {len(parts) - len(missing)} of {len(parts)} parts already downloaded")
+    progress = DownloadProgress(name, size, sum(end - start + 1 for start, end in done))
+    lock = threading.Lock()
+
+    def fetch(part):
+        download_part(session, url, part_file, part[0], part[1], progress)
+        with lock:
+            state["done"].append(list(part))
+            with open(state_file, 'w') as file:
+                json.dump(state, file)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(fetch, part) for part in missing]:
+            future.result()
+
+
+def download_stream(session, url, name, part_file, size):
+    """Single-stream download, continuing a partial file when the server supports it."""
+    offset = os.path.getsize(part_file) if os.path.isfile(part_file) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            offset = 0  # Range not honoured: start over
+        total_size = size or (offset + int(response.headers.get('content-length', 0)))
+        progress = DownloadProgress(name, total_size, offset)
+        with open(part_file, 'ab' if offset else 'wb') as file:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                 if chunk:  # Filter out keep-alive new chunks
                     file.write(chunk)
-                    downloaded_size += len(chunk)
-                    # Calculate progress
-                    progress = (downloaded_size / total_size) * 100 if total_size > 0 else 0
-                    # Print progress
-                    sys.stdout.write(f"\rDownloading {name}: {progress:.2f}%")
-                    sys.stdout.flush()
-
-        print(f"\nDownloaded: {name}")
+                    progress.add(len(chunk))
+
+
+def download_file(url, name, size=None, sha256=None, workers=DOWNLOAD_WORKERS):
+    """Download `url` to `name`; returns True when the file is complete and verified.
+
+    Servers accepting range requests are downloaded in parallel parts of
+    DOWNLOAD_PART_SIZE, and an interrupted download resumes from the parts
+    already on disk. Data goes to `name`.part and is renamed to `name` only
+    after the size (and sha256 when given) has been verified, so a failed
+    download never leaves a truncated file behind.
+    """
+    import requests
+    part_file = f"{name}.part"
+    state_file = f"{name}.part.json"
+    try:
+        with requests.Session() as session:
+            remote_size, accepts_ranges = probe_download(session, url)
+            size = size or remote_size
+            if accepts_ranges and size:
+                download_ranges(session, url, name, part_file, state_file, size, workers)
+            else:
+                download_stream(session, url, name, part_file, size)
     except Exception as e:
-        print(f"Error downloading {name}: {e}")
+        print(f"\nError downloading {name}: {e}. Run again to resume.")
+        return False
+
+    valid, reason = verify_file(part_file, size, sha256)
+    if not valid:
+        print(f"\nError downloading {name}: {reason}. The partial file was discarded.")
+        for path in (part_file, state_file):
+            if os.path.exists(path):
+                os.remove(path)
+        return False
+    os.replace(part_file, name)
+    if os.path.exists(state_file):
+        os.remove(state_file)
+    print(f"\nDownloaded: {name}")
+    return True
+
+
+def asset_sha256(asset):
+    """sha256 of a release asset when the catalog has one ("sha256" or a GitHub "digest")."""
+    if asset.get('sha256'):
+        return asset['sha256']
+    digest = asset.get('digest') or ''
+    return digest[len('sha256:'):] if digest.startswith('sha256:') else None
+
 
 def download_model(model_name):
+    """Fetch the ONNX and label files of a model concurrently through the model store
+    (local cache, mirrors, then the release URL).
+
+    Returns their paths, or (None, None) when a file could not be downloaded.
+    """
     # Load asset information from JSON
     with open(MODEL_ASSET, 'r') as file:
         data = json.load(file)
 
-    # Initialize a list to store URLs for downloading
-    download_urls = []
-
     # Search for the model files in the asset data
-    for asset in data["assets"]:
-        if model_name in asset['name']:  # Check if the model_name is in the asset's name
-            download_urls.append((asset['url'], asset['name']))  # Collect the download URL and file name
+    assets = [asset for asset in data["assets"] if model_name in asset['name']]
 
     # Check if any files were found for the model
-    if not download_urls:
+    if not assets:
         print(f"No files found for model {model_name}.")
         return None, None
 
     # Ensure the download directory exists
     os.makedirs(MODEL_ONNX_DIR, exist_ok=True)
 
-    # Download each file found
-    for url, file_name in download_urls:
-        file_path = os.path.join(MODEL_ONNX_DIR, file_name)
-        
-        # Check if file already exists
-        if os.path.exists(file_path):
-            print(f"{file_name} already exists, skipping download.")
+    missing = []
+    for asset in assets:
+        file_path = os.path.join(MODEL_ONNX_DIR, asset['name'])
+        # A complete file is kept; one of the wrong size (e.g. truncated earlier) is downloaded again
+        if verify_file(file_path, asset.get('size'))[0]:
+            print(f"{asset['name']} already exists, skipping download.")
         else:
-            download_file(url, file_path)  # Download the file
+            missing.append(asset)
+
+    if missing:
+        # Imported here: the model store is built on the download helpers of this module
+        from python_module.component.model_store import get_model_store
+        results = get_model_store().fetch_many(missing, MODEL_ONNX_DIR, workers=len(missing))
+        if not all(results.values()):
+            return None, None
 
     # Return paths to the downloaded ONNX and label files
     model_file = os.path.join(MODEL_ONNX_DIR, f"{model_name}.onnx")
@@ -104,7 +278,10 @@ def display_table(data, title):
     print(f"\n{title}")
     print(table)
 
-def choose_model():
+def choose_model(num_sources=0):
+    """Let the user pick and download a catalog model; with `num_sources`, the model of the
+    leaderboard that sustains TARGET_FPS on that many sources is recommended.
+    """
     models = load_models()
     while True:
         # Show datasets with descriptions
@@ -153,12 +330,30 @@ def choose_model():
             print("Invalid choice, please try again.")
             continue
 
+        recommended = None
+        if num_sources:
+            # Imported here: the leaderboard is built on the catalog helpers of this module
+            from python_module.component.model_leaderboard import recommend_for_device
+            recommended, result = recommend_for_device(catalog_entries(dataset, model_type), num_sources)
+            if recommended:
+                print(f"\nRecommended for {num_sources} sources on this GPU: {recommended['model_name']} "
+                      f"({result['precision']}, measured {result['images_per_second']:.0f} img/s at batch {result['batch_size']}, "
+                      f"network size {result['network_size']})")
+
         # Show sizes based on model type
         sizes = list(models[dataset][model_type].keys())
         display_table(sizes, "Choose Size:")
-        size_choice = input("Enter your choice (or '0' to go back): ")
+        prompt = "Enter your choice, 'r' for the recommended model (or '0' to go back): " if recommended \
+            else "Enter your choice (or '0' to go back): "
+        size_choice = input(prompt)
         if size_choice == '0':
             continue
+        if recommended and size_choice.lower() == 'r':
+            model_file, label_file = download_model(recommended['model_name'])
+            if model_file and label_file:
+                print(f"Model downloaded to: {model_file}")
+                print(f"Label file downloaded to: {label_file}")
+            return model_file, label_file, model_type
         
         try:
             size_index = int(size_choice) - 1
@@ -172,9 +367,12 @@ def choose_model():
         available_models = models[dataset][model_type][size]
         model_data = [(model['model_arch'], model['model_name']) for model in available_models]
 
+        # Throughput measured by trtexec when engines of the models were built on this GPU
+        performance = EngineRegistry().measured_performance()
+
         # Display models in a formatted table
         table = PrettyTable()
-        table.field_names = ["Index", "Model Arch", "Model Name"]
+        table.field_names = ["Index", "Model Arch", "Model Name", "Measured Throughput"]
         
         # Align text to the right
         table.align["Model Arch"] = "l"
@@ -182,7 +380,7 @@ def choose_model():
         table.align["Index"] = "c"  # Center align the index column
         
         for index, (model_arch, model_name) in enumerate(model_data, start=1):
-            table.add_row([index, model_arch, model_name])
+            table.add_row([index, model_arch, model_name, format_performance(performance.get(model_name))])
         
         print("\nAvailable Models:")
         print(table)
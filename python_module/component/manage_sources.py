@@ -17,15 +17,15 @@ import sys
 from python_module.common.utils import display_message
 
 
-# Load the config.ini file
 config_file = "config/python_app/media.ini"
 config = configparser.ConfigParser()
 
-if os.path.exists(config_file):
+def load_media_config():
+    """(Re)read media.ini; exits when it does not exist."""
+    if not os.path.exists(config_file):
+        display_message("e", f"Configuration File {config_file} not found.")
+        sys.exit(1)
     config.read(config_file)
-else:
-    display_message("e", f"Configuration File {config_file} not found.")
-    sys.exit(1)
 
 def save_config():
     with open(config_file, 'w') as configfile:
@@ -36,9 +36,8 @@ def sanitize_input(text):
     return text.replace('"', '').replace("'", "").strip()
 
 def get_active_sources():
-    if os.path.exists(config_file):
-        config.read(config_file)
-        num_active_sources = sum(1 for section in config.sections() if config[section]['enable'] == '1')
+    load_media_config()
+    num_active_sources = sum(1 for section in config.sections() if config[section]['enable'] == '1')
     return num_active_sources
 
 
@@ -178,6 +177,7 @@ def list_media():
     display_message("d", table)
 
 def list_active_media():
+    load_media_config()
     display_message("d","\nActive Media Sources:")
     table = PrettyTable()
     table.field_names = ["Media Name", "Media Type", "URL", "Status"]
@@ -346,7 +346,40 @@ def show_menu():
     
     display_message("d", menu)
 
+def add_media_entry(media_name, media_type, url, enable=True):
+    """Add a media source to media.ini without prompting, or enable it if its URL is already there."""
+    load_media_config()
+    enable_value = '1' if enable else '0'
+    for section in config.sections():
+        if config[section]['url'] == url:
+            config[section]['enable'] = enable_value
+            save_config()
+            return section
+    index = 0
+    while f'MediaSettings-{index}' in config:
+        index += 1
+    section = f'MediaSettings-{index}'
+    config[section] = {
+        'media_name': sanitize_input(media_name),
+        'type': media_type,
+        'url': url,
+        'enable': enable_value
+    }
+    save_config()
+    return section
+
+def set_media_enabled(url, enabled):
+    """Enable or disable the media.ini entries of `url`; returns False when there is none."""
+    load_media_config()
+    sections = [section for section in config.sections() if config[section]['url'] == url]
+    for section in sections:
+        config[section]['enable'] = '1' if enabled else '0'
+    if sections:
+        save_config()
+    return bool(sections)
+
 def manage_source():
+    load_media_config()
     while True:
         show_menu()
         choice = input("Select an option: ").strip()
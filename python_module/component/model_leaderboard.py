@@ -0,0 +1,288 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+import json
+import time
+import argparse
+import importlib
+import itertools
+from prettytable import PrettyTable
+from python_module.common.platform_info import get_platform_info
+from python_module.component.system_config import get_config
+from python_module.component.manage_models import catalog_entries, download_model
+from python_module.component.engine_registry import EngineRegistry, MODEL_ENGINE_DIR, batch_bucket, tensorrt_version
+from python_module.component.network_size import deployment_network_sizes, DEFAULT_NETWORK_SIZE
+
+LEADERBOARD_FILE = os.path.join(MODEL_ENGINE_DIR, 'leaderboard.json')
+LEADERBOARD_VERSION = 1
+
+# Catalog sizes from the least to the most accurate; the published mAP of the
+# catalog ("map") orders the models within a size
+SIZE_ORDER = ("Nano", "Small", "Medium", "Balanced", "Large", "Extra-large")
+
+# trtexec only measures inference, while the pipeline also decodes, batches, tracks
+# and draws: a model is recommended when it measured this much above the target
+THROUGHPUT_HEADROOM = 1.25
+
+
+class Leaderboard:
+    """Throughput and latency measured for catalog models, per GPU.
+
+    Results are keyed by GPU name and then by model, precision, batch size and
+    network size, so one file can hold the measurements of several devices
+    (e.g. copied from a fleet) and a new sweep only replaces what it measured.
+    """
+
+    def __init__(self, path=LEADERBOARD_FILE):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                leaderboard = json.load(file)
+            if leaderboard.get("version") == LEADERBOARD_VERSION:
+                return leaderboard
+        except (OSError, ValueError):
+            pass
+        return {"version": LEADERBOARD_VERSION, "gpus": {}}
+
+    def results(self, gpu):
+        return list(self.load()["gpus"].get(gpu, {}).values())
+
+    def record(self, gpu, result):
+        leaderboard = self.load()
+        key = f"{result['model_name']}:{result['precision']}:{result['batch_size']}:{result['network_size']}"
+        leaderboard["gpus"].setdefault(gpu, {})[key] = result
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_file, 'w') as file:
+            json.dump(leaderboard, file, indent=2, sort_keys=True)
+        os.replace(temp_file, self.path)
+
+
+class TrtexecBackend:
+    """Measure a model with trtexec on this GPU.
+
+    Engines come from the engine registry: a compatible engine that was already
+    benchmarked when it was built is not measured again, a missing one is built
+    (and benchmarked by the build), and one built with --build-only or for a
+    larger batch is benchmarked now.
+    """
+
+    def measure(self, model_name, precision, batch_size, network_size):
+        # Imported here: onnx_to_trt pulls in the curses and GPU monitoring of the build
+        from python_module.component.onnx_to_trt import process_onnx, benchmark_engine
+        model_file, label_file = download_model(model_name)
+        if not model_file:
+            return None
+        engine_file = process_onnx(model_file, label_file, batch_size, network_size, precision)
+        if not engine_file:
+            return None
+        performance = (EngineRegistry(MODEL_ENGINE_DIR).entry(engine_file) or {}).get("performance") or {}
+        if not performance.get("benchmarked") or performance.get("batch_size") != batch_size:
+            performance = benchmark_engine(engine_file, batch_size, network_size)
+        if not performance.get("benchmarked"):
+            return None
+        return dict(performance, engine=os.path.basename(engine_file))
+
+
+# Measurement backends selectable with --backend; "module:Class" names any other class with the same measure()
+BACKENDS = {"trtexec": TrtexecBackend}
+
+
+def load_backend(name):
+    if name in BACKENDS:
+        return BACKENDS[name]()
+    module_name, _, class_name = name.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), class_name)()
+    except (ImportError, AttributeError, ValueError) as e:
+        raise ValueError(f"Unknown measurement backend '{name}': {e}")
+
+
+def sweep_precisions(model_name, precisions):
+    """Precisions of `precisions` that apply to a model: QAT models only run as qat, the others never do."""
+    is_qat = 'qat' in model_name
+    return [precision for precision in precisions if (precision == 'qat') == is_qat]
+
+
+def sweep(entries, precisions, batch_sizes, network_sizes, backend, leaderboard, gpu):
+    """Measure every catalog entry at the given precisions, batch and network sizes and record the results.
+
+    Returns the recorded results; failed measurements are reported and skipped.
+    """
+    results = []
+    batch_sizes = sorted({batch_bucket(batch_size) for batch_size in batch_sizes})
+    for entry in entries:
+        for precision in sweep_precisions(entry['model_name'], precisions):
+            for network_size, batch_size in itertools.product(network_sizes, batch_sizes):
+                label = f"{entry['model_name']} {precision} batch {batch_size} netsize {network_size}"
+                print(f"\nLeaderboard: measuring {label}")
+                performance = backend.measure(entry['model_name'], precision, batch_size, network_size)
+                if not performance or not performance.get("images_per_second"):
+                    print(f"Leaderboard: no measurement for {label}, skipped.")
+                    continue
+                result = {
+                    "model_name": entry['model_name'],
+                    "dataset": entry['dataset'],
+                    "type": entry['type'],
+                    "size": entry['size'],
+                    "precision": precision,
+                    "batch_size": performance.get("batch_size", batch_size),
+                    "network_size": network_size,
+                    "images_per_second": performance["images_per_second"],
+                    "latency_ms": performance.get("latency_ms", {}),
+                    "gpu_compute_ms": performance.get("gpu_compute_ms", {}),
+                    "engine": performance.get("engine"),
+                    "tensorrt": performance.get("tensorrt", tensorrt_version()),
+                    "measured": time.time(),
+                }
+                leaderboard.record(gpu, result)
+                results.append(result)
+    return results
+
+
+def accuracy_key(entry):
+    """Sort key ranking catalog entries from the least to the most accurate."""
+    size = SIZE_ORDER.index(entry['size']) if entry['size'] in SIZE_ORDER else -1
+    return size, entry.get('map', 0)
+
+
+def recommend(entries, results, target_fps, num_streams, network_size=640, headroom=THROUGHPUT_HEADROOM):
+    """Most accurate catalog entry whose measured throughput sustains `target_fps` on `num_streams`.
+
+    The pipeline runs engines of the power-of-two batch covering the streams, so
+    each model is judged on its result at the largest measured batch up to that
+    one (throughput grows with the batch, so a smaller batch underestimates it).
+    Returns (entry, result), or (None, None) when no measured model is fast enough.
+    """
+    batch_size = batch_bucket(max(1, num_streams))
+    required = target_fps * num_streams * headroom
+    best = {}
+    for result in results:
+        if result["network_size"] != network_size or result["batch_size"] > batch_size:
+            continue
+        current = best.get(result["model_name"])
+        if current is None or (result["batch_size"], result["images_per_second"]) > \
+                (current["batch_size"], current["images_per_second"]):
+            best[result["model_name"]] = result
+    fast_enough = [entry for entry in entries
+                   if entry['model_name'] in best and best[entry['model_name']]["images_per_second"] >= required]
+    if not fast_enough:
+        return None, None
+    entry = max(fast_enough, key=accuracy_key)
+    return entry, best[entry['model_name']]
+
+
+def recommend_for_device(entries, num_streams, target_fps=None, network_sizes=None):
+    """recommend() over the leaderboard results of this GPU at the network sizes the deployment may run.
+
+    `target_fps` defaults to TARGET_FPS and `network_sizes` to NETWORK_SIZE, or
+    with NETWORK_SIZE = auto to the ladder sizes up to the muxer output. The
+    most accurate model found at any of them is returned, with its result at
+    the largest size it sustains.
+    """
+    config_values = get_config()
+    target_fps = target_fps or config_values['TARGET_FPS']
+    if network_sizes is None:
+        try:
+            network_sizes = deployment_network_sizes(config_values)
+        except ValueError:
+            # Reported when the network size is applied
+            network_sizes = [DEFAULT_NETWORK_SIZE]
+    results = Leaderboard().results(get_platform_info().get_gpu_name())
+    best_entry, best_result = None, None
+    for network_size in sorted(network_sizes, reverse=True):
+        entry, result = recommend(entries, results, target_fps, num_streams, network_size)
+        if entry and (best_entry is None or accuracy_key(entry) > accuracy_key(best_entry)):
+            best_entry, best_result = entry, result
+    return best_entry, best_result
+
+
+def print_leaderboard(entries, results, recommended=()):
+    table = PrettyTable()
+    table.field_names = ["Model Name", "Size", "mAP", "Precision", "Network Size", "Batch", "Images/s", "Latency p99 (ms)", ""]
+    table.align["Model Name"] = "l"
+    catalog = {entry['model_name']: entry for entry in entries}
+    rows = sorted((result for result in results if result["model_name"] in catalog),
+                  key=lambda result: (accuracy_key(catalog[result["model_name"]]), result["network_size"],
+                                      result["batch_size"]),
+                  reverse=True)
+    for result in rows:
+        entry = catalog[result["model_name"]]
+        table.add_row([result["model_name"], entry['size'], entry.get('map', '-'), result["precision"],
+                       result["network_size"], result["batch_size"], f"{result['images_per_second']:.0f}",
+                       f"{result['latency_ms'].get('p99', 0):.2f}",
+                       "recommended" if result in recommended else ""])
+    print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure catalog models on this GPU and recommend one for a camera count.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("sweep", "Build or reuse engines and measure them"), ("show", "Show the results of this GPU")):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument("--dataset", help="Dataset, e.g. COCO")
+        subparser.add_argument("--type", help="Detection or Segmentation")
+        subparser.add_argument("--size", help="Nano, Small, Medium, Balanced, Large or Extra-large")
+        subparser.add_argument("--model", action="append", help="Model name; may be repeated")
+        subparser.add_argument("-n", "--network_size", action="append", type=int,
+                               help="Network size; may be repeated, e.g. -n 320 -n 640 (default: 640)")
+        subparser.add_argument("--streams", type=int, help="Recommend a model for this many streams")
+        subparser.add_argument("--fps", type=float, help="Frame rate to sustain per stream (default: TARGET_FPS)")
+    sweep_parser = subparsers.choices["sweep"]
+    sweep_parser.add_argument("-p", "--precision", action="append", choices=["fp32", "fp16", "qat"],
+                              help="Precision; may be repeated (default: fp16 and qat)")
+    sweep_parser.add_argument("-b", "--batch_size", action="append", type=int,
+                              help="Batch size, rounded up to a power of two; may be repeated (default: 1 and 8)")
+    sweep_parser.add_argument("--backend", default="trtexec",
+                              help="Measurement backend: trtexec, or module:Class for another one (default: trtexec)")
+    args = parser.parse_args()
+
+    entries = catalog_entries(args.dataset, args.type, args.size, args.model)
+    if not entries:
+        print("No model of the catalog matches the selection.")
+        return 1
+    leaderboard = Leaderboard()
+    gpu = get_platform_info().get_gpu_name()
+    network_sizes = args.network_size or [640]
+
+    if args.command == "sweep":
+        try:
+            backend = load_backend(args.backend)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        results = sweep(entries, args.precision or ["fp16", "qat"], args.batch_size or [1, 8],
+                        network_sizes, backend, leaderboard, gpu)
+        print(f"\nLeaderboard of {gpu} updated with {len(results)} results: {leaderboard.path}")
+    else:
+        results = [result for result in leaderboard.results(gpu) if result["network_size"] in network_sizes]
+        print(f"\nLeaderboard of {gpu}:")
+
+    recommended = []
+    for network_size in network_sizes if args.streams else []:
+        target_fps = args.fps or get_config()['TARGET_FPS']
+        entry, result = recommend(entries, results, target_fps, args.streams, network_size)
+        if entry:
+            recommended.append(result)
+            print(f"Recommended for {args.streams} streams at {target_fps:g} FPS and network size {network_size}: "
+                  f"{entry['model_name']} ({result['precision']}, {result['images_per_second']:.0f} img/s at batch {result['batch_size']})")
+        else:
+            print(f"No measured model sustains {args.streams} streams at {target_fps:g} FPS with network size {network_size}.")
+    print_leaderboard(entries, results, recommended)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
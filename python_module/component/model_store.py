@@ -0,0 +1,202 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+import json
+import shutil
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, unquote
+from python_module.component.system_config import get_config
+from python_module.component.manage_models import (download_file, verify_file, file_digest, asset_sha256,
+                                                   catalog_entries, MODEL_ASSET, MODEL_ONNX_DIR)
+
+
+def link_or_copy(source, destination):
+    """Hard link `source` to `destination` (same filesystem), else copy it; replaces `destination`."""
+    temp_file = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(source, temp_file)
+    except OSError:
+        shutil.copyfile(source, temp_file)
+    os.replace(temp_file, destination)
+
+
+class ModelStore:
+    """Resolve model assets through a local cache, LAN mirrors and finally upstream.
+
+    The cache is content addressed: files live in `objects/<sha256>` and an
+    index maps each asset (name and size) to its hash, so identical files are
+    stored once and hits are hard links into models/onnx/. Mirrors are plain
+    directories or HTTP servers holding the assets by name, e.g. a directory
+    filled by `prefetch --mirror-dir` and served with `python3 -m http.server`;
+    `file://` and bare paths are copied, `http(s)://` downloaded. Whatever is
+    fetched from a mirror or upstream is added to the cache.
+    """
+
+    def __init__(self, cache_dir, mirrors=(), upstream=True):
+        self.cache_dir = cache_dir
+        self.mirrors = [mirror.rstrip('/') for mirror in mirrors if mirror]
+        self.upstream = upstream
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.lock = threading.Lock()
+
+    def load_index(self):
+        try:
+            with open(self.index_file, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def asset_key(self, asset):
+        return f"{asset['name']}:{asset.get('size')}"
+
+    def object_path(self, sha256):
+        return os.path.join(self.cache_dir, 'objects', sha256)
+
+    def cached(self, asset):
+        """Path of the cached copy of `asset`, or None."""
+        sha256 = asset_sha256(asset) or self.load_index().get(self.asset_key(asset))
+        if not sha256:
+            return None
+        path = self.object_path(sha256)
+        return path if verify_file(path, asset.get('size'))[0] else None
+
+    def add(self, asset, file_path):
+        """Move a downloaded file into the cache and return its object path."""
+        sha256 = file_digest(file_path)
+        expected = asset_sha256(asset)
+        if expected and sha256 != expected:
+            os.remove(file_path)
+            raise IOError(f"sha256 of {asset['name']} does not match")
+        path = self.object_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(file_path, path)
+        with self.lock:
+            index = self.load_index()
+            index[self.asset_key(asset)] = sha256
+            temp_file = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as file:
+                json.dump(index, file, indent=2, sort_keys=True)
+            os.replace(temp_file, self.index_file)
+        return path
+
+    def sources(self, asset):
+        """URLs or paths to try for `asset`, nearest first."""
+        sources = [f"{mirror}/{asset['name']}" for mirror in self.mirrors]
+        if self.upstream:
+            sources.append(asset['url'])
+        return sources
+
+    def fetch_source(self, source, asset, staging_file):
+        if source.startswith(('http://', 'https://')):
+            return download_file(source, staging_file, asset.get('size'), asset_sha256(asset))
+        path = unquote(urlparse(source).path) if source.startswith('file://') else source
+        if not verify_file(path, asset.get('size'), asset_sha256(asset))[0]:
+            return False
+        shutil.copyfile(path, staging_file)
+        return True
+
+    def fetch(self, asset, destination=None):
+        """Make `asset` available in the cache and, when given, at `destination`.
+
+        Returns the path of the file, or None when no source could provide it.
+        """
+        path = self.cached(asset)
+        if path is None:
+            staging_dir = os.path.join(self.cache_dir, 'staging')
+            os.makedirs(staging_dir, exist_ok=True)
+            staging_file = os.path.join(staging_dir, asset['name'])
+            for source in self.sources(asset):
+                if self.fetch_source(source, asset, staging_file):
+                    try:
+                        path = self.add(asset, staging_file)
+                    except IOError as e:
+                        print(f"{asset['name']}: {e} at {source}, trying the next source")
+                        continue
+                    print(f"{asset['name']}: fetched from {source}")
+                    break
+            if path is None:
+                print(f"{asset['name']}: not available from any source {self.sources(asset)}")
+                return None
+        if destination:
+            os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+            link_or_copy(path, destination)
+            return destination
+        return path
+
+    def fetch_many(self, assets, destination_dir=None, workers=4):
+        """Fetch assets concurrently; returns {asset name: path or None}."""
+        def fetch(asset):
+            destination = os.path.join(destination_dir, asset['name']) if destination_dir else None
+            return asset['name'], self.fetch(asset, destination)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return dict(executor.map(fetch, assets))
+
+
+def get_model_store():
+    config_values = get_config()
+    mirrors = [mirror.strip() for mirror in config_values['MODEL_MIRRORS'].split(',')]
+    return ModelStore(os.path.expanduser(config_values['MODEL_CACHE_DIR']), mirrors)
+
+
+def catalog_models(dataset=None, model_type=None, size=None, names=None):
+    """Model names of the catalog matching the filters (all when none is given)."""
+    return list(dict.fromkeys(entry['model_name'] for entry in catalog_entries(dataset, model_type, size, names)))
+
+
+def model_assets(model_names):
+    """The ONNX and label assets of the given models."""
+    with open(MODEL_ASSET, 'r') as file:
+        assets = json.load(file)["assets"]
+    wanted = {f"{name}{extension}" for name in model_names for extension in ('.onnx', '.txt')}
+    return [asset for asset in assets if asset['name'] in wanted]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror models of the catalog into the local model store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prefetch = subparsers.add_parser("prefetch", help="Fetch a subset of models_catalog.json concurrently")
+    prefetch.add_argument("--dataset", help="Dataset, e.g. COCO")
+    prefetch.add_argument("--type", help="Detection or Segmentation")
+    prefetch.add_argument("--size", help="Nano, Small, Medium, Balanced, Large or Extra-large")
+    prefetch.add_argument("--model", action="append", help="Model name; may be repeated")
+    prefetch.add_argument("--mirror-dir", help="Also lay the files out by name in this directory, to serve as a mirror")
+    prefetch.add_argument("--install", action="store_true", help=f"Also link the files into {MODEL_ONNX_DIR}")
+    prefetch.add_argument("--workers", type=int, default=4, help="Files fetched concurrently (default: 4)")
+    args = parser.parse_args()
+
+    names = catalog_models(args.dataset, args.type, args.size, args.model)
+    assets = model_assets(names)
+    if not assets:
+        print("No model of the catalog matches the selection.")
+        return 1
+    print(f"Prefetching {len(names)} models ({len(assets)} files, "
+          f"{sum(asset.get('size', 0) for asset in assets) / 1024 ** 2:.0f} MB)")
+    store = get_model_store()
+    results = store.fetch_many(assets, workers=args.workers)
+    for directory in (args.mirror_dir, MODEL_ONNX_DIR if args.install else None):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for name, path in results.items():
+                if path:
+                    link_or_copy(path, os.path.join(directory, name))
+    failed = [name for name, path in results.items() if not path]
+    print(f"Prefetch complete: {len(results) - len(failed)} files in {store.cache_dir}"
+          + (f", failed: {', '.join(failed)}" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
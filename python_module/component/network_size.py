@@ -0,0 +1,151 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import math
+from python_module.common.platform_info import get_platform_info
+from python_module.component.system_config import get_config
+from python_module.component.engine_registry import EngineRegistry, MODEL_ENGINE_DIR, batch_bucket
+
+DEFAULT_NETWORK_SIZE = 640
+# YOLO downsamples the input by up to 32, and NvDCF wants tracker dimensions aligned the same way
+NETWORK_SIZE_ALIGNMENT = 32
+
+# Whether the network size of this launch is chosen automatically, see requested_network_size()
+_auto_requested = False
+
+
+def parse_network_size(value):
+    """'auto', or the network size `value` as an int; raises ValueError when it is neither."""
+    if str(value).strip().lower() == 'auto':
+        return 'auto'
+    size = int(value)
+    if size <= 0 or size % NETWORK_SIZE_ALIGNMENT:
+        raise ValueError(f"network size {size} is not a positive multiple of {NETWORK_SIZE_ALIGNMENT}")
+    return size
+
+
+def requested_network_size(value):
+    """parse_network_size() for the size requested for this launch, remembering whether it is 'auto'."""
+    global _auto_requested
+    network_size = parse_network_size(value)
+    _auto_requested = network_size == 'auto'
+    return network_size
+
+
+def is_auto_requested():
+    return _auto_requested
+
+
+def parse_ladder(text):
+    """Network sizes of a comma-separated ladder such as '320,416,512,640,960', ascending."""
+    return sorted({parse_network_size(size) for size in str(text).split(',') if size.strip()})
+
+
+def deployment_network_sizes(config_values):
+    """Network sizes a deployment may run: NETWORK_SIZE, or with 'auto' the sizes of
+    NETWORK_SIZE_LADDER up to the long side of the muxer output; raises ValueError when invalid."""
+    network_size = parse_network_size(config_values['NETWORK_SIZE'])
+    if network_size != 'auto':
+        return [network_size]
+    ladder = parse_ladder(config_values['NETWORK_SIZE_LADDER'])
+    max_size = max(config_values['MUXER_OUTPUT_WIDTH'], config_values['MUXER_OUTPUT_HEIGHT'])
+    return [size for size in ladder if size <= max_size] or ladder[:1]
+
+
+def tracker_dimensions(network_size, frame_width, frame_height):
+    """Tracker width and height for a network size: the frame aspect ratio with the long side
+    at the network size, aligned to 32 (640 for 1920x1080 frames gives 640x384)."""
+    short_side = min(frame_width, frame_height) * network_size / max(frame_width, frame_height)
+    short_side = max(NETWORK_SIZE_ALIGNMENT, math.ceil(short_side / NETWORK_SIZE_ALIGNMENT) * NETWORK_SIZE_ALIGNMENT)
+    return (network_size, short_side) if frame_width >= frame_height else (short_side, network_size)
+
+
+def muxer_dimensions(network_size, frame_width, frame_height):
+    """Smallest muxer output with the frame aspect ratio whose long side covers the network
+    size; never larger than the frame. Dimensions are even, as the scaler requires."""
+    scale = min(1.0, network_size / max(frame_width, frame_height))
+    return (max(2, round(frame_width * scale / 2) * 2), max(2, round(frame_height * scale / 2) * 2))
+
+
+def measured_throughput(onnx_file, precision, batch_size):
+    """{network size: images/s} measured on this GPU for a model at the largest batch up
+    to the batch bucket of `batch_size`, from the engine registry and the leaderboard."""
+    # Imported here: the pipeline only needs the dimension helpers of this module
+    from python_module.component.model_leaderboard import Leaderboard
+    bucket = batch_bucket(batch_size)
+    registry = EngineRegistry(MODEL_ENGINE_DIR)
+    identity = registry.identity(onnx_file, precision, DEFAULT_NETWORK_SIZE)
+    measurements = []
+    for entry in registry.load()["engines"].values():
+        performance = entry.get("performance") or {}
+        if performance.get("benchmarked") and all(entry.get(field) == identity[field] for field in
+                                                 ("onnx_sha256", "precision", "tensorrt", "gpu")):
+            measurements.append((entry["network_size"], performance["batch_size"], performance["images_per_second"]))
+    for result in Leaderboard().results(identity["gpu"]):
+        if result["model_name"] == identity["onnx_name"] and result["precision"] == precision:
+            measurements.append((result["network_size"], result["batch_size"], result["images_per_second"]))
+
+    # Throughput grows with the batch, so the largest batch measured is the closest to the deployment
+    best = {}
+    for network_size, measured_batch, images_per_second in measurements:
+        if measured_batch <= bucket:
+            best[network_size] = max(best.get(network_size, (0, 0)), (measured_batch, images_per_second))
+    return {network_size: images_per_second for network_size, (_, images_per_second) in best.items()}
+
+
+def estimate_throughput(throughput, network_size):
+    """(images/s, estimated) at `network_size`: measured, or scaled from the nearest measured size
+    by the pixel count; (None, True) when nothing was measured."""
+    if network_size in throughput:
+        return throughput[network_size], False
+    if not throughput:
+        return None, True
+    nearest = min(throughput, key=lambda size: abs(size - network_size))
+    return throughput[nearest] * (nearest / network_size) ** 2, True
+
+
+def select_network_size(ladder, throughput, required, max_size):
+    """Largest ladder size up to `max_size` whose throughput reaches `required` images/s.
+
+    Returns (network size, reason). Without any measurement the default size
+    is kept (within `max_size`); when no size is fast enough, the smallest one.
+    """
+    sizes = [size for size in ladder if size <= max_size] or ladder[:1]
+    if not throughput:
+        size = max([s for s in sizes if s <= DEFAULT_NETWORK_SIZE] or sizes[:1])
+        return size, "no throughput measured for this model on this GPU"
+    for size in reversed(sizes):
+        images_per_second, estimated = estimate_throughput(throughput, size)
+        if images_per_second >= required:
+            return size, f"{'estimated' if estimated else 'measured'} {images_per_second:.0f} img/s, {required:.0f} needed"
+    images_per_second, _ = estimate_throughput(throughput, sizes[0])
+    return sizes[0], f"no size reaches {required:.0f} img/s ({images_per_second:.0f} at {sizes[0]})"
+
+
+def choose_network_size(onnx_file, precision, num_sources, batch_size=None):
+    """Network size of a deployment with NETWORK_SIZE = auto.
+
+    The ladder is capped at the long side of the muxer output, which every
+    frame is scaled to before inference, since a larger network would only
+    upscale it. Among the remaining sizes, the largest one sustaining
+    TARGET_FPS on every source (with the leaderboard headroom) is chosen.
+    """
+    from python_module.component.model_leaderboard import THROUGHPUT_HEADROOM
+    config_values = get_config()
+    ladder = parse_ladder(config_values['NETWORK_SIZE_LADDER'])
+    max_size = max(config_values['MUXER_OUTPUT_WIDTH'], config_values['MUXER_OUTPUT_HEIGHT'])
+    required = config_values['TARGET_FPS'] * num_sources * THROUGHPUT_HEADROOM
+    throughput = measured_throughput(onnx_file, precision, batch_size or num_sources)
+    network_size, reason = select_network_size(ladder, throughput, required, max_size)
+    print(f"Network size {network_size} selected for {num_sources} sources at {config_values['TARGET_FPS']:g} FPS "
+          f"on {get_platform_info().get_gpu_name()}: {reason}")
+    return network_size
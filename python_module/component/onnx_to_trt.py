@@ -1,15 +1,29 @@
 import os
+import sys
 import subprocess
 import argparse
 import re
+import json
 import threading
 import time
-import curses
 from prettytable import PrettyTable
 import subprocess
-from python_module.common.platform_info import PlatformInfo
-
-MODEL_ENGINE_DIR = '/apps/deepstream-yolo-e2e/models/engine/'
+from python_module.common.platform_info import get_platform_info
+from python_module.component.system_config import get_config
+from python_module.component.engine_registry import EngineRegistry, MODEL_ENGINE_DIR, batch_bucket
+
+# Lines of the trtexec performance summary, and the record field each one is stored in
+TRTEXEC_TIMING_KEYS = {
+    "Latency": "latency_ms",
+    "GPU Compute Time": "gpu_compute_ms",
+    "H2D Latency": "h2d_ms",
+    "D2H Latency": "d2h_ms",
+    "Enqueue Time": "enqueue_ms",
+}
+TRTEXEC_TIMING_PATTERN = re.compile(r'(\w+|percentile\([\d.]+%\)) = ([\d.]+) ms')
+
+# Engines process_onnx(background=True) left to build while the pipeline runs with a fallback engine
+deferred_builds = []
 
 # Function to count non-empty lines in the label file
 def count_labels(label_file):
@@ -23,9 +37,50 @@ def count_labels(label_file):
         return len(labels)
 
 # Function to run the trtexec command
-def run_trtexec(command):
-    """Run the trtexec command without displaying output."""
-    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+def run_trtexec(command, log_file=None):
+    """Run the trtexec command without displaying output, saving it to `log_file` when given."""
+    if not log_file:
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    with open(log_file, 'w') as file:
+        subprocess.run(command, stdout=file, stderr=subprocess.STDOUT)
+
+
+def parse_timing(text):
+    """Parse 'min = 1.2 ms, max = 3.4 ms, ..., percentile(99%) = 2.8 ms' into {"min": 1.2, ..., "p99": 2.8}."""
+    timing = {}
+    for name, value in TRTEXEC_TIMING_PATTERN.findall(text):
+        percentile = re.match(r'percentile\((\d+(?:\.\d+)?)%\)', name)
+        timing[f"p{percentile.group(1)}" if percentile else name] = float(value)
+    return timing
+
+
+def parse_trtexec_log(log_file):
+    """Extract the performance summary and build time from a trtexec log.
+
+    Returns a dict with throughput (queries and images per second of the opt
+    batch), latency, GPU compute, H2D and D2H time statistics in ms and the
+    engine build time in seconds; fields missing from the log are left out.
+    """
+    record = {}
+    try:
+        with open(log_file, 'r', errors='replace') as file:
+            lines = file.readlines()
+    except OSError:
+        return record
+    for line in lines:
+        # Strip the '[date-time] [I] ' prefix of every trtexec line
+        text = line.split('] ')[-1].strip()
+        key, _, value = text.partition(': ')
+        if key == "Throughput":
+            record["throughput_qps"] = float(value.split()[0])
+        elif key in TRTEXEC_TIMING_KEYS and " = " in value:
+            record[TRTEXEC_TIMING_KEYS[key]] = parse_timing(value)
+        else:
+            built = re.match(r'Engine built in ([\d.]+) sec', text)
+            if built:
+                record["build_seconds"] = float(built.group(1))
+    return record
 
 # Function to get GPU usage using nvidia-smi
 def get_gpu_usage():
@@ -54,7 +109,7 @@ def get_gpu_name():
         return "Unknown GPU"
 
 def spinner_and_gpu_monitor(stdscr, stop_event, model_name, network_size, batch_size, precision):
-    platform_info = PlatformInfo()
+    platform_info = get_platform_info()
     """Display a spinner, GPU usage, and model details in the terminal. Stops when stop_event is set."""
     is_integrated_or_aarch64 = platform_info.is_integrated_gpu() or platform_info.is_platform_aarch64()
     
@@ -109,7 +164,7 @@ def spinner_and_gpu_monitor(stdscr, stop_event, model_name, network_size, batch_
 
 
 
-def update_output(stdscr, command, model_name, network_size, batch_size, precision ):
+def update_output(stdscr, command, model_name, network_size, batch_size, precision, log_file=None):
     """Curses-based function to manage the spinner and GPU usage."""
     stop_event = threading.Event()  # Create a stop event for the spinner
     
@@ -119,8 +174,8 @@ def update_output(stdscr, command, model_name, network_size, batch_size, precisi
     spinner_thread = threading.Thread(target=spinner_and_gpu_monitor, args=(stdscr, stop_event, model_name, network_size, batch_size, precision ))
     spinner_thread.start()
 
-    # Run trtexec in the main thread (no output capture)
-    run_trtexec(command)
+    # Run trtexec in the main thread, its output going to the build log
+    run_trtexec(command, log_file)
 
     # Set stop_event to stop the spinner after trtexec finishes
     stop_event.set()
@@ -129,7 +184,19 @@ def update_output(stdscr, command, model_name, network_size, batch_size, precisi
     spinner_thread.join()
 
 # Function to process the ONNX file and generate TensorRT engine
-def process_onnx(file, label_file, batch_size=1, network_size=640, precision="fp16", pgie_config_file=None, force=False):
+def process_onnx(file, label_file, batch_size=1, network_size=640, precision="fp16", pgie_config_file=None, force=False, background=False, build_only=False, exact_batch=False):
+    """Find or build the engine of an ONNX model and point the PGIE config at it.
+
+    With `background`, a missing engine is not built here when another engine
+    of the same model can serve meanwhile: that engine is used and the build is
+    added to `deferred_builds`, to run while the pipeline plays.
+
+    The trtexec output of a build is kept in `<engine>.log` and its performance
+    summary in `<engine>.perf.json` and the engine registry. `build_only` skips
+    trtexec's inference benchmark, so only the build time is recorded.
+    `exact_batch` only reuses an engine built for the batch bucket of
+    `batch_size`, instead of the smallest engine covering it.
+    """
     # Check if the file exists
     if not os.path.isfile(file):
         print(f"Error: The file '{file}' does not exist.")
@@ -148,6 +215,11 @@ def process_onnx(file, label_file, batch_size=1, network_size=640, precision="fp
         print(f"Error: Invalid precision. Use fp32, fp16, or qat.")
         return
 
+    # YOLO downsamples the input by up to 32
+    if network_size <= 0 or network_size % 32:
+        print(f"Error: Invalid network size {network_size}. Use a multiple of 32, e.g. 320, 416, 512, 640 or 960.")
+        return
+
     # Ensure the MODEL_ENGINE_DIR exists
     if not os.path.exists(MODEL_ENGINE_DIR):
         os.makedirs(MODEL_ENGINE_DIR)
@@ -155,27 +227,37 @@ def process_onnx(file, label_file, batch_size=1, network_size=640, precision="fp
     # Extract filename without extension
     filename = os.path.basename(file).replace(".onnx", "")
     model_name = os.path.basename(file).replace(".onnx", "")
-    engine_filename = f"{filename}-{precision}-netsize-{network_size}-batch-{batch_size}.engine"
-    engine_timing_filename = f"{filename}-{precision}-netsize-{network_size}.engine.timing.cache"
+    # One timing cache per model: builds at other precisions, network or batch sizes reuse the tactics already timed
+    engine_timing_filename = f"{filename}.engine.timing.cache"
 
     # Generate full paths for the engine and timing cache files in the MODEL_ENGINE_DIR
-    engine_filepath = os.path.join(MODEL_ENGINE_DIR, engine_filename)
     engine_timing_filepath = os.path.join(MODEL_ENGINE_DIR, engine_timing_filename)
-    existing_engines = [
-        f for f in os.listdir(MODEL_ENGINE_DIR)
-        if re.match(rf"{filename}-{precision}-netsize-{network_size}-batch-(\d+)\.engine", f)
-    ]
-    
-    for engine in existing_engines:
-        existing_batch_size = int(re.search(r"-batch-(\d+)\.engine", engine).group(1))
 
-        if existing_batch_size >= batch_size:
-            engine_filepath = os.path.join(MODEL_ENGINE_DIR, engine)
-            break
+    # The registry only returns engines built from this exact ONNX for the installed TensorRT and GPU
+    registry = EngineRegistry(MODEL_ENGINE_DIR, int(get_config()['ENGINE_CACHE_QUOTA_GB'] * 1024 ** 3))
+    identity = registry.identity(file, precision, network_size)
+    if force:
+        engine_filepath = None
+    elif exact_batch:
+        engine_filepath = registry.find_exact(identity, batch_bucket(batch_size))
+    else:
+        engine_filepath = registry.find(identity, batch_size)
+    # New engines cover the whole power-of-two bucket of the requested batch size
+    engine_batch_size = batch_bucket(batch_size)
+    fallback_filepath = registry.find_fallback(identity, batch_size) if background and not engine_filepath else None
 
-    if os.path.isfile(engine_filepath) and not force:
+    if engine_filepath:
+        engine_batch_size = registry.entry(engine_filepath)["max_batch"]
         print(f"Warning: The engine file '{engine_filepath}' already exists and will be reused. Use --force to rebuild.")
+    elif fallback_filepath:
+        deferred_builds.append({"onnx_file": os.path.abspath(file), "label_file": os.path.abspath(label_file),
+                                "batch_size": batch_size, "precision": precision})
+        engine_filepath = fallback_filepath
+        engine_batch_size = registry.entry(engine_filepath)["max_batch"]
+        print(f"Engine for {precision} batch {batch_bucket(batch_size)} not built yet: serving with "
+              f"'{engine_filepath}' while it builds in the background.")
     else:
+        engine_filepath = registry.engine_path(identity, engine_batch_size)
         # Run trtexec with the provided options
         command = [
                     "trtexec",
@@ -183,16 +265,33 @@ def process_onnx(file, label_file, batch_size=1, network_size=640, precision="fp
                     ] + precision_flags + [  # Include precision flags as separate elements
                     f"--saveEngine={engine_filepath}",
                     f"--timingCacheFile={engine_timing_filepath}",
+                    ] + (["--skipInference"] if build_only else [
                     "--warmUp=500",
                     "--duration=10",
                     "--useCudaGraph",
+                    ]) + [
                     f"--minShapes=images:1x3x{network_size}x{network_size}",
-                    f"--optShapes=images:{batch_size}x3x{network_size}x{network_size}",
-                    f"--maxShapes=images:{batch_size}x3x{network_size}x{network_size}"
+                    f"--optShapes=images:{engine_batch_size}x3x{network_size}x{network_size}",
+                    f"--maxShapes=images:{engine_batch_size}x3x{network_size}x{network_size}"
                 ]
 
-        # Start the curses application for the spinner and GPU monitoring
-        curses.wrapper(update_output, command, model_name, network_size, batch_size, precision )
+        log_filepath = f"{engine_filepath}.log"
+        start_time = time.time()
+        if sys.stdout.isatty():
+            import curses
+            # Start the curses application for the spinner and GPU monitoring
+            curses.wrapper(update_output, command, model_name, network_size, engine_batch_size, precision, log_filepath)
+        else:
+            print(f"Building TensorRT engine '{engine_filepath}'. This process may take up to 15 minutes.")
+            run_trtexec(command, log_filepath)
+        if os.path.isfile(engine_filepath):
+            performance = engine_performance(log_filepath, engine_batch_size, time.time() - start_time, build_only)
+            save_performance(engine_filepath, performance)
+            registry.register(identity, engine_batch_size, engine_filepath, performance=performance)
+            print_performance(performance)
+        else:
+            print(f"trtexec output: {log_filepath}")
+    registry.evict(keep=[engine_filepath])
 
     # Count the number of labels (non-empty lines) in the label file
     num_detected_classes = count_labels(label_file)
@@ -202,7 +301,69 @@ def process_onnx(file, label_file, batch_size=1, network_size=640, precision="fp
         file_abs_path = os.path.abspath(file)
         engine_abs_path = os.path.abspath(engine_filepath)
         label_file_abs_path = os.path.abspath(label_file)
-        update_config_file(pgie_config_file, file_abs_path, engine_abs_path, label_file_abs_path, num_detected_classes, batch_size, network_size)
+        # nvinfer batches up to the bucket so sources added within it need no new engine
+        pgie_batch_size = min(batch_bucket(batch_size), engine_batch_size)
+        update_config_file(pgie_config_file, file_abs_path, engine_abs_path, label_file_abs_path, num_detected_classes, pgie_batch_size, network_size)
+
+    if not os.path.isfile(engine_filepath):
+        print(f"Error: The engine file '{engine_filepath}' was not created.")
+        return None
+    return engine_filepath
+
+def engine_performance(log_file, batch_size, wall_seconds=None, build_only=False):
+    """Performance record of an engine from its trtexec log; `wall_seconds` stands in for a build time missing from the log."""
+    performance = parse_trtexec_log(log_file)
+    if wall_seconds is not None:
+        performance.setdefault("build_seconds", round(wall_seconds, 1))
+    performance.update(batch_size=batch_size, benchmarked="throughput_qps" in performance,
+                       recorded=time.time(), trtexec_log=log_file)
+    if build_only:
+        performance["benchmarked"] = False
+    if performance["benchmarked"]:
+        # trtexec runs queries of the opt shape, i.e. batch_size images each
+        performance["images_per_second"] = round(performance["throughput_qps"] * batch_size, 1)
+    return performance
+
+
+def save_performance(engine_file, performance):
+    with open(f"{engine_file}.perf.json", 'w') as perf_file:
+        json.dump(performance, perf_file, indent=2)
+
+
+def benchmark_engine(engine_file, batch_size, network_size):
+    """Benchmark an existing engine with trtexec (e.g. one built with --build-only) and record its performance."""
+    log_file = f"{engine_file}.log"
+    command = [
+                "trtexec",
+                f"--loadEngine={engine_file}",
+                f"--shapes=images:{batch_size}x3x{network_size}x{network_size}",
+                "--warmUp=500",
+                "--duration=10",
+                "--useCudaGraph",
+            ]
+    print(f"Benchmarking TensorRT engine '{engine_file}' at batch {batch_size}.")
+    run_trtexec(command, log_file)
+    registry = EngineRegistry(MODEL_ENGINE_DIR)
+    previous = (registry.entry(engine_file) or {}).get("performance") or {}
+    performance = engine_performance(log_file, batch_size, previous.get("build_seconds"))
+    save_performance(engine_file, performance)
+    registry.record_performance(engine_file, performance)
+    return performance
+
+
+def print_performance(performance):
+    table = PrettyTable()
+    table.field_names = ["Build (s)", "Batch", "Images/s", "GPU Compute p50/p99 (ms)", "H2D/D2H mean (ms)"]
+    if performance["benchmarked"]:
+        gpu = performance.get("gpu_compute_ms", {})
+        h2d = performance.get("h2d_ms", {}).get("mean", 0)
+        d2h = performance.get("d2h_ms", {}).get("mean", 0)
+        table.add_row([performance["build_seconds"], performance["batch_size"], performance["images_per_second"],
+                       f"{gpu.get('median', 0):.2f} / {gpu.get('p99', 0):.2f}", f"{h2d:.2f} / {d2h:.2f}"])
+    else:
+        table.add_row([performance["build_seconds"], performance["batch_size"], "-", "-", "-"])
+    print(table)
+
 
 # Function to update the configuration file
 def update_config_file(pgie_config_file, onnx_file, engine_file, label_file, num_detected_classes, batch_size, network_size):
@@ -244,18 +405,37 @@ def update_config_file(pgie_config_file, onnx_file, engine_file, label_file, num
 # Main function to handle command-line arguments
 def main():
     parser = argparse.ArgumentParser(description="Process ONNX file and generate TensorRT engine.")
-    parser.add_argument("-f", "--file", required=True, help="Name of the .onnx file to be processed")
-    parser.add_argument("-l", "--label_file", required=True, help="Path to the label file")
+    parser.add_argument("-f", "--file", help="Name of the .onnx file to be processed")
+    parser.add_argument("-l", "--label_file", help="Path to the label file")
     parser.add_argument("-b", "--batch_size", default=1, type=int, help="Batch size (default: 1)")
     parser.add_argument("-n", "--network_size", default=640, type=int, help="Network size (default: 640)")
     parser.add_argument("-p", "--precision", default="fp16", choices=["fp32", "fp16", "qat"], help="Precision (default: fp16)")
     parser.add_argument("-c", "--pgie_config_file", help="Path to PGIE configuration file")
     parser.add_argument("--force", action="store_true", help="Force re-building the TensorRT engine")
+    parser.add_argument("--exact-batch", action="store_true", help="Only reuse an engine built for this batch size, not a larger one")
+    parser.add_argument("--build-only", action="store_true", help="Skip the trtexec benchmark after the build (faster, no performance record)")
+    queue_group = parser.add_argument_group("batch build", "Build many engines unattended through a resumable job queue")
+    queue_group.add_argument("--jobs", help="JSON file listing build jobs (model, precision, network_size, batch_size)")
+    queue_group.add_argument("--queue", action="store_true", help="Resume the build queue without adding jobs")
+    queue_group.add_argument("--gpus", default="0", help="Comma-separated GPU indexes to build on (default: 0)")
+    queue_group.add_argument("--jobs-per-gpu", default=1, type=int, help="Builds running at once on each GPU (default: 1)")
+    queue_group.add_argument("--retry-failed", action="store_true", help="Run failed jobs of the queue again")
+    queue_group.add_argument("--summary", help="Where to write the JSON build summary (default: build_summary.json in the engine directory)")
 
     args = parser.parse_args()
 
+    if args.jobs or args.queue:
+        from python_module.component.engine_build_queue import run_build_queue, BUILD_SUMMARY_FILE
+        sys.exit(run_build_queue(args.jobs, summary_file=args.summary or BUILD_SUMMARY_FILE,
+                                 gpus=[gpu.strip() for gpu in args.gpus.split(',') if gpu.strip()],
+                                 jobs_per_gpu=args.jobs_per_gpu, build_only=args.build_only,
+                                 retry_failed=args.retry_failed))
+    if not args.file or not args.label_file:
+        parser.error("-f/--file and -l/--label_file are required unless --jobs or --queue is given")
+
     # Process the ONNX file and generate the engine
-    process_onnx(args.file, args.label_file, args.batch_size, args.network_size, args.precision, args.pgie_config_file, args.force)
+    process_onnx(args.file, args.label_file, args.batch_size, args.network_size, args.precision, args.pgie_config_file, args.force,
+                 build_only=args.build_only, exact_batch=args.exact_batch)
 
 if __name__ == "__main__":
     main()
@@ -12,40 +12,58 @@ License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
 
 import sys
 import os
-import math
 from datetime import datetime
 import configparser
 import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst,GLib
 
-from python_module.common.FPS import PERF_DATA
-from python_module.component.source_factory import create_source_bin , parse_media_source
+from python_module.common.metrics import Metrics
+from python_module.component.source_factory import create_source_bin , parse_media_source, resolve_media_sources
 from python_module.component.rtsp_server import create_rtsp_server
-from python_module.component.probes import sink_pad_buffer_probe, osd_sink_pad_buffer_probe
-from python_module.component.pre_process import pre_process
+from python_module.component.yt_factory import get_yt_resolver, stop_yt_resolver
+from python_module.component.probes import BatchMetaDispatcher, MetricsHandler, OsdDecorationHandler
+from python_module.component.pre_process import pre_process, load_config as load_session
 from python_module.common.bus_call import bus_call
-from python_module.common.utils import create_dynamic_labels
-from python_module.component.system_config import get_config
-from python_module.common.platform_info import PlatformInfo
+from python_module.common.utils import create_label_styles, tiler_grid
+from python_module.component.system_config import get_config, read_pgie_settings, PGIE_CONFIG_FILES
+from python_module.common.platform_info import get_platform_info
+from python_module.common.startup_timer import startup_timer
+from python_module.common.trail_store import TrailStore
+from python_module.component.trail_renderer import TrailRenderer
+from python_module.component.source_watchdog import SourceWatchdog
+from python_module.component.network_size import tracker_dimensions, muxer_dimensions, is_auto_requested
+# Optional subsystems (exporters, shared memory, latency, benchmark, control API,
+# engine hot-swap, launch profiles) are imported by run_pipeline() only when enabled
 
 
 # Function to create the pipeline
-def create_pipeline(args, model_type):
-    platform_info = PlatformInfo()
+def create_pipeline(args, model_type, sources=None):
+    platform_info = get_platform_info()
     Gst.init(None)
     stream_output=args.output.upper()
     config_values = get_config()
 
     
     output_file_path=None
-    media_sources = parse_media_source('config/python_app/media.ini')
+    if sources:
+        media_sources = resolve_media_sources(sources)
+    else:
+        media_sources = parse_media_source('config/python_app/media.ini')
+    if args.replicate and media_sources:
+        # Benchmark the same source N times
+        media_sources = [media_sources[0]] * args.replicate
+
+    # Keep resolved YouTube URIs fresh so reconnections never use an expired one
+    for media, url, uri in media_sources:
+        if media == 'youtube':
+            get_yt_resolver().schedule_refresh(url)
 
     number_sources = len(media_sources)
     if number_sources == 0:
         print("No active media sources found. Exiting...")
         sys.exit(1)
-    perf_data = PERF_DATA(number_sources)
+    metrics = Metrics(number_sources)
 
 
 
@@ -100,28 +118,44 @@ def create_pipeline(args, model_type):
             return None
         elements[name] = element
 
+    if model_type in PGIE_CONFIG_FILES:
+        pgie_conf_file = PGIE_CONFIG_FILES[model_type]
+    else:
+        sys.stderr.write(f"Model Type not supported {model_type}\n")
+        exit
+
     ## Configure Elements
+    muxer_width, muxer_height = config_values['MUXER_OUTPUT_WIDTH'], config_values['MUXER_OUTPUT_HEIGHT']
+    network_size = int(read_pgie_settings(pgie_conf_file).get("infer-dims", "3;640;640").split(";")[-1])
+    if network_size > max(muxer_width, muxer_height):
+        print(f"Warning: Network size {network_size} is larger than the muxer output {muxer_width}x{muxer_height}: frames are upscaled for inference.")
+    if (is_auto_requested() and stream_output == "SILENT"
+            and config_values['EXPORT_FORMAT'] == 'none' and not config_values['SHM_PUBLISH']):
+        # Nothing is drawn and no detection coordinates leave the pipeline, so frames
+        # are only batched as large as the network and tracker need
+        muxer_width, muxer_height = muxer_dimensions(network_size, muxer_width, muxer_height)
+        print(f"Muxer output sized to {muxer_width}x{muxer_height} for network size {network_size}")
     if os.environ.get('USE_NEW_NVSTREAMMUX') != 'yes':
-        elements["streammux"].set_property('width', config_values['MUXER_OUTPUT_WIDTH'])
-        elements["streammux"].set_property('height', config_values['MUXER_OUTPUT_HEIGHT'])
+        elements["streammux"].set_property('width', muxer_width)
+        elements["streammux"].set_property('height', muxer_height)
         elements["streammux"].set_property('batched-push-timeout', config_values['MUXER_BATCH_TIMEOUT_USEC'])
-    elements["streammux"].set_property('batch-size', number_sources)
 
-    if model_type == 'det':
-        pgie_conf_file="/apps/deepstream-yolo-e2e/config/pgie/config_pgie_yolo_det.txt"
-    elif model_type == 'seg':
-        pgie_conf_file="/apps/deepstream-yolo-e2e/config/pgie/config_pgie_yolo_seg.txt"
-    else:
-        sys.stderr.write(f"Model Type not supported {model_type}\n")
-        exit
+    batch_size = number_sources
+    if config_values['CONTROL_PORT']:
+        # Keep the spare slots of the engine batch for sources added at runtime
+        engine_batch_size = read_pgie_settings(pgie_conf_file).get('batch-size', '0')
+        batch_size = max(number_sources, int(engine_batch_size) if engine_batch_size.isdigit() else 0)
+    elements["streammux"].set_property('batch-size', batch_size)
     
     elements["pgie"].set_property('config-file-path', pgie_conf_file )
 
 
-    elements["tracker"].set_property('tracker-width', 640)
-    elements["tracker"].set_property('tracker-height', 384)
+    # The tracker works at the network size, with the aspect ratio of the frames
+    tracker_width, tracker_height = tracker_dimensions(network_size, muxer_width, muxer_height)
+    elements["tracker"].set_property('tracker-width', tracker_width)
+    elements["tracker"].set_property('tracker-height', tracker_height)
     elements["tracker"].set_property('ll-lib-file', '/opt/nvidia/deepstream/deepstream/lib/libnvds_nvmultiobjecttracker.so')
-    elements["tracker"].set_property('ll-config-file', '/apps/deepstream-yolo-e2e/config/tracker/config_tracker_NvDCF_perf.yml')
+    elements["tracker"].set_property('ll-config-file', config_values['TRACKER_CONFIG_FILE'])
     elements["tracker"].set_property('display-tracking-id', 0)
     if platform_info.is_jetson_device():
         elements["tracker"].set_property('compute-hw', 2)
@@ -133,8 +167,7 @@ def create_pipeline(args, model_type):
     
     if stream_output in ("FILE", "RTSP", "DISPLAY"):
         elements["filter_tiler"].set_property("caps", Gst.Caps.from_string("video/x-raw(memory:NVMM), format=RGBA"))
-        tiler_rows=int(math.sqrt(number_sources))
-        tiler_columns=int(math.ceil((1.0*number_sources)/tiler_rows))
+        tiler_rows, tiler_columns = tiler_grid(number_sources)
         elements["nvtiler"].set_property("rows",tiler_rows)
         elements["nvtiler"].set_property("columns",tiler_columns)
         elements["nvtiler"].set_property("width", config_values['TILED_OUTPUT_WIDTH'])
@@ -245,49 +278,185 @@ def create_pipeline(args, model_type):
         else:
             elements["nvosd"].link(elements["sink"])
     
-    dynamic_labels = create_dynamic_labels(pgie_conf_file)
+    label_styles = create_label_styles(pgie_conf_file, number_sources)
 
-    return pipeline , element_probe, perf_data, output_file_path, dynamic_labels , number_sources
+    return pipeline , elements, element_probe, metrics, output_file_path, label_styles , number_sources, media_sources
 
 
 # Function to run the pipeline
 def run_pipeline(args):
-    model_type = pre_process(args.output)
+    sources = None
+    if args.profile or args.source or args.model:
+        from python_module.component.launch_profile import profile_from_args, normalize_profile, launch_profile
+        # Launch profile: no prompts, and no re-validation when nothing changed
+        media_ini_sources = [(type, url) for type, url, _ in parse_media_source('config/python_app/media.ini', resolve=False)]
+        profile = normalize_profile(profile_from_args(args), media_ini_sources)
+        if args.replicate:
+            profile["model"]["batch_size"] = max(profile["model"]["batch_size"], args.replicate)
+        model_type = launch_profile(profile, background=not args.benchmark)
+        sources = [(source["type"], source["url"]) for source in profile["sources"]]
+    else:
+        model_type = pre_process(args.output, interactive=not args.benchmark, batch_size=args.replicate or None)
+    startup_timer.mark("pre_process")
+
+    # GStreamer reads the tracer settings once, when it initialises, so they are set
+    # before the RTSP server or the pipeline touch it (and after profile overrides)
+    config_values = get_config()
+    if config_values['LATENCY_TRACER']:
+        from python_module.component.latency import enable_latency_tracer
+        enable_latency_tracer()
+    Gst.init(None)
     if args.output == "rtsp":
         create_rtsp_server()
 
-    pipeline, element_probe, perf_data, output_file_path, dynamic_labels, number_sources  = create_pipeline(args, model_type)
+    pipeline, elements, element_probe, metrics, output_file_path, label_styles, number_sources, media_sources  = create_pipeline(args, model_type, sources)
     if not pipeline:
         sys.stderr.write("Failed to create pipeline\n")
         return
+    startup_timer.mark("create_pipeline")
+    startup_timer.note("platform_info_cached", get_platform_info().from_cache)
+
+    # Restart stalled or failed live sources instead of stopping every stream
+    watchdog = None
+    if config_values['SOURCE_WATCHDOG']:
+        watchdog = SourceWatchdog(pipeline, elements["streammux"], metrics, media_sources,
+                                  config_values['SOURCE_STALL_TIMEOUT'], backoff_max=config_values['SOURCE_RESTART_BACKOFF_MAX'])
+        metrics.register_collector(watchdog.metrics_samples)
 
     loop = GLib.MainLoop()
     bus = pipeline.get_bus()
     bus.add_signal_watch()
-    bus.connect("message", bus_call, loop)
+    bus.connect("message", bus_call, loop, watchdog)
 
     elementsinkpad = element_probe.get_static_pad("sink")
     if not elementsinkpad:
         sys.stderr.write("Unable to get sink pad of nvosd\n")
         return
-    elementsinkpad.add_probe(Gst.PadProbeType.BUFFER, sink_pad_buffer_probe, 0, perf_data)
-    
-    osd = element_probe.get_static_pad("sink")
-    if not osd:
-        sys.stderr.write("Unable to get sink pad of nvosd\n")
-        return
-    osd.add_probe(Gst.PadProbeType.BUFFER, osd_sink_pad_buffer_probe, 0, dynamic_labels, number_sources)
 
-    GLib.timeout_add(5000, perf_data.perf_print_callback)
+    # A single probe walks the batch metadata once for every registered handler
+    dispatcher = BatchMetaDispatcher()
+    dispatcher.register(MetricsHandler(metrics))
+    osd_handler = None
+    trail_renderer = None
+    if args.output != "silent":
+        trail_store = TrailStore(expiration=config_values['TRACK_EXPIRATION'], expiration_unit=config_values['TRACK_EXPIRATION_UNIT'])
+        trail_renderer = TrailRenderer(number_sources,
+                                       config_values['MUXER_OUTPUT_WIDTH'], config_values['MUXER_OUTPUT_HEIGHT'],
+                                       config_values['TILED_OUTPUT_WIDTH'], config_values['TILED_OUTPUT_HEIGHT'],
+                                       trail_store.capacity, config_values['OSD_MAX_DISPLAY_META'])
+        osd_handler = OsdDecorationHandler(label_styles, number_sources, trail_store, trail_renderer)
+        dispatcher.register(osd_handler)
+        GLib.timeout_add(5000, trail_renderer.stats_print_callback)
+
+    # Columnar detections for analytics and exporters, extracted only when consumed
+    detection_extractor = None
+    if config_values['EXPORT_FORMAT'] != 'none' or config_values['SHM_PUBLISH']:
+        from python_module.component.batch_extractor import DetectionExtractor
+        detection_extractor = DetectionExtractor()
+    detection_exporter = None
+    if config_values['EXPORT_FORMAT'] != 'none':
+        from python_module.component.detection_export import DetectionExporter
+        detection_exporter = DetectionExporter(config_values['EXPORT_DIRECTORY'],
+                                               config_values['EXPORT_FORMAT'],
+                                               config_values['EXPORT_MAX_QUEUE_RECORDS'],
+                                               config_values['EXPORT_DROP_POLICY'],
+                                               config_values['EXPORT_ROTATE_MB'] * 1024 * 1024)
+        detection_extractor.add_consumer(detection_exporter)
+        metrics.register_collector(detection_exporter.metrics_samples)
+        GLib.timeout_add(5000, detection_exporter.stats_print_callback)
+    shm_writer = None
+    if config_values['SHM_PUBLISH']:
+        from python_module.component.shm_ring import ShmDetectionWriter
+        shm_writer = ShmDetectionWriter(config_values['SHM_NAME'], config_values['SHM_CAPACITY_RECORDS'])
+        detection_extractor.add_consumer(shm_writer)
+        print(f"Publishing detections to shared memory '{config_values['SHM_NAME']}'")
+    if detection_extractor:
+        dispatcher.register(detection_extractor)
+    elementsinkpad.add_probe(Gst.PadProbeType.BUFFER, dispatcher.probe, 0)
+
+    latency_tracker = None
+    if config_values['LATENCY_INSTRUMENTATION'] or args.benchmark:
+        from python_module.component.latency import StageLatencyTracker, pipeline_stages
+        latency_tracker = StageLatencyTracker(pipeline_stages(elements))
+        latency_tracker.attach()
+        metrics.register_collector(latency_tracker.metrics_samples)
+        GLib.timeout_add(5000, latency_tracker.stats_print_callback)
+
+    GLib.timeout_add(5000, metrics.perf_print_callback)
+    if config_values['METRICS_PORT']:
+        metrics.start_server(config_values['METRICS_PORT'])
+
+    # Engines built in the background and swapped into nvinfer without stopping the sources
+    engine_swap = None
+    if config_values['ENGINE_BACKGROUND_BUILD'] or config_values['CONTROL_PORT']:
+        from python_module.component.engine_swap import EngineHotSwap
+        engine_swap = EngineHotSwap(elements["pgie"], PGIE_CONFIG_FILES[model_type])
+        metrics.register_collector(engine_swap.metrics_samples)
+
+    # Sources added or removed at runtime; saved to media.ini when they came from it
+    source_controller = None
+    if config_values['CONTROL_PORT']:
+        from python_module.component.source_control import SourceController
+        source_controller = SourceController(pipeline, elements["streammux"], metrics, media_sources,
+                                             nvtiler=elements.get("nvtiler"), watchdog=watchdog,
+                                             osd_handler=osd_handler, trail_renderer=trail_renderer,
+                                             engine_swap=engine_swap, persist=sources is None and not args.replicate)
+        source_controller.start_server(config_values['CONTROL_PORT'], token=config_values['CONTROL_TOKEN'])
+
+    benchmark = None
+    if args.benchmark:
+        from python_module.component.benchmark import BenchmarkRun
+        benchmark = BenchmarkRun(metrics, loop, args.duration, args.frames, args.warmup, latency_tracker)
+        benchmark.start()
+
+    def first_frame_callback():
+        if not any(stream.frames_total for stream in metrics.streams):
+            return True
+        startup_timer.mark("first_frame")
+        startup_timer.print_report()
+        return False
+    metrics.register_collector(startup_timer.metrics_samples)
 
     print("Starting pipeline \n")
     pipeline.set_state(Gst.State.PLAYING)
+    if watchdog:
+        watchdog.start()
+    startup_timer.mark("set_state_playing")
+    if engine_swap:
+        # Engines process_onnx() left to build while the pipeline runs
+        from python_module.component.onnx_to_trt import deferred_builds
+        if deferred_builds:
+            engine_swap.build(**deferred_builds[-1])
+    GLib.timeout_add(20, first_frame_callback)
 
     try:
         loop.run()
     except:
         pass
 
+    if source_controller:
+        source_controller.stop_server()
     pipeline.set_state(Gst.State.NULL)
+    if benchmark:
+        benchmark.finish()
+        settings = {
+            "output": args.output,
+            "number_sources": number_sources,
+            "replicate": args.replicate,
+            "session": load_session(),
+            "pgie": read_pgie_settings(PGIE_CONFIG_FILES[model_type]),
+            "config": config_values,
+            "use_new_nvstreammux": os.environ.get('USE_NEW_NVSTREAMMUX') == 'yes',
+            "startup": startup_timer.report(),
+        }
+        report = benchmark.write_report(args.report, settings)
+        print(f"Benchmark {report['status']}: {report['fps']['aggregate']} FPS, report written to {args.report}")
+    metrics.stop_server()
+    stop_yt_resolver()
+    if shm_writer:
+        shm_writer.close()
+    if detection_exporter:
+        detection_exporter.stop()
+        print(f"Detections exported to {config_values['EXPORT_DIRECTORY']}: {detection_exporter.stats()}")
     if args.output == "file":
         print(f"File output :  {output_file_path}") 
\ No newline at end of file
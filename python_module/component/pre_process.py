@@ -17,7 +17,9 @@ import json
 from python_module.component.manage_sources import manage_source, list_active_media, get_active_sources
 from python_module.component.manage_models import choose_model
 from python_module.component.onnx_to_trt import process_onnx
-from python_module.component.system_config import show_current_resolution, menu_system_resolution
+from python_module.component.engine_registry import EngineRegistry, format_performance
+from python_module.component.network_size import requested_network_size, choose_network_size
+from python_module.component.system_config import show_current_resolution, menu_system_resolution, get_config
 from prettytable import PrettyTable
 from python_module.common.utils import display_message
 
@@ -47,10 +49,23 @@ def prompt_user(question, default='n'):
         return default
     return response
 
-def pre_process(output):
+def pre_process(output, interactive=True, batch_size=None):
+    """Choose sources, model and resolution, then build or reuse the TensorRT engine.
+
+    With interactive=False nothing is prompted: the sources of media.ini and the
+    model of the previous session are used as they are. `batch_size` overrides
+    the number of active sources as engine batch size.
+    """
     # Load previous configuration if it exists
     previous_config = load_config()
-    if previous_config:
+    if not interactive:
+        if not previous_config or get_active_sources() < 1:
+            display_message("e", "No previous configuration or active media source found. Run deepstream.py interactively once to configure them.")
+            sys.exit(1)
+        model_file = previous_config.get("model_file")
+        label_file = previous_config.get("label_file")
+        model_type = previous_config.get("model_type")
+    elif previous_config:
         display_message("d","Previous configuration found.")
         is_media_active = list_active_media()
         
@@ -74,7 +89,7 @@ def pre_process(output):
         # Ask if the user wants to modify the model, default is 'n' (continue without modification)
         # Create a PrettyTable to display the model configuration
         table = PrettyTable()
-        table.field_names = ["Model Type", "Model Name"]
+        table.field_names = ["Model Type", "Model Name", "Measured Throughput"]
         table.align["Model Type"] = "l"
         table.align["Model Name"] = "l"
 
@@ -90,7 +105,8 @@ def pre_process(output):
         # Extract model name
         base_name = os.path.basename(model_file)
         model_name, _ = os.path.splitext(base_name)
-        table.add_row([model_type_table, model_name])
+        performance = EngineRegistry().measured_performance().get(model_name)
+        table.add_row([model_type_table, model_name, format_performance(performance)])
 
         # Print the table
         display_message("d","\nPrevious Model Configuration:")
@@ -99,7 +115,7 @@ def pre_process(output):
         # Ask if the user wants to modify the model, default is 'n' (continue without modification)
         modify_model = prompt_user("Do you want to modify the model?", default='n')
         if modify_model == 'm':
-            model_file, label_file, model_type = choose_model()
+            model_file, label_file, model_type = choose_model(get_active_sources())
 
     else:
         display_message("w","No previous configuration found. Please configure now.")
@@ -109,7 +125,7 @@ def pre_process(output):
             if get_active_sources() < 1:
                 display_message("w", f"No active media sources were found. \nPlease add or activate a media source before proceeding.\n")
 
-        model_file, label_file, model_type = choose_model()
+        model_file, label_file, model_type = choose_model(get_active_sources())
 
     # Determine model type and configuration file based on user choice
     if model_type in ("Detection", "det"):
@@ -121,29 +137,40 @@ def pre_process(output):
 
     # Determine precision based on the model file name
     precision = 'qat' if 'qat' in model_file else 'fp16'
+
+    try:
+        network_size = requested_network_size(get_config()['NETWORK_SIZE'])
+    except ValueError as e:
+        display_message("e", f"NETWORK_SIZE: {e}")
+        sys.exit(1)
+    if network_size == 'auto':
+        network_size = choose_network_size(model_file, precision, batch_size or get_active_sources())
     
     # Save current configurations
-    current_config = {
-        "num_sources": get_active_sources(),
-        "model_file": model_file,
-        "label_file": label_file,
-        "model_type": model_type,
-        "precision": precision,
-    }
-    save_config(current_config)
-    display_message("s","Configuration saved.")
+    if interactive:
+        current_config = {
+            "num_sources": get_active_sources(),
+            "model_file": model_file,
+            "label_file": label_file,
+            "model_type": model_type,
+            "precision": precision,
+        }
+        save_config(current_config)
+        display_message("s","Configuration saved.")
 
     # Process the ONNX model
     process_onnx(
         file=model_file,
         label_file=label_file,
-        batch_size=get_active_sources(),
-        network_size=640,
+        batch_size=batch_size or get_active_sources(),
+        network_size=network_size,
         precision=precision,
         pgie_config_file=pgie_config_file,
-        force=False
+        force=False,
+        # Benchmarks must measure the requested engine, never a stand-in
+        background=interactive and bool(get_config()['ENGINE_BACKGROUND_BUILD'])
     )
-    if output != "silent":
+    if output != "silent" and interactive:
         show_current_resolution()
         modify_resolution = prompt_user("Do you want to modify current output resolution?", default='n')
         if modify_resolution == 'm':
@@ -15,184 +15,194 @@ import gi
 
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst
-from collections import defaultdict
+from python_module.common.utils import create_label_style, label_font_sizes, FONT_BAND_HEIGHT
 
-object_trackers = defaultdict(lambda: defaultdict(list))
-last_seen = defaultdict(lambda: defaultdict(int))   
 
-FRAME_EXPIRATION_LIMIT = 60
+def stream_clock(frame_meta, trail_store):
+    """Return the per-stream time used for trail expiry: frame number or PTS in seconds."""
+    if trail_store.expiration_unit == "seconds":
+        return frame_meta.buf_pts / Gst.SECOND
+    return frame_meta.frame_num
 
-def purge_old_objects(current_frame_num):
-    for pad_index, objects in list(object_trackers.items()):
-        for object_id in list(objects.keys()):
-            if current_frame_num - last_seen[pad_index][object_id] > FRAME_EXPIRATION_LIMIT:
-                del object_trackers[pad_index][object_id]
-                del last_seen[pad_index][object_id]
-            else:
-                if len(object_trackers[pad_index][object_id]) > 25:
-                    object_trackers[pad_index][object_id] = object_trackers[pad_index][object_id][-25:]
 
+class ProbeHandler:
+    """Base class for consumers of the batch metadata walked by BatchMetaDispatcher.
 
-# Function for probe to extract metadata
-def sink_pad_buffer_probe(pad, info, u_data, perf_data):
-    frame_number = 0
-    num_rects = 0
+    Subclasses override only the hooks they need; the dispatcher skips hooks
+    that are not overridden, and skips the object walk entirely when no
+    registered handler overrides on_object().
+    """
 
-    gst_buffer = info.get_buffer()
-    if not gst_buffer:
-        print("Unable to get GstBuffer")
-        return Gst.PadProbeReturn.OK
+    def on_batch_start(self, batch_meta):
+        pass
 
-    batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(gst_buffer))
-    l_frame = batch_meta.frame_meta_list
-    while l_frame is not None:
-        try:
-            frame_meta = pyds.NvDsFrameMeta.cast(l_frame.data)
-        except StopIteration:
-            break
+    def on_frame(self, batch_meta, frame_meta):
+        pass
 
-        l_obj = frame_meta.obj_meta_list
-        while l_obj is not None:
-            try:
-                obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
-            except StopIteration:
-                break
+    def on_object(self, batch_meta, frame_meta, obj_meta):
+        pass
 
-            # Here you can process metadata as needed
+    def on_frame_end(self, batch_meta, frame_meta):
+        pass
 
+    def on_batch_end(self, batch_meta):
+        pass
+
+
+class BatchMetaDispatcher:
+    """Single buffer probe that walks NvDsBatchMeta once and fans it out to handlers."""
+
+    HOOKS = ("on_batch_start", "on_frame", "on_object", "on_frame_end", "on_batch_end")
+
+    def __init__(self):
+        self.handlers = []
+        self.hooks = {hook: [] for hook in self.HOOKS}
+
+    def register(self, handler):
+        self.handlers.append(handler)
+        for hook in self.HOOKS:
+            if getattr(type(handler), hook) is not getattr(ProbeHandler, hook):
+                self.hooks[hook].append(getattr(handler, hook))
+        return handler
+
+    def probe(self, pad, info, u_data):
+        gst_buffer = info.get_buffer()
+        if not gst_buffer:
+            print("Unable to get GstBuffer")
+            return Gst.PadProbeReturn.OK
+
+        batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(gst_buffer))
+        on_frame = self.hooks["on_frame"]
+        on_object = self.hooks["on_object"]
+        on_frame_end = self.hooks["on_frame_end"]
+
+        for callback in self.hooks["on_batch_start"]:
+            callback(batch_meta)
+
+        l_frame = batch_meta.frame_meta_list
+        while l_frame is not None:
             try:
-                l_obj = l_obj.next
-            except StopIteration:
-                break
-        # update frame rate through this probe
-        stream_index = "stream{0}".format(frame_meta.pad_index)
-        perf_data.update_fps(stream_index)
-
-        try:
-            l_frame = l_frame.next
-        except StopIteration:
-            break
-
-    return Gst.PadProbeReturn.OK
-
-def osd_sink_pad_buffer_probe(pad, info, u_data, dynamic_labels, number_sources):
-    frame_number = 0
-    num_rects = 0
-    gst_buffer = info.get_buffer()
-    if not gst_buffer:
-        print("Unable to get GstBuffer ")
-        return
-
-    batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(gst_buffer))
-    l_frame = batch_meta.frame_meta_list
-    meta_list = []  # Lista temporária para armazenar objetos
-
-    while l_frame is not None:
-        try:
-            frame_meta = pyds.NvDsFrameMeta.cast(l_frame.data)
-        except StopIteration:
-            break
- 
-        pad_index = frame_meta.pad_index
-        frame_number = frame_meta.frame_num
-        num_rects = frame_meta.num_obj_meta
-        l_obj = frame_meta.obj_meta_list
-        display_meta = pyds.nvds_acquire_display_meta_from_pool(batch_meta)
-        while l_obj is not None:
-            try:
-                obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
+                frame_meta = pyds.NvDsFrameMeta.cast(l_frame.data)
             except StopIteration:
                 break
 
-            object_id = obj_meta.object_id
-            class_id = obj_meta.class_id
-            text = f"{pyds.get_string(obj_meta.text_params.display_text).capitalize()}"
-            color = dynamic_labels.get(class_id)
-            obj_rect = obj_meta.rect_params
-            obj_rect.border_color.set( color.red, color.green, color.blue,  1.0)
-            obj_rect.border_width=1
-            obj_rect.has_bg_color=1
-            obj_rect.bg_color.set( color.red, color.green, color.blue,  0.0)
-            
-            obj_coords = obj_meta.tracker_bbox_info.org_bbox_coords
-            obj_coords_x = int(obj_coords.left)
-            obj_coords_y = int(obj_coords.top)
-            obj_coords_w = int(obj_coords.width)
-            obj_coords_h = int(obj_coords.height)
-
-           
-            center_x = obj_coords_x + obj_coords_w // 2
-            center_y = obj_coords_y + obj_coords_h // 2
-
-            botton_center_x = int(obj_coords_x + obj_coords_w / 2)
-            botton_center_y = int(obj_coords_y + obj_coords_h)
-            
-            object_trackers[pad_index][object_id].append((botton_center_x, botton_center_y))
-            last_seen[pad_index][object_id] = frame_number
-            
-            if len(object_trackers[pad_index][object_id]) > 20:
-                object_trackers[pad_index][object_id].pop(0)
-
-            text_x_offset = 10    
-            text_y_offset = 30    
- 
-
-            text_x = center_x + text_x_offset
-            text_y = center_y - text_y_offset
-
-
-            if text_x < 1:
-                text_x=1
-            if text_y < 1:
-                text_y=1
-
-
-            min_fsize = 6
-            max_fsize = 10
-            if number_sources == 1:
-
-                max_fsize = max(min_fsize, max_fsize)   
-            elif number_sources > 1:
-                max_fsize = max(min_fsize, max_fsize - (number_sources - 1)) 
-
-
-            font_size = min_fsize + (max_fsize - min_fsize) * (obj_coords_h / 100)
-            font_size = max(min_fsize, min(max_fsize, int(font_size)))
-
-            obj_meta.text_params.font_params.font_size = font_size
-            obj_meta.text_params.x_offset = text_x
-            obj_meta.text_params.y_offset  = text_y
-            obj_meta.text_params.display_text = text
-            obj_meta.text_params.set_bg_clr = 1
-            obj_meta.text_params.font_params.font_name = "Serif"
-            obj_meta.text_params.font_params.font_size = font_size
-            obj_meta.text_params.font_params.font_color.set(1.0, 1.0, 1.0, 1.0)
-            obj_meta.text_params.text_bg_clr.set(color.red, color.green, color.blue, 0.5)
-
-
-            trail = object_trackers[pad_index][object_id]
-            for i in range(len(trail) - 1):
-                x1, y1 = trail[i]
-                if x1 > 0 and y1 > 0:
-                    if i % 16 == 0:
-                        pyds.nvds_add_display_meta_to_frame(frame_meta, display_meta)
-                        display_meta = pyds.nvds_acquire_display_meta_from_pool(batch_meta)
-                    display_meta.num_circles = 1 + (i % 16)
-                    py_nvosd_circle_params = display_meta.circle_params[i % 16]
-                    py_nvosd_circle_params.circle_color.set(color.red, color.green, color.blue, 0.9)
-                    py_nvosd_circle_params.radius = 3
-                    py_nvosd_circle_params.xc = x1
-                    py_nvosd_circle_params.yc = y1
-                
+            for callback in on_frame:
+                callback(batch_meta, frame_meta)
+
+            if on_object:
+                l_obj = frame_meta.obj_meta_list
+                while l_obj is not None:
+                    try:
+                        obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
+                    except StopIteration:
+                        break
+
+                    for callback in on_object:
+                        callback(batch_meta, frame_meta, obj_meta)
+
+                    try:
+                        l_obj = l_obj.next
+                    except StopIteration:
+                        break
+
+            for callback in on_frame_end:
+                callback(batch_meta, frame_meta)
+
             try:
-                l_obj = l_obj.next
+                l_frame = l_frame.next
             except StopIteration:
                 break
-        pyds.nvds_add_display_meta_to_frame(frame_meta, display_meta)
-        purge_old_objects(frame_number)
-        try:
-            l_frame = l_frame.next
-        except StopIteration:
-            break
-
-    return Gst.PadProbeReturn.OK
+
+        for callback in self.hooks["on_batch_end"]:
+            callback(batch_meta)
+
+        return Gst.PadProbeReturn.OK
+
+
+class MetricsHandler(ProbeHandler):
+    """Count frames and objects of each stream."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def on_frame(self, batch_meta, frame_meta):
+        self.metrics.record_frame(frame_meta.pad_index, frame_meta.num_obj_meta)
+
+
+class OsdDecorationHandler(ProbeHandler):
+    """Style bounding boxes and labels, and draw object trails for nvdsosd."""
+
+    def __init__(self, label_styles, number_sources, trail_store, trail_renderer):
+        self.label_styles = label_styles
+        self.number_sources = number_sources
+        self.trail_store = trail_store
+        self.trail_renderer = trail_renderer
+        self.stream_time = 0
+        self.removed_streams = []
+
+    def remove_stream(self, stream_id):
+        """Drop the trails of a removed source; done by the streaming thread at the next batch."""
+        self.removed_streams.append(stream_id)
+
+    def on_batch_start(self, batch_meta):
+        while self.removed_streams:
+            self.trail_store.release_stream(self.removed_streams.pop())
+        self.trail_renderer.begin_batch(batch_meta)
+
+    def on_frame(self, batch_meta, frame_meta):
+        self.stream_time = stream_clock(frame_meta, self.trail_store)
+        self.trail_renderer.begin_frame(frame_meta)
+
+    def label_style(self, class_id, obj_meta):
+        """Return the style of a class missing from the label file, caching it for later frames."""
+        text = pyds.get_string(obj_meta.text_params.display_text)
+        style = create_label_style(class_id, text, label_font_sizes(self.number_sources))
+        self.label_styles[class_id] = style
+        return style
+
+    def on_object(self, batch_meta, frame_meta, obj_meta):
+        style = self.label_styles.get(obj_meta.class_id)
+        if style is None:
+            style = self.label_style(obj_meta.class_id, obj_meta)
+
+        obj_rect = obj_meta.rect_params
+        obj_rect.border_color.set(*style.border_color)
+        obj_rect.border_width = 1
+        obj_rect.has_bg_color = 1
+        obj_rect.bg_color.set(*style.bg_color)
+
+        obj_coords = obj_meta.tracker_bbox_info.org_bbox_coords
+        obj_coords_x = int(obj_coords.left)
+        obj_coords_y = int(obj_coords.top)
+        obj_coords_w = int(obj_coords.width)
+        obj_coords_h = int(obj_coords.height)
+
+        botton_center_x = obj_coords_x + obj_coords_w // 2
+        botton_center_y = obj_coords_y + obj_coords_h
+
+        trail_slot = self.trail_store.append(frame_meta.pad_index, obj_meta.object_id, botton_center_x, botton_center_y, self.stream_time)
+
+        # Label is drawn 10 px right of and 30 px above the box center
+        text_x = max(1, botton_center_x + 10)
+        text_y = max(1, obj_coords_y + obj_coords_h // 2 - 30)
+
+        text_params = obj_meta.text_params
+        text_params.x_offset = text_x
+        text_params.y_offset = text_y
+        text_params.display_text = style.text
+        text_params.set_bg_clr = 1
+        text_params.text_bg_clr.set(*style.text_bg_color)
+        font_params = text_params.font_params
+        font_params.font_name = "Serif"
+        font_params.font_size = style.font_sizes[min(max(obj_coords_h, 0), FONT_BAND_HEIGHT)]
+        font_params.font_color.set(1.0, 1.0, 1.0, 1.0)
+
+        trail, trail_start, trail_end = self.trail_store.trail_view(trail_slot)
+        self.trail_renderer.draw(trail, style.color, trail_start, trail_end)
+
+    def on_frame_end(self, batch_meta, frame_meta):
+        self.trail_renderer.end_frame()
+        self.trail_store.expire(frame_meta.pad_index, self.stream_time)
+
+    def on_batch_end(self, batch_meta):
+        self.trail_renderer.end_batch()
@@ -15,10 +15,10 @@ import gi
 gi.require_version("GstRtspServer", "1.0")
 from gi.repository import GstRtspServer, GstRtsp
 from python_module.component.system_config import get_config
-from python_module.common.platform_info import PlatformInfo
+from python_module.common.platform_info import get_platform_info
 
 def create_rtsp_server():
-    platform_info = PlatformInfo()
+    platform_info = get_platform_info()
     config_values = get_config()
     rtsp_port_num = config_values['RTSP_PORT']
     rtsp_stream_end = config_values['RTSP_FACTORY']
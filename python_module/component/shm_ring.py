@@ -0,0 +1,191 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import os
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+from python_module.component.batch_extractor import DETECTION_DTYPE
+
+SHM_MAGIC = 0x44535944  # "DYSD"
+SHM_VERSION = 1
+SHM_HEADER_SIZE = 64
+
+STATE_OPEN = 1
+STATE_CLOSED = 2
+
+# reserve_seq is bumped before records are written and write_seq after, so a
+# reader can tell which records may have been overwritten while it copied them.
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"),
+    ("version", "<u4"),
+    ("record_size", "<u4"),
+    ("state", "<u4"),
+    ("capacity", "<u8"),
+    ("reserve_seq", "<u8"),
+    ("write_seq", "<u8"),
+    ("writer_pid", "<u8"),
+])
+
+
+def _attach(name):
+    """Attach to an existing segment without letting resource_tracker unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attached segment with resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _map(shm, capacity):
+    header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf, offset=0)
+    records = np.ndarray((capacity,), dtype=DETECTION_DTYPE, buffer=shm.buf, offset=SHM_HEADER_SIZE)
+    return header, records
+
+
+class ShmDetectionWriter:
+    """Single-producer ring buffer of DETECTION_DTYPE records in shared memory.
+
+    Used as a DetectionExtractor consumer, so publishing a batch is two slice
+    copies and two header stores in the streaming thread. Readers never block
+    the writer: a reader that falls more than `capacity` records behind loses
+    the oldest records and is told how many.
+    """
+
+    def __init__(self, name, capacity=65536):
+        self.name = name
+        self.capacity = capacity
+        size = SHM_HEADER_SIZE + capacity * DETECTION_DTYPE.itemsize
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a writer that did not shut down cleanly
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.header, self.records = _map(self.shm, capacity)
+        self.header[0] = (SHM_MAGIC, SHM_VERSION, DETECTION_DTYPE.itemsize, STATE_OPEN, capacity, 0, 0, os.getpid())
+        self.seq = 0
+
+    def __call__(self, batch):
+        """DetectionExtractor consumer: publish the records of a batch."""
+        num_records = len(batch)
+        if num_records == 0:
+            return
+        if num_records > self.capacity:
+            self.seq += num_records - self.capacity
+            batch = batch[-self.capacity:]
+            num_records = self.capacity
+
+        header = self.header[0]
+        header["reserve_seq"] = self.seq + num_records
+        start = self.seq % self.capacity
+        first = min(num_records, self.capacity - start)
+        self.records[start:start + first] = batch[:first]
+        if first < num_records:
+            self.records[:num_records - first] = batch[first:]
+        self.seq += num_records
+        header["write_seq"] = self.seq
+
+    def close(self):
+        self.header[0]["state"] = STATE_CLOSED
+        del self.header, self.records
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ShmDetectionReader:
+    """Consumer side of ShmDetectionWriter.
+
+    Readers attach and detach at any time without affecting the writer. Each
+    reader tracks its own sequence number; poll() returns the records published
+    since the previous call and the number of records lost to overruns.
+
+        reader = ShmDetectionReader("deepstream_detections")
+        while True:
+            records, lost = reader.poll()
+            ...
+
+    With copy=False poll() returns a zero-copy view into shared memory, limited
+    to the contiguous part of the ring. Call overwritten() once done with the
+    view to learn how many of its records were overwritten in the meantime.
+    """
+
+    def __init__(self, name, from_start=False):
+        self.name = name
+        self.shm = _attach(name)
+        header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self.shm.buf, offset=0)[0]
+        if header["magic"] != SHM_MAGIC or header["version"] != SHM_VERSION:
+            self.shm.close()
+            raise ValueError(f"Shared memory '{name}' is not a detection ring buffer.")
+        if header["record_size"] != DETECTION_DTYPE.itemsize:
+            self.shm.close()
+            raise ValueError(f"Shared memory '{name}' record size {header['record_size']} "
+                             f"does not match {DETECTION_DTYPE.itemsize}.")
+        self.capacity = int(header["capacity"])
+        self.header, self.records = _map(self.shm, self.capacity)
+        write_seq = int(self.header[0]["write_seq"])
+        self.read_seq = max(0, write_seq - self.capacity) if from_start else write_seq
+        self.last_poll_seq = self.read_seq
+        self.lost = 0
+
+    @property
+    def closed(self):
+        """True once the writer has shut down; attach a new reader to follow a restarted writer."""
+        return int(self.header[0]["state"]) == STATE_CLOSED
+
+    def poll(self, max_records=None, copy=True):
+        header = self.header[0]
+        write_seq = int(header["write_seq"])
+        lost = 0
+        if write_seq - self.read_seq > self.capacity:
+            lost = write_seq - self.capacity - self.read_seq
+            self.read_seq = write_seq - self.capacity
+
+        count = write_seq - self.read_seq
+        if max_records is not None:
+            count = min(count, max_records)
+        start = self.read_seq % self.capacity
+        first = min(count, self.capacity - start)
+        self.last_poll_seq = self.read_seq
+
+        if not copy:
+            self.read_seq += first
+            self.lost += lost
+            return self.records[start:start + first], lost
+
+        if first < count:
+            records = np.concatenate((self.records[start:start + first], self.records[:count - first]))
+        else:
+            records = self.records[start:start + first].copy()
+
+        # Drop records the writer started overwriting while we were copying
+        torn = int(header["reserve_seq"]) - self.capacity - self.read_seq
+        if torn > 0:
+            torn = min(torn, count)
+            records = records[torn:]
+            lost += torn
+        self.read_seq += count
+        self.lost += lost
+        return records, lost
+
+    def overwritten(self):
+        """Number of records of the last copy=False poll that have since been overwritten."""
+        torn = int(self.header[0]["reserve_seq"]) - self.capacity - self.last_poll_seq
+        return max(0, min(torn, self.read_seq - self.last_poll_seq))
+
+    def close(self):
+        del self.header, self.records
+        self.shm.close()
@@ -0,0 +1,281 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import GLib
+
+from python_module.common.utils import tiler_grid
+from python_module.component.source_factory import attach_source_bin, detach_source_bin, resolve_media_uri
+from python_module.component.manage_sources import add_media_entry, set_media_enabled, validate_url
+from python_module.component.launch_profile import guess_media_type, MEDIA_TYPES
+from python_module.component.yt_factory import get_yt_resolver
+
+# Longest wait for the main loop to run a source change
+MAIN_LOOP_TIMEOUT = 10
+
+
+def run_on_main_loop(function, *args):
+    """Run `function(*args)` on the GLib main loop and return its result.
+
+    Pads and bins of the running pipeline are only changed from the main loop,
+    like the watchdog does, so requests from the control server never race
+    with bus messages or restarts.
+    """
+    done = threading.Event()
+    result = {}
+
+    def callback():
+        try:
+            result["value"] = function(*args)
+        except Exception as e:
+            result["error"] = e
+        done.set()
+        return False
+
+    GLib.idle_add(callback)
+    if not done.wait(MAIN_LOOP_TIMEOUT):
+        raise TimeoutError("the main loop did not respond")
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+class SourceController:
+    """Add and remove sources of a running pipeline.
+
+    A new source takes the lowest free stream index below the nvstreammux
+    batch size and gets its own source bin and request pad; removing a source
+    releases both. The tiler grid, trail level of detail, watchdog and
+    per-stream metrics follow every change. When `persist` is set, added
+    sources are saved to media.ini and removed ones disabled there.
+    """
+
+    def __init__(self, pipeline, streammux, metrics, media_sources, nvtiler=None, watchdog=None,
+                 osd_handler=None, trail_renderer=None, engine_swap=None, persist=False):
+        self.pipeline = pipeline
+        self.streammux = streammux
+        self.metrics = metrics
+        self.nvtiler = nvtiler
+        self.watchdog = watchdog
+        self.osd_handler = osd_handler
+        self.trail_renderer = trail_renderer
+        self.engine_swap = engine_swap
+        self.persist = persist
+        self.capacity = streammux.get_property('batch-size')
+        self.sources = {index: {"type": media, "url": url}
+                        for index, (media, url, uri) in enumerate(media_sources)}
+        self.server = None
+
+    def list_sources(self):
+        sources = [dict(source, index=index) for index, source in sorted(self.sources.items())]
+        return {"capacity": self.capacity, "sources": sources}
+
+    def add_source(self, url, media_type=None, name=None):
+        """Add a source; returns (index, None) or (None, error message)."""
+        media_type = media_type or guess_media_type(url)
+        if media_type not in MEDIA_TYPES:
+            return None, f"Unknown media type '{media_type}'."
+        is_valid, message = validate_url(media_type, url)
+        if not is_valid:
+            return None, message
+        # YouTube extraction can take seconds, so it runs here and not on the main loop
+        uri = resolve_media_uri(media_type, url)
+        if not uri:
+            return None, f"Unable to resolve {url}."
+
+        index, message = run_on_main_loop(self._attach, media_type, url, uri)
+        if index is None:
+            return None, message
+        if media_type == 'youtube':
+            get_yt_resolver().schedule_refresh(url)
+        if self.persist:
+            add_media_entry(name or url, media_type, url)
+        print(f"Source: {url}. Added as stream {index}")
+        return index, None
+
+    def _attach(self, media_type, url, uri):
+        free = [index for index in range(self.capacity) if index not in self.sources]
+        if not free:
+            return None, f"All {self.capacity} slots of the batch are in use."
+        index = free[0]
+        self.metrics.reset_stream(index)
+        if not attach_source_bin(self.pipeline, self.streammux, index, uri):
+            return None, f"Unable to create a source bin for {url}."
+        self.sources[index] = {"type": media_type, "url": url}
+        if self.watchdog:
+            self.watchdog.add_source(index, media_type, url)
+        self._update_layout()
+        return index, None
+
+    def remove_source(self, index):
+        """Remove the source of stream `index`; returns False when there is none."""
+        source = run_on_main_loop(self._detach, index)
+        if source is None:
+            return False
+        if source["type"] == 'youtube' and not any(s["url"] == source["url"] for s in self.sources.values()):
+            get_yt_resolver().cancel_refresh(source["url"])
+        if self.persist:
+            set_media_enabled(source["url"], False)
+        print(f"Source: {source['url']}. Stream {index} removed")
+        return True
+
+    def _detach(self, index):
+        source = self.sources.pop(index, None)
+        if source is None:
+            return None
+        if self.watchdog:
+            self.watchdog.remove_source(index)
+        detach_source_bin(self.pipeline, self.streammux, index, release_pad=True)
+        self.metrics.remove_stream(index)
+        if self.osd_handler:
+            self.osd_handler.remove_stream(index)
+        self._update_layout()
+        return source
+
+    def _update_layout(self):
+        # Tiles are placed by stream index, so the grid covers the highest index in use
+        if not self.sources:
+            return
+        number_tiles = max(self.sources) + 1
+        if self.nvtiler:
+            rows, columns = tiler_grid(number_tiles)
+            self.nvtiler.set_property("rows", rows)
+            self.nvtiler.set_property("columns", columns)
+        if self.trail_renderer:
+            self.trail_renderer.set_layout(number_tiles)
+
+    def build_engine(self, request):
+        """Start a background engine build; returns (True, message) or (False, reason)."""
+        if not self.engine_swap:
+            return False, "engine hot-swap is not available"
+        return run_on_main_loop(self.engine_swap.build, request.get("onnx"), request.get("labels"),
+                                request.get("batch_size"), request.get("precision"))
+
+    def start_server(self, port, host="127.0.0.1", token=""):
+        """Serve GET/POST /sources, DELETE /sources/<index> and GET/POST /engine from a daemon thread.
+
+        POST and DELETE must be sent as application/json, which a web page
+        cannot do across origins without a preflight. When `token` is set,
+        every request must also carry it in the X-Control-Token header.
+        """
+        controller = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def allowed(self, json_body=True):
+                """Reply with an error and return False unless the request may be served."""
+                if token and not hmac.compare_digest(self.headers.get("X-Control-Token", ""), token):
+                    self.reply(401, {"error": "Missing or wrong X-Control-Token header."})
+                    return False
+                content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if json_body and content_type != "application/json":
+                    self.reply(415, {"error": "Expected Content-Type: application/json."})
+                    return False
+                return True
+
+            def do_GET(self):
+                if not self.allowed(json_body=False):
+                    return
+                if self.path == "/sources":
+                    self.reply(200, controller.list_sources())
+                elif self.path == "/engine" and controller.engine_swap:
+                    self.reply(200, controller.engine_swap.status())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if not self.allowed():
+                    return
+                if self.path == "/engine":
+                    self.post_engine()
+                    return
+                if self.path != "/sources":
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                    url = request["url"].strip()
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    self.reply(400, {"error": 'Expected a JSON body like {"url": "...", "type": "rtsp"}.'})
+                    return
+                try:
+                    index, error = controller.add_source(url, request.get("type"), request.get("name"))
+                except TimeoutError as e:
+                    self.reply(503, {"error": str(e)})
+                    return
+                if index is None:
+                    self.reply(400, {"error": error})
+                else:
+                    self.reply(201, {"index": index, "url": url})
+
+            def post_engine(self):
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                    started, message = controller.build_engine(dict(request))
+                except (ValueError, TypeError):
+                    self.reply(400, {"error": 'Expected a JSON body like {"precision": "qat", "batch_size": 8}.'})
+                    return
+                except TimeoutError as e:
+                    self.reply(503, {"error": str(e)})
+                    return
+                if started:
+                    self.reply(202, controller.engine_swap.status())
+                else:
+                    self.reply(409, {"error": message})
+
+            def do_DELETE(self):
+                if not self.allowed():
+                    return
+                prefix, _, index = self.path.rpartition("/")
+                if prefix != "/sources" or not index.isdigit():
+                    self.send_error(404)
+                    return
+                try:
+                    removed = controller.remove_source(int(index))
+                except TimeoutError as e:
+                    self.reply(503, {"error": str(e)})
+                    return
+                if removed:
+                    self.reply(200, {"index": int(index)})
+                else:
+                    self.reply(404, {"error": f"No source with index {index}."})
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"Warning: Unable to serve source control on port {port}: {e}. Continuing without the control endpoint.")
+            return
+        threading.Thread(target=self.server.serve_forever, name="control-server", daemon=True).start()
+        print(f"Source control available at http://{host}:{port}/sources")
+
+    def stop_server(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -15,8 +15,8 @@ import gi
 import os
 import configparser
 import subprocess
-from python_module.component.yt_factory import get_yt_uri
-from python_module.common.platform_info import PlatformInfo
+from python_module.component.yt_factory import get_yt_uri, get_yt_resolver
+from python_module.common.platform_info import get_platform_info
 
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst
@@ -47,7 +47,7 @@ def cb_newpad(decodebin, decoder_src_pad,data):
             sys.stderr.write(" Error: Decodebin did not pick nvidia decoder plugin.\n")
 
 def decodebin_child_added(child_proxy, Object, name, user_data):
-    platform_info= PlatformInfo()
+    platform_info = get_platform_info()
     print("Decodebin child added:", name, "\n")
     if name.find("decodebin") != -1:
         Object.connect("child-added", decodebin_child_added, user_data)
@@ -64,10 +64,14 @@ def decodebin_child_added(child_proxy, Object, name, user_data):
             Object.set_property("drop-on-latency", True)
 
  
+def source_bin_name(index):
+    return "source-bin-%02d" % index
+
+
 def create_source_bin(index,uri):
     print("Creating source bin")
 
-    bin_name="source-bin-%02d" %index
+    bin_name=source_bin_name(index)
     print(bin_name)
     nbin=Gst.Bin.new(bin_name)
     if not nbin:
@@ -90,24 +94,99 @@ def create_source_bin(index,uri):
     return nbin
 
 
-def parse_media_source(config_file):
-    config = configparser.ConfigParser()
-    config.read(config_file)
+def source_index_of(element):
+    """Stream index of the source bin containing `element`, or None when it is not part of one."""
+    while element is not None:
+        name = element.get_name() or ""
+        if name.startswith("source-bin-"):
+            return int(name[len("source-bin-"):])
+        element = element.get_parent()
+    return None
+
+
+def attach_source_bin(pipeline, streammux, index, uri):
+    """Create a source bin for `uri` in a running pipeline and link it to nvstreammux pad sink_<index>.
+
+    The pad is reused when it already exists, so a restarted source keeps its
+    stream id.
+    """
+    source_bin = create_source_bin(index, uri)
+    if not source_bin:
+        return None
+    pipeline.add(source_bin)
+    padname = "sink_%u" % index
+    sinkpad = streammux.get_static_pad(padname) or streammux.request_pad_simple(padname)
+    if not sinkpad:
+        sys.stderr.write(f"Unable to get {padname} of nvstreammux\n")
+        pipeline.remove(source_bin)
+        return None
+    source_bin.get_static_pad("src").link(sinkpad)
+    source_bin.sync_state_with_parent()
+    return source_bin
+
+
+def detach_source_bin(pipeline, streammux, index, release_pad=False):
+    """Stop and remove the source bin of stream `index`, optionally releasing its nvstreammux pad."""
+    source_bin = pipeline.get_by_name(source_bin_name(index))
+    if not source_bin:
+        return False
+    source_bin.set_state(Gst.State.NULL)
+    sinkpad = streammux.get_static_pad("sink_%u" % index)
+    if sinkpad:
+        srcpad = source_bin.get_static_pad("src")
+        if srcpad:
+            srcpad.unlink(sinkpad)
+        # Clear the flushing/EOS state the old source left on the pad
+        sinkpad.send_event(Gst.Event.new_flush_stop(False))
+        if release_pad:
+            streammux.release_request_pad(sinkpad)
+    pipeline.remove(source_bin)
+    return True
+
+
+def resolve_media_uri(type, url, resolved_youtube=None):
+    """Return the URI uridecodebin should open for a media source."""
+    if type == "file":
+        if not os.path.isfile(url):
+            print(f"File not found: {url}")
+        return f"file://{url}"
+    if type == 'youtube':
+        if resolved_youtube is not None:
+            return resolved_youtube.get(url)
+        return get_yt_uri(url)
+    return url
+
+
+def resolve_media_sources(sources, resolver=None):
+    """Turn (type, url) pairs into the (type, url, uri) entries used by create_pipeline.
+
+    YouTube URLs are resolved together on the resolver thread pool; sources
+    that cannot be resolved are left out.
+    """
+    youtube_urls = [url for type, url in sources if type == 'youtube']
+    resolved_youtube = None
+    if youtube_urls:
+        resolved_youtube = (resolver or get_yt_resolver()).resolve_many(youtube_urls)
 
     media_entries = []
+    for type, url in sources:
+        uri = resolve_media_uri(type, url, resolved_youtube)
+        if not uri:
+            print(f"Skipping source {url}: unable to resolve it")
+            continue
+        media_entries.append((type, url, uri))
+    return media_entries
 
+
+def parse_media_source(config_file, resolve=True):
+    config = configparser.ConfigParser()
+    config.read(config_file)
+
+    sources = []
     for section in config.sections():
         enable = config.getint(section, 'enable')
         if enable == 1:
-            type = config.get(section, 'type')
-            url = config.get(section, 'url')
-            uri = config.get(section, 'url')
-
-            if not os.path.isfile(url) and type == 'file':
-                print(f"File not found: {url}")
-            if type == "file":
-                uri = f"file://{url}"
-            if type == 'youtube':
-                uri = get_yt_uri(url)
-            media_entries.append((type,url,uri))
-    return media_entries
+            sources.append((config.get(section, 'type'), config.get(section, 'url')))
+    if not resolve:
+        return [(type, url, None) for type, url in sources]
+    return resolve_media_sources(sources)
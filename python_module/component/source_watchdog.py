@@ -0,0 +1,166 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import threading
+from time import monotonic
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import GLib
+
+from python_module.component.source_factory import attach_source_bin, detach_source_bin, resolve_media_uri
+from python_module.component.yt_factory import get_yt_resolver
+
+# Sources that end on their own; they are never restarted
+FINITE_MEDIA_TYPES = ("file",)
+CHECK_INTERVAL_MS = 1000
+
+
+class SourceState:
+    def __init__(self, index, media, url, started):
+        self.index = index
+        self.media = media
+        self.url = url
+        self.watched_since = started
+        self.stalled = False
+        self.restarting = False
+        self.attempts = 0
+        self.next_attempt = 0.0
+        self.restarts = 0
+        self.failures = 0
+        self.errors = 0
+
+
+class SourceWatchdog:
+    """Restart stalled live sources without touching the rest of the pipeline.
+
+    A stream is stalled when no frame of it reached the probe for
+    `stall_timeout` seconds, or when one of its elements posted an error.
+    Its source bin is then removed and recreated with the same nvstreammux
+    pad, so the stream keeps its id, tile and metrics. YouTube URLs are
+    resolved off the main loop before the new bin is created: the cached
+    URI, kept fresh by the background refresh, is reused unless it is about
+    to expire or a restart with it already failed.
+    Consecutive restarts of a source wait `backoff_initial` seconds, doubling
+    up to `backoff_max`; the count resets once frames flow again.
+    """
+
+    def __init__(self, pipeline, streammux, metrics, media_sources, stall_timeout=10,
+                 backoff_initial=2, backoff_max=60):
+        self.pipeline = pipeline
+        self.streammux = streammux
+        self.metrics = metrics
+        self.stall_timeout = stall_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        now = monotonic()
+        self.sources = {index: SourceState(index, media, url, now)
+                        for index, (media, url, uri) in enumerate(media_sources)}
+
+    def start(self):
+        GLib.timeout_add(CHECK_INTERVAL_MS, self.check)
+
+    def add_source(self, index, media, url):
+        self.sources[index] = SourceState(index, media, url, monotonic())
+
+    def remove_source(self, index):
+        self.sources.pop(index, None)
+
+    def last_frame_time(self, state):
+        try:
+            last_frame = self.metrics.streams[state.index].last_frame_time
+        except IndexError:
+            last_frame = None
+        # Time granted to a (re)started source before its first frame
+        if last_frame is None or last_frame < state.watched_since:
+            return state.watched_since
+        return last_frame
+
+    def check(self):
+        """GLib timeout callback: detect stalls and schedule restarts."""
+        now = monotonic()
+        for state in list(self.sources.values()):
+            if state.restarting or state.media in FINITE_MEDIA_TYPES:
+                continue
+            last_frame = self.last_frame_time(state)
+            if last_frame > state.watched_since:
+                # Frames are flowing again since the last restart
+                state.attempts = 0
+                state.stalled = False
+            if now - last_frame < self.stall_timeout:
+                continue
+            state.stalled = True
+            if now >= state.next_attempt:
+                self.restart(state.index, f"no frame for {now - last_frame:.0f}s")
+        return True
+
+    def on_source_error(self, index, error):
+        """Called from the bus watch for errors posted by elements of a source bin."""
+        state = self.sources.get(index)
+        if state is None:
+            return
+        state.errors += 1
+        state.stalled = True
+        if state.media in FINITE_MEDIA_TYPES or state.restarting:
+            return
+        if monotonic() >= state.next_attempt:
+            self.restart(index, f"error: {error}")
+
+    def restart(self, index, reason):
+        state = self.sources[index]
+        state.restarting = True
+        state.attempts += 1
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** (state.attempts - 1))
+        state.next_attempt = monotonic() + delay
+        print(f"Source {index} ({state.url}) stalled, {reason}. Restarting, attempt {state.attempts}")
+
+        detach_source_bin(self.pipeline, self.streammux, index)
+        if state.media == 'youtube':
+            # attempts only grows while no frame arrived, so a second attempt means the cached URI failed
+            threading.Thread(target=self._resolve_youtube, args=(index, state.url, state.attempts > 1),
+                             name="source-restart", daemon=True).start()
+        else:
+            self._attach(index, resolve_media_uri(state.media, state.url))
+
+    def _resolve_youtube(self, index, url, extract_again):
+        resolver = get_yt_resolver()
+        if extract_again:
+            resolver.invalidate(url)
+        GLib.idle_add(self._attach, index, resolver.resolve(url))
+
+    def _attach(self, index, uri):
+        state = self.sources.get(index)
+        if state is None:
+            return False
+        state.restarting = False
+        state.watched_since = monotonic()
+        if uri and attach_source_bin(self.pipeline, self.streammux, index, uri):
+            state.restarts += 1
+        else:
+            state.failures += 1
+            print(f"Unable to recreate source {index} ({state.url}), retrying in "
+                  f"{max(0.0, state.next_attempt - monotonic()):.0f}s")
+        return False
+
+    def metrics_samples(self):
+        """Metrics collector: restart, failure and error counters per source."""
+        samples = []
+        for index, state in self.sources.items():
+            labels = {"stream": index}
+            samples.append(("deepstream_source_restarts_total", "counter",
+                            "Source bins recreated by the watchdog.", labels, state.restarts))
+            samples.append(("deepstream_source_restart_failures_total", "counter",
+                            "Source restarts that could not create a new source bin.", labels, state.failures))
+            samples.append(("deepstream_source_errors_total", "counter",
+                            "Errors posted by elements of the source bin.", labels, state.errors))
+            samples.append(("deepstream_source_stalled", "gauge",
+                            "1 while the source is stalled or being restarted.", labels, int(state.stalled)))
+        return samples
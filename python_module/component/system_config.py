@@ -1,8 +1,34 @@
+import os
 import configparser
 from prettytable import PrettyTable
 
 config_file = '/apps/deepstream-yolo-e2e/config/python_app/config.ini'
 
+PGIE_CONFIG_FILES = {
+    'det': "/apps/deepstream-yolo-e2e/config/pgie/config_pgie_yolo_det.txt",
+    'seg': "/apps/deepstream-yolo-e2e/config/pgie/config_pgie_yolo_seg.txt",
+}
+
+def read_pgie_settings(pgie_config_file):
+    """Return the key=value settings of a nvinfer config file."""
+    settings = {}
+    if not os.path.isfile(pgie_config_file):
+        return settings
+    with open(pgie_config_file, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith(('#', '[')) and '=' in line:
+                key, value = line.split('=', 1)
+                settings[key.strip()] = value.strip()
+    return settings
+
+# Settings applied on top of config.ini for this process only, e.g. from a launch profile
+config_overrides = {}
+
+def set_config_overrides(settings):
+    config_overrides.clear()
+    config_overrides.update({key.lower(): str(value) for key, value in settings.items()})
+
 def load_config():
     config = configparser.ConfigParser()
     config.read(config_file)
@@ -10,6 +36,8 @@ def load_config():
 
 def get_config():
     config = load_config()
+    if config_overrides:
+        config.read_dict({'Settings': config_overrides})
     # Load configuration variables
     muxer_batch_timeout_usec = config.getint('Settings', 'MUXER_BATCH_TIMEOUT_USEC')
     muxer_output_width = config.getint('Settings', 'MUXER_OUTPUT_WIDTH')
@@ -19,12 +47,42 @@ def get_config():
     tiled_output_height = config.getint('Settings', 'TILED_OUTPUT_HEIGHT')
     osd_process_mode = config.getint('Settings', 'OSD_PROCESS_MODE')
     osd_display_text = config.getint('Settings', 'OSD_DISPLAY_TEXT')
+    osd_max_display_meta = config.getint('Settings', 'OSD_MAX_DISPLAY_META', fallback=8)
     rtsp_udpsync = config.getint('Settings', 'RTSP_UDPSYNC')
 
     rtsp_port = config.getint('Settings', 'RTSP_PORT')  
     rtsp_factory = config.get('Settings', 'RTSP_FACTORY')  
     output_directory = config.get('Settings', 'OUTPUT_DIRECTORY')  
     output_prefix = config.get('Settings', 'OUTPUT_PREFIX')
+    track_expiration = config.getfloat('Settings', 'TRACK_EXPIRATION', fallback=60)
+    track_expiration_unit = config.get('Settings', 'TRACK_EXPIRATION_UNIT', fallback='frames')
+    export_format = config.get('Settings', 'EXPORT_FORMAT', fallback='none')
+    export_directory = config.get('Settings', 'EXPORT_DIRECTORY', fallback='./detections_output')
+    export_max_queue_records = config.getint('Settings', 'EXPORT_MAX_QUEUE_RECORDS', fallback=100000)
+    export_drop_policy = config.get('Settings', 'EXPORT_DROP_POLICY', fallback='drop-oldest')
+    export_rotate_mb = config.getint('Settings', 'EXPORT_ROTATE_MB', fallback=64)
+    metrics_port = config.getint('Settings', 'METRICS_PORT', fallback=0)
+    shm_publish = config.getint('Settings', 'SHM_PUBLISH', fallback=0)
+    shm_name = config.get('Settings', 'SHM_NAME', fallback='deepstream_detections')
+    shm_capacity_records = config.getint('Settings', 'SHM_CAPACITY_RECORDS', fallback=65536)
+    latency_instrumentation = config.getint('Settings', 'LATENCY_INSTRUMENTATION', fallback=0)
+    latency_tracer = config.getint('Settings', 'LATENCY_TRACER', fallback=0)
+    youtube_resolve_workers = config.getint('Settings', 'YOUTUBE_RESOLVE_WORKERS', fallback=16)
+    youtube_resolve_timeout = config.getfloat('Settings', 'YOUTUBE_RESOLVE_TIMEOUT', fallback=30)
+    youtube_refresh_margin = config.getfloat('Settings', 'YOUTUBE_REFRESH_MARGIN', fallback=600)
+    source_watchdog = config.getint('Settings', 'SOURCE_WATCHDOG', fallback=1)
+    source_stall_timeout = config.getfloat('Settings', 'SOURCE_STALL_TIMEOUT', fallback=10)
+    source_restart_backoff_max = config.getfloat('Settings', 'SOURCE_RESTART_BACKOFF_MAX', fallback=60)
+    control_port = config.getint('Settings', 'CONTROL_PORT', fallback=0)
+    control_token = config.get('Settings', 'CONTROL_TOKEN', fallback='')
+    engine_cache_quota_gb = config.getfloat('Settings', 'ENGINE_CACHE_QUOTA_GB', fallback=0)
+    engine_background_build = config.getint('Settings', 'ENGINE_BACKGROUND_BUILD', fallback=0)
+    model_cache_dir = config.get('Settings', 'MODEL_CACHE_DIR', fallback='~/.cache/deepstream-yolo-e2e/models')
+    model_mirrors = config.get('Settings', 'MODEL_MIRRORS', fallback='')
+    target_fps = config.getfloat('Settings', 'TARGET_FPS', fallback=30)
+    network_size = config.get('Settings', 'NETWORK_SIZE', fallback='640')
+    network_size_ladder = config.get('Settings', 'NETWORK_SIZE_LADDER', fallback='320,416,512,640,960')
+    tracker_config_file = config.get('Settings', 'TRACKER_CONFIG_FILE', fallback='/apps/deepstream-yolo-e2e/config/tracker/config_tracker_NvDCF_perf.yml')
 
     return {
         'MUXER_BATCH_TIMEOUT_USEC': muxer_batch_timeout_usec,
@@ -34,11 +92,41 @@ def get_config():
         'TILED_OUTPUT_HEIGHT': tiled_output_height,
         'OSD_PROCESS_MODE': osd_process_mode,
         'OSD_DISPLAY_TEXT': osd_display_text,
+        'OSD_MAX_DISPLAY_META': osd_max_display_meta,
         'RTSP_UDPSYNC': rtsp_udpsync,
         'RTSP_FACTORY' : rtsp_factory,
         'RTSP_PORT': rtsp_port,
         'OUTPUT_DIRECTORY' : output_directory ,
-        'OUTPUT_PREFIX' : output_prefix
+        'OUTPUT_PREFIX' : output_prefix,
+        'TRACK_EXPIRATION': track_expiration,
+        'TRACK_EXPIRATION_UNIT': track_expiration_unit,
+        'EXPORT_FORMAT': export_format,
+        'EXPORT_DIRECTORY': export_directory,
+        'EXPORT_MAX_QUEUE_RECORDS': export_max_queue_records,
+        'EXPORT_DROP_POLICY': export_drop_policy,
+        'EXPORT_ROTATE_MB': export_rotate_mb,
+        'METRICS_PORT': metrics_port,
+        'SHM_PUBLISH': shm_publish,
+        'SHM_NAME': shm_name,
+        'SHM_CAPACITY_RECORDS': shm_capacity_records,
+        'LATENCY_INSTRUMENTATION': latency_instrumentation,
+        'LATENCY_TRACER': latency_tracer,
+        'TRACKER_CONFIG_FILE': tracker_config_file,
+        'YOUTUBE_RESOLVE_WORKERS': youtube_resolve_workers,
+        'YOUTUBE_RESOLVE_TIMEOUT': youtube_resolve_timeout,
+        'YOUTUBE_REFRESH_MARGIN': youtube_refresh_margin,
+        'SOURCE_WATCHDOG': source_watchdog,
+        'SOURCE_STALL_TIMEOUT': source_stall_timeout,
+        'SOURCE_RESTART_BACKOFF_MAX': source_restart_backoff_max,
+        'CONTROL_PORT': control_port,
+        'CONTROL_TOKEN': control_token,
+        'ENGINE_CACHE_QUOTA_GB': engine_cache_quota_gb,
+        'ENGINE_BACKGROUND_BUILD': engine_background_build,
+        'MODEL_CACHE_DIR': model_cache_dir,
+        'MODEL_MIRRORS': model_mirrors,
+        'TARGET_FPS': target_fps,
+        'NETWORK_SIZE': network_size,
+        'NETWORK_SIZE_LADDER': network_size_ladder
     }
 
 
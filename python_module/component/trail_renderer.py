@@ -0,0 +1,170 @@
+"""
+Creative Commons Attribution-NonCommercial 4.0 International License
+
+You are free to share and adapt the material under the following terms:
+- Attribution: Give appropriate credit.
+- NonCommercial: Not for commercial use without permission.
+
+For inquiries: levi.pereira@gmail.com
+Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
+License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
+"""
+
+import math
+import pyds
+from python_module.common.utils import tiler_grid
+
+# Fixed size of the line_params array of NvDsDisplayMeta
+MAX_ELEMENTS_IN_DISPLAY_META = 16
+# Shortest segment drawn, in pixels of the tiled output
+MIN_SEGMENT_PIXELS = 4
+MIN_TRAIL_POINTS = 3
+TRAIL_LINE_WIDTH = 2
+TRAIL_ALPHA = 0.9
+
+
+class TrailRenderer:
+    """Draw object trails as polylines packed densely into NvDsDisplayMeta.
+
+    The level of detail follows the size of one tile of the tiled output: the
+    smaller a tile is compared to the muxer frame, the fewer points are kept
+    per trail and the longer the shortest segment drawn. Segments of every
+    object in a frame share the same display metas, 16 lines each, and no more
+    than `max_display_meta` display metas are acquired per frame; trails that
+    do not fit the budget are skipped.
+    """
+
+    def __init__(self, number_sources, muxer_width, muxer_height, tiled_width, tiled_height,
+                 trail_length, max_display_meta=8):
+        self.muxer_size = (muxer_width, muxer_height)
+        self.tiled_size = (tiled_width, tiled_height)
+        self.trail_length = trail_length
+        self.max_display_meta = max_display_meta
+        self.set_layout(number_sources)
+
+        self.batch_meta = None
+        self.frame_meta = None
+        self.display_meta = None
+        self.frame_display_metas = 0
+        self.batch_display_metas = 0
+
+        # Statistics reported by stats_print_callback()
+        self.total_display_metas = 0
+        self.total_batches = 0
+        self.max_batch_display_metas = 0
+        self.skipped_trails = 0
+
+    def set_layout(self, number_sources):
+        """Derive the level of detail from the tile size for `number_sources` tiles."""
+        tiler_rows, tiler_columns = tiler_grid(number_sources)
+        tile_width = self.tiled_size[0] / tiler_columns
+        tile_height = self.tiled_size[1] / tiler_rows
+
+        scale = min(1.0, tile_width / self.muxer_size[0], tile_height / self.muxer_size[1])
+        self.max_points = max(MIN_TRAIL_POINTS, min(self.trail_length, int(round(self.trail_length * scale))))
+        self.min_segment = MIN_SEGMENT_PIXELS / scale
+        self.scale = scale
+
+    def begin_batch(self, batch_meta):
+        self.batch_meta = batch_meta
+        self.batch_display_metas = 0
+
+    def begin_frame(self, frame_meta):
+        self.frame_meta = frame_meta
+        self.display_meta = None
+        self.frame_display_metas = 0
+
+    def _flush(self):
+        if self.display_meta is not None:
+            pyds.nvds_add_display_meta_to_frame(self.frame_meta, self.display_meta)
+            self.display_meta = None
+
+    def _next_display_meta(self):
+        """Return a display meta with room for one more line, or None when the budget is spent."""
+        display_meta = self.display_meta
+        if display_meta is not None and display_meta.num_lines < MAX_ELEMENTS_IN_DISPLAY_META:
+            return display_meta
+        if self.frame_display_metas >= self.max_display_meta:
+            return None
+        self._flush()
+        display_meta = pyds.nvds_acquire_display_meta_from_pool(self.batch_meta)
+        display_meta.num_lines = 0
+        self.display_meta = display_meta
+        self.frame_display_metas += 1
+        self.batch_display_metas += 1
+        return display_meta
+
+    def decimate(self, trail, start=0, end=None):
+        """Reduce the flat [x0, y0, x1, y1, ...] trail in trail[start:end] to the points worth drawing, newest first.
+
+        The trail is read in place, so the ring of TrailStore.trail_view() needs no copy.
+        """
+        if end is None:
+            end = len(trail)
+        num_points = (end - start) // 2
+        if num_points < 2:
+            return []
+        stride = max(1, math.ceil((num_points - 1) / (self.max_points - 1)))
+        min_segment = self.min_segment
+        last_x = trail[end - 2]
+        last_y = trail[end - 1]
+        kept = [last_x, last_y]
+        indices = list(range(num_points - 1 - stride, -1, -stride))
+        if not indices or indices[-1] != 0:
+            indices.append(0)  # always reach the oldest point
+        for i in indices:
+            x = trail[start + 2 * i]
+            y = trail[start + 2 * i + 1]
+            if x <= 0 or y <= 0:
+                continue
+            if abs(x - last_x) + abs(y - last_y) < min_segment:
+                continue
+            kept.append(x)
+            kept.append(y)
+            last_x = x
+            last_y = y
+        return kept
+
+    def draw(self, trail, color, start=0, end=None):
+        """Draw the trail in trail[start:end] as connected line segments in the given ColorObject colour."""
+        points = self.decimate(trail, start, end)
+        if len(points) < 4:
+            return
+        for i in range(0, len(points) - 2, 2):
+            display_meta = self._next_display_meta()
+            if display_meta is None:
+                self.skipped_trails += 1
+                return
+            line_params = display_meta.line_params[display_meta.num_lines]
+            line_params.x1 = points[i]
+            line_params.y1 = points[i + 1]
+            line_params.x2 = points[i + 2]
+            line_params.y2 = points[i + 3]
+            line_params.line_width = TRAIL_LINE_WIDTH
+            line_params.line_color.set(color.red, color.green, color.blue, TRAIL_ALPHA)
+            display_meta.num_lines += 1
+
+    def end_frame(self):
+        self._flush()
+        self.frame_meta = None
+
+    def end_batch(self):
+        self.total_display_metas += self.batch_display_metas
+        self.total_batches += 1
+        if self.batch_display_metas > self.max_batch_display_metas:
+            self.max_batch_display_metas = self.batch_display_metas
+        self.batch_meta = None
+
+    def stats_print_callback(self):
+        average = self.total_display_metas / self.total_batches if self.total_batches else 0.0
+        stats = {
+            "display_meta_per_batch": round(average, 2),
+            "max_display_meta_per_batch": self.max_batch_display_metas,
+            "skipped_trails": self.skipped_trails,
+        }
+        print("\n**OSD: ", stats, "\n")
+        self.total_display_metas = 0
+        self.total_batches = 0
+        self.max_batch_display_metas = 0
+        self.skipped_trails = 0
+        return True
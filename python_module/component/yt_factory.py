@@ -9,7 +9,22 @@ For inquiries: levi.pereira@gmail.com
 Repository: DeepStream / YOLO (https://github.com/levipereira/deepstream-yolo-e2e)
 License: https://creativecommons.org/licenses/by-nc/4.0/legalcode
 """
-import yt_dlp
+
+import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from python_module.component.system_config import get_config
+
+YT_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'deepstream-yolo-e2e', 'youtube_uris.json')
+# Lifetime assumed for resolved URLs without an expire parameter
+DEFAULT_URI_TTL = 3600
+# Delay before retrying a failed background refresh
+REFRESH_RETRY_SECONDS = 60
+
+EXPIRE_PATTERN = re.compile(r'[?&/]expire[=/](\d+)')
 
 # ℹ️ See help(yt_dlp.YoutubeDL) for a list of available options and public functions
 ydl_opts = {}
@@ -32,7 +47,10 @@ def format_selector(ctx):
     }
 
 
-def get_yt_uri(url):
+def extract_yt_uri(url):
+    """Default extractor: resolve a YouTube page URL to a playable video URL with yt_dlp."""
+    # yt_dlp takes a noticeable time to import and only YouTube sources need it
+    import yt_dlp
 
     ydl_opts = {
         'format': format_selector,
@@ -43,4 +61,175 @@ def get_yt_uri(url):
         #info_json = json.dumps(ydl.sanitize_info(info))
         uri  = info.get('requested_formats', [])[0].get('url')
     return uri
-    
\ No newline at end of file
+
+
+def uri_expiry(uri):
+    """Expiry time (epoch seconds) of a resolved googlevideo URL, or None."""
+    match = EXPIRE_PATTERN.search(uri or '')
+    return float(match.group(1)) if match else None
+
+
+class YouTubeResolver:
+    """Resolve YouTube URLs concurrently, with a persistent cache honouring URL expiry.
+
+    resolve_many() returns cached URIs that are still valid for at least
+    `refresh_margin` seconds and extracts the others on a thread pool; a
+    source still unresolved `timeout` seconds after resolution started is
+    returned as None. Extractions that finish after their timeout still update
+    the cache. schedule_refresh() re-extracts a URL in the background
+    `refresh_margin` seconds before it expires.
+
+    `extractor` is any callable mapping a YouTube URL to a playable URI, so a
+    local stub can replace yt_dlp in tests.
+    """
+
+    def __init__(self, extractor=extract_yt_uri, cache_file=YT_CACHE_FILE, max_workers=16,
+                 timeout=30, refresh_margin=600, clock=time.time):
+        self.extractor = extractor
+        self.cache_file = cache_file
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yt-resolve")
+        self.timers = {}
+        self.cache = self._load()
+
+    def _load(self):
+        if not self.cache_file:
+            return {}
+        try:
+            with open(self.cache_file, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as file:
+                json.dump(self.cache, file)
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            print(f"Warning: Unable to write YouTube cache {self.cache_file}: {e}")
+
+    def cached(self, url):
+        """Cached URI of `url` if it stays valid for more than refresh_margin seconds."""
+        with self.lock:
+            entry = self.cache.get(url)
+        if entry and entry["expire"] - self.refresh_margin > self.clock():
+            return entry["uri"]
+        return None
+
+    def _extract(self, url):
+        uri = self.extractor(url)
+        if not uri:
+            raise ValueError(f"no playable format found for {url}")
+        now = self.clock()
+        with self.lock:
+            self.cache[url] = {"uri": uri, "expire": uri_expiry(uri) or now + DEFAULT_URI_TTL, "resolved": now}
+            self._save()
+        return uri
+
+    def resolve_many(self, urls):
+        """Return {url: uri} for all urls; uri is None for sources that failed or timed out."""
+        results = {}
+        futures = {}
+        for url in dict.fromkeys(urls):
+            uri = self.cached(url)
+            if uri:
+                results[url] = uri
+            else:
+                futures[url] = self.executor.submit(self._extract, url)
+        deadline = time.monotonic() + self.timeout
+        for url, future in futures.items():
+            try:
+                results[url] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                print(f"Timed out resolving YouTube URL {url} after {self.timeout}s")
+                results[url] = None
+            except Exception as e:
+                print(f"Error resolving YouTube URL {url}: {e}")
+                results[url] = None
+        return results
+
+    def invalidate(self, url):
+        """Forget the cached URI of `url` so the next resolve extracts it again."""
+        with self.lock:
+            self.cache.pop(url, None)
+
+    def resolve(self, url):
+        return self.resolve_many([url])[url]
+
+    def schedule_refresh(self, url, callback=None, delay=None):
+        """Re-extract `url` in the background ahead of its expiry, then keep doing so.
+
+        `callback(url, uri)` is called after every successful refresh.
+        """
+        with self.lock:
+            if delay is None:
+                entry = self.cache.get(url)
+                delay = max(0.0, entry["expire"] - self.refresh_margin - self.clock()) if entry else 0.0
+            if url in self.timers:
+                self.timers[url].cancel()
+            timer = threading.Timer(delay, self._refresh, args=(url, callback))
+            timer.daemon = True
+            self.timers[url] = timer
+        timer.start()
+
+    def _refresh(self, url, callback):
+        retry = None
+        try:
+            uri = self._extract(url)
+        except Exception as e:
+            print(f"Error refreshing YouTube URL {url}: {e}")
+            retry = REFRESH_RETRY_SECONDS
+        else:
+            if callback:
+                callback(url, uri)
+        with self.lock:
+            running = url in self.timers
+        if running:
+            self.schedule_refresh(url, callback, retry)
+
+    def cancel_refresh(self, url):
+        with self.lock:
+            timer = self.timers.pop(url, None)
+        if timer:
+            timer.cancel()
+
+    def stop(self):
+        with self.lock:
+            timers = list(self.timers.values())
+            self.timers.clear()
+        for timer in timers:
+            timer.cancel()
+        self.executor.shutdown(wait=False)
+
+
+_yt_resolver = None
+
+
+def get_yt_resolver():
+    """Process-wide resolver configured from config.ini."""
+    global _yt_resolver
+    if _yt_resolver is None:
+        config_values = get_config()
+        _yt_resolver = YouTubeResolver(max_workers=config_values['YOUTUBE_RESOLVE_WORKERS'],
+                                       timeout=config_values['YOUTUBE_RESOLVE_TIMEOUT'],
+                                       refresh_margin=config_values['YOUTUBE_REFRESH_MARGIN'])
+    return _yt_resolver
+
+
+def stop_yt_resolver():
+    global _yt_resolver
+    if _yt_resolver is not None:
+        _yt_resolver.stop()
+        _yt_resolver = None
+
+
+def get_yt_uri(url):
+    return get_yt_resolver().resolve(url)